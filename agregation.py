@@ -0,0 +1,75 @@
+import pandas as pd
+from normalisation import formater_sans_decimale_serie, nettoyer_lot_serie
+
+
+def fusionner_agregats(i_agg, t_agg, lib_master):
+    """
+    Fusion des agrégats (Code, Lot) Info / Terrain en tableau de comparaison :
+    Qte_Info, Qte_Terrain, Libellé, _Original_Info, Ecart.
+    """
+    merged = pd.merge(i_agg, t_agg, on=['Code', 'Lot'], how='outer')
+    merged[['Qte_Info', 'Qte_Terrain']] = merged[['Qte_Info', 'Qte_Terrain']].fillna(0)
+
+    merged['Libellé'] = merged['Code'].map(lib_master).fillna("LIBELLÉ INCONNU")
+    merged['_Original_Info'] = merged['Qte_Info']
+    merged['Ecart'] = merged['Qte_Info'] - merged['Qte_Terrain']
+    return merged
+
+
+class AgregatPartiel:
+    """
+    Cumul incrémental des quantités par (Code, Lot) normalisés, bloc par bloc.
+    La mémoire occupée dépend du nombre de clés distinctes, pas du nombre de lignes.
+    """
+
+    def __init__(self, nom_qte, compactage=8):
+        self.nom_qte = nom_qte
+        self.compactage = compactage
+        self._partiels = []
+        self._libelles = []
+        self.nb_lignes = 0
+
+    def ajouter(self, bloc, col_code, col_lot, col_qte, col_lib=None):
+        """Normalise un bloc et ajoute ses sommes partielles"""
+        codes = formater_sans_decimale_serie(bloc[col_code])
+        partiel = pd.DataFrame({
+            'Code': codes,
+            'Lot': nettoyer_lot_serie(bloc[col_lot]),
+            self.nom_qte: bloc[col_qte],
+        })
+        self._partiels.append(self._sommer(partiel))
+        self.nb_lignes += len(bloc)
+
+        # Premier libellé de chaque code dans le bloc (gardés en colonnes, pas en dict Python)
+        if col_lib:
+            temp = pd.DataFrame({'Code': codes, 'Lib': bloc[col_lib]}).dropna().drop_duplicates(subset=['Code'])
+            self._libelles.append(temp)
+
+        if len(self._partiels) >= self.compactage:
+            self._compacter()
+
+    def _sommer(self, df):
+        # Sommes en colonnes (Code, Lot) à plat : pas de MultiIndex à réaligner à chaque compactage
+        return df.groupby(['Code', 'Lot'], sort=False, as_index=False)[self.nom_qte].sum()
+
+    def _compacter(self):
+        if len(self._partiels) > 1:
+            self._partiels = [self._sommer(pd.concat(self._partiels, ignore_index=True))]
+        if len(self._libelles) > 1:
+            # Blocs concaténés dans l'ordre : le premier libellé de chaque code est gardé
+            self._libelles = [pd.concat(self._libelles, ignore_index=True).drop_duplicates(subset=['Code'])]
+
+    @property
+    def libelles(self):
+        """Premier libellé rencontré pour chaque code (Series indexée par code)"""
+        self._compacter()
+        if not self._libelles:
+            return pd.Series(dtype=object)
+        return self._libelles[0].set_index('Code')['Lib']
+
+    def resultat(self):
+        """Agrégat final (colonnes Code, Lot, <nom_qte>)"""
+        if not self._partiels:
+            return pd.DataFrame(columns=['Code', 'Lot', self.nom_qte])
+        self._compacter()
+        return self._partiels[0]
@@ -1,9 +1,20 @@
 import streamlit as st
+import os
 import time
 import streamlit.components.v1 as components
 import pandas as pd
 from datetime import datetime
-from backend import StockProcessor
+from backend import StockProcessor, CONSEIL_FINAL_FLUX
+from cache import CACHE_TRAITEMENTS
+from export import formats_disponibles
+from diagnostic import Diagnostic
+from references import REFERENCES
+from journal import JOURNAL, TAILLE_PAGE, export_mise_a_jour
+from service_scan import adresse_service, demarrer_service, origines_depuis_env
+from vue_ecarts import COLONNES_ECARTS, TAILLE_PAGE_ECARTS, TRIS
+from instantanes import INSTANTANES
+from budget import BUDGET_MEMOIRE, BudgetDepasse, MO
+from schemas import SCHEMAS
 
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Comparateur Stock", layout="wide")
@@ -12,47 +23,152 @@ with open("style.css") as f:
     st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
 # --- SESSION STATE ---
-if 'history' not in st.session_state:
-    st.session_state.history = []
 if 'current_search' not in st.session_state:
     st.session_state.current_search = None
 if 'scan_input' not in st.session_state:
     st.session_state.scan_input = ""
 
-processor = StockProcessor()
+# Diagnostic (mesures par étape), conservé en session : les fichiers construits au
+# téléchargement apparaissent au rerun suivant
+panneau_diagnostic = st.sidebar.expander("Diagnostic", expanded=False)
+with panneau_diagnostic:
+    diag_actif = st.checkbox("Mesurer les étapes", key="diag_actif")
+    diag_memoire = st.checkbox("Pic mémoire Python (plus lent)", key="diag_memoire", disabled=not diag_actif)
+diagnostic = st.session_state.get('diagnostic')
+if diagnostic is None or (diagnostic.actif, diagnostic.memoire) != (diag_actif, diag_actif and diag_memoire):
+    diagnostic = st.session_state.diagnostic = Diagnostic(diag_actif, diag_actif and diag_memoire)
+
+# Le cache (niveau module) survit aux reruns : fichiers inchangés = pas de retraitement.
+# Chargement différé : les colonnes hors comparaison ne sont lues que pour le fichier final.
+# Compactage : fichiers gardés en catégories / chaînes compactes (moins de mémoire par session).
+# Instantanés : une nouvelle extraction POUS n'est retraitée que sur les lignes qui ont changé.
+# Budget mémoire (STOCKITO_BUDGET_MO) : au-delà, comparaison en flux (CSV) ou refus du traitement.
+processor = StockProcessor(cache=CACHE_TRAITEMENTS, chargement_differe=True, parallele=True,
+                           diagnostic=diagnostic, compactage=True, instantanes=INSTANTANES,
+                           budget=BUDGET_MEMOIRE)
+
+# Service HTTP de scan pour les terminaux, sur les mêmes références et le même journal
+# (lancé une fois par process si STOCKITO_SERVICE_SCAN = "port" ou "hote:port" ; jeton
+# STOCKITO_JETON_SCAN obligatoire hors boucle locale)
+adresse_scan = adresse_service(os.environ.get('STOCKITO_SERVICE_SCAN'))
+service_scan = adresse_scan and demarrer_service(
+    *adresse_scan, jeton_acces=os.environ.get('STOCKITO_JETON_SCAN'),
+    origines=origines_depuis_env(os.environ.get('STOCKITO_ORIGINES_SCAN')))
+if adresse_scan:
+    st.sidebar.caption(f"Service de scan : {adresse_scan[0]}:{adresse_scan[1]}" if service_scan
+                       else f"Service de scan indisponible ({adresse_scan[0]}:{adresse_scan[1]}, "
+                            f"port occupé ou jeton manquant)")
 
 # --- APPLICATION ---
 st.title("STOCKITO")
 
+# Suivi du cache de traitement
+with st.sidebar.expander("Cache", expanded=False):
+    stats_cache = processor.cache_stats()
+    st.caption(f"Hits : {stats_cache['hits']} | Misses : {stats_cache['misses']} "
+               f"({stats_cache['hit_rate']:.0%})")
+    st.caption(f"Entrées : {stats_cache['entrees']} | {stats_cache['taille_octets'] / 1024 ** 2:.1f} Mo "
+               f"| Évictions : {stats_cache['evictions']}")
+    stats_schemas = SCHEMAS.stats()
+    st.caption(f"Dispositions de fichiers connues : {stats_schemas['profils']} "
+               f"(reprises {stats_schemas['hits']} | résolues {stats_schemas['misses']})")
+# Gain du compactage (rempli en fin de script, une fois les fichiers chargés)
+panneau_memoire = st.sidebar.expander("Mémoire", expanded=False)
+
 # Création des onglets
 tab_global, tab_tournant = st.tabs(["MAGASIN VS POUS", "INVENTAIRE TOURNANT"])
 
 
 with tab_global:
+    # Comptage : fichier MAGASIN, ou journal d'un scanner hors ligne (un code / EAN / série par ligne)
+    source_comptage = st.radio("Comptage", ["Fichier MAGASIN", "Journal de scans"], horizontal=True,
+                               key="source_comptage")
+    par_scans = source_comptage == "Journal de scans"
     col_up1, col_up2 = st.columns(2)
     with col_up1:
-        f_terrain = st.file_uploader("STOCK MAGASIN", type=["xlsx", "xls", "csv", "ods", "xlsm"], key="t_up")
+        if par_scans:
+            f_terrain = st.file_uploader("JOURNAL DE SCANS", type=["txt", "csv"], key="s_up")
+            articles_scannes = st.checkbox("Comparer seulement les articles scannés", value=True,
+                                           key="articles_scannes")
+        else:
+            f_terrain = st.file_uploader("STOCK MAGASIN", type=["xlsx", "xls", "csv", "ods", "xlsm"], key="t_up")
     with col_up2:
         f_info = st.file_uploader("STOCK POUS", type=["xlsx", "xls", "csv", "ods", "xlsm"], key="i_up")
     if f_terrain and f_info:
-        # Utilisation du backend
-        if processor.load_data(f_terrain, f_info):
-            
+        # Utilisation du backend (refus clair si le budget mémoire du serveur est dépassé)
+        refus_budget, merged = None, None
+        try:
+            if par_scans:
+                charge = processor.load_scan_log(f_terrain, f_info, articles_scannes)
+            else:
+                charge = processor.load_data(f_terrain, f_info)
             # --- TRAITEMENT via Backend ---
-            merged = processor.process_comparison()
+            if charge:
+                merged = processor.process_comparison()
+        except BudgetDepasse as e:
+            refus_budget = e
+        if merged is not None:
+            if par_scans and len(processor.scans_inconnus):
+                with st.expander(f"❌ {len(processor.scans_inconnus)} codes scannés introuvables dans le fichier POUS"):
+                    st.dataframe(processor.scans_inconnus, hide_index=True, use_container_width=True)
+            if processor.par_blocs:
+                st.info("Fichiers volumineux : comparaison faite en flux pour ménager la mémoire du serveur.")
 
             # --- INTERFACE ---
-            nb_ecarts = len(merged[merged['Ecart'] != 0])
+            # Écarts triés / filtrés côté serveur : seule la page affichée part au navigateur
+            vue_ecarts = processor.discrepancy_view(merged)
+            nb_ecarts = len(vue_ecarts)
             st.markdown(f'<div class="metric-box">⚠️ Nombre d\'articles avec écarts : {nb_ecarts}</div>', unsafe_allow_html=True)
             st.write("")
 
+            # Extraction comparée à la précédente : ce qui a changé depuis
+            if processor.changements is not None:
+                changements = processor.changements['changements']
+                with st.expander(f"🔄 {len(changements)} quantités changées depuis la comparaison précédente"):
+                    for resume in processor.changements['resume']:
+                        st.caption(f"{resume['fichier']} : {resume['lignes_ajoutees']} lignes nouvelles ou modifiées, "
+                                   f"{resume['lignes_retirees']} lignes retirées, {resume['articles_touches']} articles recalculés")
+                    st.dataframe(changements, hide_index=True, use_container_width=True)
+
+            # Saisies de la session, (Code, Lot) -> Qte_Info, remises à zéro quand les fichiers changent
+            saisies = st.session_state.get('saisies_ecarts')
+            if saisies is None or saisies['fichiers'] != processor.file_keys:
+                saisies = st.session_state.saisies_ecarts = {'fichiers': processor.file_keys, 'corrections': {}}
+            corrections = saisies['corrections']
+
+            c_recherche, c_min, c_tri = st.columns([2, 1, 1])
+            with c_recherche:
+                recherche = st.text_input("Rechercher (code, libellé, lot)", key="recherche_ecarts")
+            with c_min:
+                ecart_min = st.number_input("Écart minimum (valeur absolue)", min_value=0, value=0, step=1,
+                                            key="ecart_min")
+            with c_tri:
+                tri = st.selectbox("Trier par", list(TRIS), key="tri_ecarts")
+            positions = vue_ecarts.filtrer(recherche, ecart_min, tri)
+            nb_pages = max(1, -(-len(positions) // TAILLE_PAGE_ECARTS))
+
+            # Nouveau filtre / tri : retour à la première page
+            filtre = (processor.file_keys, recherche, ecart_min, tri)
+            if st.session_state.get('filtre_ecarts') != filtre:
+                st.session_state.filtre_ecarts = filtre
+                st.session_state.page_ecarts = 1
+            numero = st.number_input(f"Page (sur {nb_pages})", min_value=1, max_value=nb_pages, step=1,
+                                     key="page_ecarts")
+            st.caption(f"{len(positions)} écarts retenus sur {nb_ecarts}")
+
             st.info("Corrigez la colonne **'Qte Info (Logiciel)'** ci-dessous.")
-            
-            df_display = merged[merged['Ecart'] != 0].copy()
 
-            edited_df = st.data_editor(
-                df_display,
-                column_order=['Code', 'Libellé', 'Lot', 'Qte_Terrain', 'Qte_Info', 'Ecart'],
+            # Page construite une fois par (filtre, tri, numéro) : les saisies en cours restent
+            # dans l'éditeur, les pages déjà vues reprennent les saisies gardées en session
+            page_affichee = st.session_state.get('page_affichee')
+            if page_affichee is None or page_affichee[0] != filtre + (numero,):
+                generation = 0 if page_affichee is None else page_affichee[2] + 1
+                page_affichee = st.session_state.page_affichee = (
+                    filtre + (numero,), vue_ecarts.page(positions, numero, corrections=corrections), generation)
+
+            edited_page = st.data_editor(
+                page_affichee[1],
+                column_order=COLONNES_ECARTS,
                 disabled=['Code', 'Libellé', 'Lot', 'Qte_Terrain', 'Ecart'],
                 column_config={
                     "Qte_Info": st.column_config.NumberColumn("Qte Info (Logiciel)", step=1, required=True),
@@ -61,12 +177,12 @@ with tab_global:
                 },
                 use_container_width=True,
                 num_rows="fixed",
-                key="editor"
+                key=f"editor_{page_affichee[2]}"
             )
+            vue_ecarts.relever_saisies(edited_page, corrections)
 
-            # ALERTES
-            edited_df['Ecart_Final'] = edited_df['Qte_Info'] - edited_df['Qte_Terrain']
-            changes = edited_df[edited_df['Qte_Info'] != edited_df['_Original_Info']]
+            # ALERTES (lignes saisies seulement)
+            changes = vue_ecarts.actions(corrections)
             
             if not changes.empty:
                 st.write("### Actions requises")
@@ -76,43 +192,53 @@ with tab_global:
                         <b>{row['Code']} ({row['Libellé']})</b> : Mettre à jour stock informatique à <b>{int(row['Qte_Info'])}</b>.
                     </div>
                     """, unsafe_allow_html=True)
+
+            # Tableau complet des écarts corrigés, pour les exports
+            edited_df = vue_ecarts.tableau_corrige(corrections)
             
             st.divider()
 
             # --- EXPORTS ---
+            # xlsx pour la saisie, CSV / Parquet pour les outils d'import
+            format_export = st.radio("Format des fichiers", formats_disponibles(), horizontal=True, key="format_export")
             c1, c2 = st.columns(2)
 
             with c1:
                 st.subheader("1. Rapport d'Écarts")
-                # Appel Backend pour génération Excel
-                buffer_rapport = processor.generate_diff_report(edited_df)
+                # Fichier construit seulement au clic sur le bouton
+                export_rapport = processor.diff_report_export(edited_df, format_export)
                 date_str = datetime.now().strftime("%d-%m-%Y_%Hh%M")
-                nom_fichier_rapport = f"Rapport_Ecarts_{date_str}.xlsx"
-                st.download_button("Télécharger Rapport", buffer_rapport, nom_fichier_rapport, mime="application/vnd.ms-excel", use_container_width=True)
+                nom_fichier_rapport = export_rapport.nom(f"Rapport_Ecarts_{date_str}")
+                st.download_button("Télécharger Rapport", export_rapport.donnees, nom_fichier_rapport, mime=export_rapport.mime, use_container_width=True)
 
             with c2:
                 st.subheader("2. Fichier Final")
                 st.caption("Génère l'inventaire complet au format du fichier informatique.")
                 
-                confirm_update = st.checkbox("Je confirme vouloir générer le fichier de mise à jour complet", key="confirm_global")
+                confirm_update = st.checkbox("Je confirme vouloir générer le fichier de mise à jour complet", key="confirm_global",
+                                             disabled=processor.par_blocs)
                 
-                if confirm_update:
-                    # Appel Backend pour la logique complexe de reconstruction
-                    buffer_maj = processor.generate_final_update(edited_df, merged)
+                if processor.par_blocs:
+                    st.warning(CONSEIL_FINAL_FLUX)
+                elif confirm_update:
+                    # Reconstruction lancée seulement au clic sur le bouton
+                    export_maj = processor.final_update_export(edited_df, merged, format_export)
                     
                     date_str = datetime.now().strftime("%d-%m-%Y %Hh%M")
-                    nom_fichier_final = f"STOCK MAGASIN {date_str}.xlsx"
+                    nom_fichier_final = export_maj.nom(f"STOCK MAGASIN {date_str}")
                     
                     st.download_button(
                         "Mise à jour du stock magasin", 
-                        buffer_maj, 
+                        export_maj.donnees, 
                         nom_fichier_final, 
-                        mime="application/vnd.ms-excel", 
+                        mime=export_maj.mime, 
                         type="primary", 
                         use_container_width=True
                     )
                 else:
                     st.warning("Veuillez cocher la case pour générer le fichier.")
+        elif refus_budget is not None:
+            st.error(str(refus_budget))
         else:
              st.error("Colonnes introuvables. Vérifiez les fichiers.")
     else:
@@ -123,72 +249,75 @@ with tab_global:
 # ==============================================================================
 with tab_tournant:
     # --- 1. CHARGEMENT FICHIER (Dans un expander pour gagner de la place après chargement) ---
-    with st.expander("Charger fichier POUS", expanded=True if 'df_ref' not in st.session_state else False):
+    with st.expander("Charger fichier POUS", expanded=True if st.session_state.get('jeton_ref') is None else False):
         file_ref = st.file_uploader("Fichier POUS", type=["xlsx", "xls", "csv", "ods", "xlsm"], key="ref_up")
-    
-    if file_ref:
-        if 'df_ref' not in st.session_state or st.session_state.get('file_ref_name') != file_ref.name:
-            from utils import charger_fichier_pandas, trouver_colonne
-            df = charger_fichier_pandas(file_ref)
-            st.session_state.df_ref = df
-            st.session_state.file_ref_name = file_ref.name
-            st.session_state.col_code = trouver_colonne(df, ['code', 'article', 'ref'])
-            st.session_state.col_qte = trouver_colonne(df, ['qte', 'quant', 'stock'])
-            st.session_state.col_lib = trouver_colonne(df, ['lib', 'designation'])
-            st.session_state.col_lot = trouver_colonne(df, ['lot', 'serie'])
-            st.toast(f"Fichier chargé : {len(df)} lignes")
-
-        df = st.session_state.df_ref
+
+    # Fichier de référence partagé entre les tablettes (un seul exemplaire par contenu dans le process) ;
+    # la session garde un jeton, rendu quand le fichier change ou quand la session se termine
+    jeton_ref = st.session_state.get('jeton_ref')
+    if not file_ref and jeton_ref is not None:
+        jeton_ref.liberer()
+        jeton_ref = st.session_state.jeton_ref = None
+    elif file_ref and (jeton_ref is None or st.session_state.get('file_ref_name') != file_ref.name):
+        if jeton_ref is not None:
+            jeton_ref.liberer()
+        jeton_ref = st.session_state.jeton_ref = REFERENCES.acquerir(file_ref)
+        st.session_state.file_ref_name = file_ref.name
+        if jeton_ref is None:
+            st.error("Fichier POUS illisible.")
+        else:
+            # Colonnes, index de scan et cumul par article calculés une seule fois par fichier
+            colonnes_ref = jeton_ref.reference.colonnes
+            st.session_state.col_code = colonnes_ref['code']
+            st.session_state.col_qte = colonnes_ref['qte']
+            st.session_state.col_lib = colonnes_ref['lib']
+            st.session_state.col_lot = colonnes_ref['lot']
+            # Corrections lues dans le journal et tenues à jour par lui (cette tablette, les autres,
+            # le service de scan) : elles survivent au rechargement de la page
+            jeton_ref.cumul.corrections = JOURNAL.vue_corrections(jeton_ref.reference.empreinte)
+            st.toast(f"Fichier chargé : {len(jeton_ref.reference.df)} lignes")
+
+    if file_ref and jeton_ref is not None:
+        df = jeton_ref.reference.df
+        index_ref = jeton_ref.reference.index
+        # Cumul partagé, corrections propres à la session
+        cumul_ref = jeton_ref.cumul
         
         # --- 2. BARRE DE SCAN---
         def run_search():
             query = st.session_state.scan_input
             if query:
                 # 1. Recherche initiale (Trouver au moins une ligne qui matche le scan)
-                mask = pd.Series(False, index=df.index)
-                for col in df.columns:
-                    try:
-                        mask = mask | (df[col].astype(str).str.strip().str.upper() == str(query).strip().upper())
-                    except: pass
+                res_prelim = index_ref.chercher(query)
                 
-                res_prelim = df[mask]
-                
-                if not res_prelim.empty:
+                if res_prelim is not None:
                     # --- NOUVELLE LOGIQUE D'AGRÉGATION ---
                     # A. On identifie le Code Article unique de l'objet trouvé
                     c_code = st.session_state.col_code
-                    found_article_code = res_prelim.iloc[0][c_code]
-                    
-                    # B. On va chercher TOUTES les lignes du fichier qui ont ce code article
-                    # (Cela inclut STOCK, RECYCLO, et autres lots potentiels)
-                    all_rows = df[df[c_code] == found_article_code]
-                    
-                    # C. On calcule la SOMME des quantités
-                    c_qte = st.session_state.col_qte
-                    # pd.to_numeric assure que "5" et "1" deviennent bien 6 et pas "51"
-                    total_qty = pd.to_numeric(all_rows[c_qte], errors='coerce').fillna(0).sum()
-                    
-                    # D. On construit le résultat final
-                    # On prend les infos (Libellé, EAN) de la première ligne
-                    final_item = all_rows.iloc[0].to_dict()
-                    
-                    # On ÉCRASE la quantité unitaire par la QUANTITÉ TOTALE calculée
-                    final_item[c_qte] = total_qty
+                    found_article_code = res_prelim[c_code]
                     
-                    # Bonus : Si on a cumulé plusieurs lignes, on le signale dans le champ Lot
-                    if len(all_rows) > 1:
-                        c_lot = st.session_state.col_lot
-                        if c_lot:
-                            final_item[c_lot] = "MULTI-LOTS (CUMUL)"
+                    # B. On lit le cumul de l'article (toutes ses lignes : STOCK, RECYCLO, autres lots)
+                    # précalculé au chargement, avec la quantité TOTALE et "MULTI-LOTS (CUMUL)"
+                    # dans le champ Lot si plusieurs lignes sont regroupées
+                    final_item = cumul_ref.fiche(found_article_code)
 
                     st.session_state.current_search = final_item
                     st.session_state.search_status = "found"
                 else:
                     st.session_state.current_search = None
-                    st.session_state.search_status = "not_found"
+                    # Pas de correspondance exacte : codes proches (faute de frappe) ou commençant par la saisie
+                    candidats = index_ref.candidats(query)
+                    st.session_state.candidats = candidats
+                    st.session_state.search_status = "candidats" if candidats else "not_found"
                 
                 st.session_state.scan_input = ""
 
+        def choisir_candidat(position):
+            code_candidat = df.iloc[position][st.session_state.col_code]
+            st.session_state.current_search = cumul_ref.fiche(code_candidat)
+            st.session_state.search_status = "found"
+            st.session_state.candidats = []
+
         label_scan = "SCANNER ICI"
         st.text_input(label_scan, key="scan_input", on_change=run_search, placeholder="Cliquez ici pour scanner...")
         
@@ -237,14 +366,8 @@ with tab_tournant:
                     st.write("") # Espacement
                     # Bouton OK vert et large
                     if st.button("STOCK OK", use_container_width=True):
-                        st.session_state.history.insert(0, {
-                            "Heure": datetime.now().strftime("%H:%M"),
-                            "Code": item.get(c_code),
-                            "Libellé": item.get(c_lib),
-                            "Ancien": int(qte_info),
-                            "Nouveau": int(qte_info),
-                            "Statut": "OK"
-                        })
+                        JOURNAL.ajouter(jeton_ref.reference.empreinte, item.get(c_code), item.get(c_lib),
+                                        int(qte_info), int(qte_info), "OK")
                         st.toast("Confirmé !")
                         st.session_state.current_search = None
                         st.rerun()
@@ -271,27 +394,81 @@ with tab_tournant:
                             valeur_propre = int(new_qte)
                             ancien_propre = int(qte_info) if pd.notna(qte_info) else 0
                             
-                            st.session_state.history.insert(0, {
-                                "Heure": datetime.now().strftime("%H:%M"),
-                                "Code": item.get(c_code),
-                                "Libellé": item.get(c_lib),
-                                "Ancien": ancien_propre,
-                                "Nouveau": valeur_propre,
-                                "Statut": "CORRECTION"
-                            })
+                            # Le journal tient à jour les corrections : les prochains scans affichent le stock corrigé
+                            JOURNAL.ajouter(jeton_ref.reference.empreinte, item.get(c_code), item.get(c_lib),
+                                            ancien_propre, valeur_propre, "CORRECTION")
                             st.toast("Correction sauvegardée", icon="💾")
                             st.session_state.current_search = None
                             st.rerun()
                         else:
                             st.warning("Saisissez une quantité.")
 
+        elif st.session_state.get('search_status') == "candidats":
+            st.warning("Aucun article exact. Articles proches :")
+            libelles_type = {'approche': "faute de frappe ?", 'prefixe': "début du code"}
+            c_lib = st.session_state.col_lib
+            for i, candidat in enumerate(st.session_state.get('candidats', [])):
+                libelle = df.iloc[candidat['position']][c_lib] if c_lib else ""
+                st.button(f"{candidat['cle']} — {libelle} ({libelles_type.get(candidat['type'], candidat['type'])})",
+                          key=f"candidat_{i}", on_click=choisir_candidat, args=(candidat['position'],),
+                          use_container_width=True)
+
         elif st.session_state.get('search_status') == "not_found":
             st.error("❌ Article inconnu / Code barre non trouvé")
 
-        # --- 4. HISTORIQUE) ---
+        # --- 4. HISTORIQUE (journal SQLite du fichier, toutes tablettes, lu page par page) ---
         st.write("")
-        with st.expander(f"📝 Historique de session ({len(st.session_state.history)})", expanded=False):
-            if st.session_state.history:
-                st.dataframe(pd.DataFrame(st.session_state.history), use_container_width=True)
+        nb_evenements = JOURNAL.nombre(jeton_ref.reference.empreinte)
+        with st.expander(f"📝 Historique de l'inventaire ({nb_evenements})", expanded=False):
+            if nb_evenements:
+                nb_pages = (nb_evenements - 1) // TAILLE_PAGE + 1
+                page = st.number_input("Page", min_value=1, max_value=nb_pages, value=1, step=1,
+                                       key="page_historique") if nb_pages > 1 else 1
+                st.dataframe(JOURNAL.page(jeton_ref.reference.empreinte, page), use_container_width=True,
+                             hide_index=True)
+
+                # Corrections reportées sur le fichier POUS, construit au clic
+                format_maj = st.radio("Format", formats_disponibles(), horizontal=True, key="format_tournant")
+                export_tournant = export_mise_a_jour(JOURNAL, jeton_ref.reference, format_maj)
+                date_str = datetime.now().strftime("%d-%m-%Y %Hh%M")
+                st.download_button("Mise à jour du stock (corrections)", export_tournant.donnees,
+                                   export_tournant.nom(f"STOCK TOURNANT {date_str}"), mime=export_tournant.mime,
+                                   use_container_width=True)
             else:
-                st.caption("Aucun scan effectué.")
\ No newline at end of file
+                st.caption("Aucun scan effectué.")
+
+# --- MÉMOIRE (avant / après compactage des fichiers chargés) ---
+rapports_memoire = processor.memory_report()
+jeton_ref = st.session_state.get('jeton_ref')
+if jeton_ref is not None and jeton_ref.reference.rapport is not None:
+    rapports_memoire[jeton_ref.reference.nom] = jeton_ref.reference.rapport
+with panneau_memoire:
+    for nom, rapport in rapports_memoire.items():
+        total = rapport.loc['TOTAL']
+        st.caption(f"{nom} : {total['octets_avant'] / 1024 ** 2:.1f} Mo -> "
+                   f"{total['octets_apres'] / 1024 ** 2:.1f} Mo (-{total['gain']:.0%})")
+        st.dataframe(rapport.drop(index='TOTAL')[['type_apres', 'gain']], use_container_width=True)
+    if not rapports_memoire:
+        st.caption("Aucun fichier chargé.")
+    references_partagees = REFERENCES.stats()
+    if references_partagees:
+        st.caption("Fichiers POUS partagés (inventaire tournant)")
+        st.dataframe(pd.DataFrame(references_partagees).drop(columns=['empreinte']), hide_index=True)
+    if BUDGET_MEMOIRE.actif:
+        budget = BUDGET_MEMOIRE.stats()
+        st.caption(f"Budget de traitement : {budget['reserve'] / MO:.0f} / {budget['limite'] / MO:.0f} Mo réservés")
+
+# --- DIAGNOSTIC (rempli en fin de script, une fois les étapes exécutées) ---
+if diagnostic.actif:
+    with panneau_diagnostic:
+        rapport = processor.run_report()
+        if rapport['etapes']:
+            st.dataframe(pd.DataFrame(rapport['etapes']).drop(columns=['erreur']), hide_index=True)
+            st.download_button("Rapport JSON", processor.diagnostic.rapport_json(),
+                               f"diagnostic_{datetime.now().strftime('%d-%m-%Y_%Hh%M')}.json",
+                               mime="application/json")
+            if st.button("Vider"):
+                diagnostic.vider()
+                st.rerun()
+        else:
+            st.caption("Aucune étape mesurée.")
@@ -1,8 +1,24 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
+from pandas.api.extensions import take as pd_take
 import io
-from utils import (formater_sans_decimale, nettoyer_lot, trouver_colonne, 
-                   charger_fichier_pandas, formatter_excel_simple, formatter_excel_maj)
+import threading
+from utils import (charger_fichier_pandas, lire_contenu, lire_par_blocs, FichierMemoire,
+                   LARGEURS_SIMPLE, LARGEURS_MAJ)
+from normalisation import formater_sans_decimale_serie, nettoyer_lot_serie
+from recherche import IndexRecherche, lire_scans
+from cache import empreinte_fichier, empreinte_frame
+from export import ExportDiffere, exporter
+from parallele import lancer_chargement
+from diagnostic import Diagnostic
+from compactage import compacter, rapport_memoire
+from agregation import AgregatPartiel, fusionner_agregats
+from vue_ecarts import VueEcarts
+from budget import BudgetMemoire, BudgetDepasse, estimer_memoire, estimer_memoire_final, extension
+from instantanes import Instantane, agreger, comparer_increment, empreintes_lignes, libelles_premiers
+from schemas import SCHEMAS
+from plan_lecture import PLAN_COMPARAISON, PLAN_TERRAIN_EXPORT, PLAN_INFO_EXPORT
 
 # --- CLASSE ABSTRAITE ---
 class AbstractStockProcessor(ABC):
@@ -23,34 +39,167 @@ class AbstractStockProcessor(ABC):
     def generate_final_update(self, edited_df, original_merged_df):
         pass
 
+# Taille de bloc par défaut de la comparaison en flux (lignes)
+DEFAULT_CHUNKSIZE = 100_000
+# Comparaison en flux imposée par le budget mémoire : blocs plus petits, pic plus bas
+TAILLE_BLOC_FLUX = 20_000
+# Lignes lues pour identifier les colonnes avant une comparaison en flux
+TAILLE_BLOC_ENTETE = 1_000
+# Messages de refus du budget mémoire
+CONSEIL_ATTENTE = "Réessayez quand les autres traitements en cours seront terminés."
+CONSEIL_CSV = ("Réessayez plus tard, ou exportez les deux fichiers en CSV : "
+               "ils seront comparés en flux, avec beaucoup moins de mémoire.")
+CONSEIL_FINAL_FLUX = ("Comparaison faite en flux faute de mémoire : le fichier final, qui reprend "
+                      "tout le fichier POUS, est indisponible pour l'instant.")
+
 # --- IMPLEMENTATION---
 class StockProcessor(AbstractStockProcessor):
-    def __init__(self):
+    def __init__(self, cache=None, chargement_differe=False, parallele=False, diagnostic=None,
+                 compactage=False, instantanes=None, budget=None):
         self.df_t_raw = None
         self.df_i_raw = None
         self.col_map_t = {}
         self.col_map_i = {}
+        self.search_index = None
+        # Cache partagé entre reruns (clé = empreinte du contenu des fichiers)
+        self.cache = cache
+        self.file_keys = None
+        # Chargement différé : seules les colonnes de comparaison sont lues au départ,
+        # le reste est lu par generate_final_update
+        self.chargement_differe = chargement_differe
+        self._fichiers = None
+        # Chargement parallèle : les deux fichiers sont lus en même temps (classeurs dans
+        # des processus, feuille par feuille)
+        self.parallele = parallele
+        # Clés (Code, Lot) normalisées par ligne, et première ligne Info / Terrain
+        # de chaque clé du tableau de comparaison (réutilisées par le fichier final)
+        self._cles = None
+        self._jointure = None
+        self._merged = None
+        # Table enrichie du fichier final, corrigée au fil des saisies
+        self._export = None
+        # Compactage : fichiers chargés en catégories / chaînes compactes / int32
+        self.compactage = compactage
+        self.rapports_memoire = {}
+        # Scans du journal non trouvés dans le fichier Info (load_scan_log)
+        self.scans_inconnus = None
+        # Fichier Info complet quand la comparaison est limitée aux articles scannés
+        # (le fichier final reste l'inventaire complet)
+        self._info_complet = None
+        # Instantanés des comparaisons précédentes (comparaison incrémentale) et changements
+        # de la dernière comparaison incrémentale (None après un calcul complet)
+        self.instantanes = instantanes
+        self.changements = None
+        # Budget mémoire (partagé entre sessions) : estimation du traitement en cours, réservée
+        # pendant les étapes lourdes ; par_blocs = comparaison en flux faute de mémoire
+        self.budget = budget if budget is not None else BudgetMemoire()
+        self.estimation_memoire = 0
+        # Estimation propre au fichier final, réservée même quand la comparaison vient du cache
+        self.estimation_final = 0
+        self.par_blocs = False
+        # Mesures par étape (inactives par défaut)
+        self.diagnostic = diagnostic if diagnostic is not None else Diagnostic()
+
+    def _depuis_cache(self, cle, calcul):
+        """Retourne la valeur en cache pour cle, ou la calcule et la stocke"""
+        if self.cache is None or cle is None:
+            return calcul()
+        valeur = self.cache.get(cle)
+        if valeur is None:
+            valeur = calcul()
+            if valeur is not None:
+                self.cache.set(cle, valeur)
+        return valeur
+
+    @staticmethod
+    def _identifier_colonnes(df):
+        """Identifie les colonnes code / lot / quantité / libellé (profil de schéma de l'en-tête)"""
+        return PLAN_COMPARAISON.resoudre(df)
+
+    def _charger(self, file, empreinte, plan, lecture=None):
+        """
+        Charge un fichier selon un plan de lecture, avec sa carte de colonnes (cache par contenu).
+        lecture : chargement déjà lancé en arrière-plan (Future) dont le résultat est repris.
+        """
+        def calcul():
+            if lecture is not None:
+                df = lecture.result()
+            else:
+                file.seek(0)
+                df = charger_fichier_pandas(file, plan)
+            if df is None:
+                return None
+            rapport = None
+            if self.compactage:
+                with self.diagnostic.etape('compactage', len(df)) as etape:
+                    brut, df = df, compacter(df)
+                    rapport = rapport_memoire(brut, df)
+                    etape.lignes_sortie = len(df)
+            return df, self._identifier_colonnes(df), rapport
+        charge = self._depuis_cache(self._cle_fichier(empreinte, plan), calcul)
+        if charge is None:
+            return None
+        df, col_map, rapport = charge
+        # Rapport gardé avec le fichier en cache : disponible aussi quand il n'est pas recompacté
+        if rapport is not None:
+            self.rapports_memoire[file.name] = rapport
+        return df, col_map
+
+    def _cle_fichier(self, empreinte, plan):
+        """Clé de cache d'un fichier chargé (None sans empreinte)"""
+        return empreinte and ('fichier', empreinte, plan.nom, self.compactage)
+
+    def _charger_tous(self, demandes):
+        """
+        Charge plusieurs fichiers (file, empreinte, plan). En mode parallèle, les lectures
+        absentes du cache sont lancées ensemble avant d'attendre la première.
+        """
+        lectures = [None] * len(demandes)
+        if self.parallele:
+            lectures = [None if self.cache is not None and empreinte and self._cle_fichier(empreinte, plan) in self.cache
+                        else lancer_chargement(file, plan)
+                        for file, empreinte, plan in demandes]
+        return [self._charger(file, empreinte, plan, lecture)
+                for (file, empreinte, plan), lecture in zip(demandes, lectures)]
 
     def load_data(self, file_terrain, file_info):
         """Charge les fichiers et identifie les colonnes"""
-        self.df_t_raw = charger_fichier_pandas(file_terrain)
-        self.df_i_raw = charger_fichier_pandas(file_info)
-
-        if self.df_t_raw is not None and self.df_i_raw is not None:
-            # Identification Colonnes Terrain
-            self.col_map_t = {
-                'code': trouver_colonne(self.df_t_raw, ['code', 'article', 'ref']),
-                'lot': trouver_colonne(self.df_t_raw, ['lot', 'serie', 'batch']),
-                'qte': trouver_colonne(self.df_t_raw, ['qte', 'quant', 'stock']),
-                'lib': trouver_colonne(self.df_t_raw, ['lib', 'designation', 'nom'])
-            }
-            # Identification Colonnes Info
-            self.col_map_i = {
-                'code': trouver_colonne(self.df_i_raw, ['code', 'article', 'ref']),
-                'lot': trouver_colonne(self.df_i_raw, ['lot', 'serie', 'batch']),
-                'qte': trouver_colonne(self.df_i_raw, ['qte', 'quant', 'stock']),
-                'lib': trouver_colonne(self.df_i_raw, ['lib', 'designation', 'nom'])
-            }
+        self.file_keys = None
+        if self.cache is not None:
+            with self.diagnostic.etape('empreintes'):
+                self.file_keys = (empreinte_fichier(file_terrain), empreinte_fichier(file_info))
+        h_t, h_i = self.file_keys or (None, None)
+        self._cles = self._jointure = self._merged = self._export = None
+        self._info_complet = None
+
+        self.par_blocs = False
+        self.estimation_memoire = self._estimation((file_terrain, file_info))
+        self.estimation_final = self._estimation_final((file_terrain, file_info))
+        if not self.budget.accepte(self.estimation_memoire):
+            # CSV : comparaison en flux (mémoire bornée par le nombre d'articles), sinon refus
+            if all(extension(f) == 'csv' for f in (file_terrain, file_info)):
+                estimation_flux = estimer_memoire((file_terrain, file_info), flux=True)
+                if self.budget.accepte(estimation_flux):
+                    return self._preparer_flux(file_terrain, file_info, estimation_flux)
+                self._refuser(estimation_flux, CONSEIL_ATTENTE)
+            self._refuser(self.estimation_memoire, CONSEIL_CSV)
+
+        with self.diagnostic.etape('chargement') as etape, self._reserver():
+            if self.chargement_differe:
+                # Contenu conservé pour lire les autres colonnes à l'export
+                self._fichiers = (FichierMemoire(lire_contenu(file_terrain), file_terrain.name),
+                                  FichierMemoire(lire_contenu(file_info), file_info.name))
+                charge_t, charge_i = self._charger_tous([(file_terrain, h_t, PLAN_COMPARAISON),
+                                                         (file_info, h_i, PLAN_COMPARAISON)])
+            else:
+                charge_t, charge_i = self._charger_tous([(file_terrain, h_t, PLAN_TERRAIN_EXPORT),
+                                                         (file_info, h_i, PLAN_INFO_EXPORT)])
+            etape.lignes_sortie = sum(len(c[0]) for c in (charge_t, charge_i) if c is not None)
+
+        if charge_t is not None and charge_i is not None:
+            # Identification Colonnes Terrain / Info
+            self.df_t_raw, self.col_map_t = charge_t
+            self.df_i_raw, self.col_map_i = charge_i
 
             # Vérification minimale
             required = [self.col_map_t['code'], self.col_map_t['lot'], self.col_map_t['qte'],
@@ -59,175 +208,611 @@ class StockProcessor(AbstractStockProcessor):
             return all(required)
         return False
 
+    def load_scan_log(self, file_scans, file_info, articles_scannes=True):
+        """
+        Comptage par journal de scans (scanner hors ligne) à la place du fichier Terrain.
+        Tous les scans (code, EAN ou série) sont résolus sur le fichier Info en une jointure et
+        forment le fichier Terrain. Un numéro de série est compté sur sa ligne ; un code ou un EAN
+        ne désigne pas de lot : ses scans sont comptés par article et répartis sur les lignes de
+        l'article dans l'ordre du fichier, jusqu'à leur quantité Info (le surplus va à la première).
+        Un article scanné en entier n'a donc pas d'écart, quel que soit son nombre de lots.
+        process_comparison et les exports s'utilisent ensuite comme avec load_data.
+        articles_scannes : comparaison limitée aux articles scannés (inventaire tournant), le
+        fichier final reprend quand même tout le fichier Info ; False compte les articles non
+        scannés comme absents du magasin.
+        """
+        self.file_keys = None
+        if self.cache is not None:
+            with self.diagnostic.etape('empreintes'):
+                self.file_keys = (('scans', empreinte_fichier(file_scans), articles_scannes),
+                                  empreinte_fichier(file_info))
+        h_i = self.file_keys and self.file_keys[1]
+        self._cles = self._jointure = self._merged = self._export = None
+        self._info_complet = None
+        # Fichier Info lu en entier (colonnes EAN / série pour la résolution) : pas de relecture à l'export
+        self._fichiers = None
+        self.par_blocs = False
+        self.estimation_memoire = self._estimation((file_scans, file_info))
+        self.estimation_final = self._estimation_final((file_info,))
+        if not self.budget.accepte(self.estimation_memoire):
+            self._refuser(self.estimation_memoire, CONSEIL_ATTENTE)
+
+        with self.diagnostic.etape('chargement') as etape, self._reserver():
+            charge_i = self._charger(file_info, h_i, PLAN_INFO_EXPORT)
+            etape.lignes_sortie = None if charge_i is None else len(charge_i[0])
+        if charge_i is None:
+            return False
+        df_i, self.col_map_i = charge_i
+        ic_code, ic_lot, ic_lib = self.col_map_i['code'], self.col_map_i['lot'], self.col_map_i['lib']
+        if not (ic_code and ic_lot and self.col_map_i['qte']):
+            return False
+
+        with self.diagnostic.etape('resolution scans') as etape:
+            scans = lire_scans(file_scans)
+            etape.lignes_entree = len(scans)
+            index = self._depuis_cache(h_i and ('index', h_i), lambda: IndexRecherche(df_i))
+            positions = index.premieres_positions(scans['Scan'])
+            connus = positions >= 0
+            self.scans_inconnus = (scans[~connus].groupby('Scan', sort=False)['Quantite'].sum()
+                                   .reset_index())
+            # Texte objet : isin sur des chaînes Arrow convertit chaque valeur cherchée
+            codes_i = formater_sans_decimale_serie(df_i[ic_code]).astype(object).reset_index(drop=True)
+            quantites = self._quantites_scannees(df_i, codes_i, scans, positions)
+            # Lignes comptées, et première ligne de chaque article scanné (même à quantité nulle)
+            codes_scannes = codes_i.to_numpy(dtype=object)[positions[connus]]
+            premieres = codes_i.drop_duplicates()
+            premieres = premieres[premieres.isin(codes_scannes)].index.to_numpy()
+            comptees = quantites != 0
+            comptees[premieres] = True
+            lignes = np.flatnonzero(comptees)
+            qte = quantites[lignes]
+            if np.array_equal(qte, np.round(qte)):
+                qte = qte.astype(np.int64)
+            terrain = {'code': df_i[ic_code].iloc[lignes].to_numpy(),
+                       'designation': df_i[ic_lib].iloc[lignes].to_numpy() if ic_lib else None,
+                       'lot': df_i[ic_lot].iloc[lignes].to_numpy(),
+                       'qte': qte}
+            ean_i = SCHEMAS.profil(df_i).colonnes['ean']
+            if ean_i:
+                terrain['ean'] = df_i[ean_i].iloc[lignes].to_numpy()
+            self.df_t_raw = pd.DataFrame({col: valeurs for col, valeurs in terrain.items() if valeurs is not None})
+            self.col_map_t = self._identifier_colonnes(self.df_t_raw)
+
+            if articles_scannes:
+                self._info_complet = df_i
+                df_i = df_i[codes_i.isin(codes_scannes).to_numpy()].reset_index(drop=True)
+            self.df_i_raw = df_i
+            etape.lignes_sortie = len(self.df_t_raw)
+        return True
+
+    def _quantites_scannees(self, df_i, codes_i, scans, positions):
+        """
+        Quantité scannée par ligne Info : séries sur leur ligne, codes / EAN par article, répartis
+        sur ses lignes dans l'ordre du fichier jusqu'à leur quantité restante (surplus sur la première)
+        """
+        quantites = np.zeros(len(df_i))
+        scannes = scans['Quantite'].to_numpy()
+        connus = positions >= 0
+
+        # Numéros de série : ligne exacte
+        sur_serie = np.full(len(scans), -1, dtype=np.intp)
+        ser_i = SCHEMAS.profil(df_i).colonnes['ser']
+        if ser_i:
+            series = formater_sans_decimale_serie(df_i[ser_i]).str.upper()
+            series = pd.Series(np.arange(len(df_i)), index=series.to_numpy(dtype=object))
+            series = series[(series.index != "") & ~series.index.duplicated()]
+            cles = formater_sans_decimale_serie(scans['Scan'].astype(object)).str.upper()
+            trouves = series.index.get_indexer(cles.to_numpy(dtype=object))
+            sur_serie = np.where(trouves >= 0, series.to_numpy()[trouves], -1)
+        exacts = sur_serie >= 0
+        np.add.at(quantites, sur_serie[exacts], scannes[exacts])
+
+        # Codes / EAN : total par article, réparti sur les lignes de l'article
+        par_article = connus & ~exacts
+        codes = codes_i.to_numpy(dtype=object)
+        totaux = pd.Series(scannes[par_article]).groupby(codes[positions[par_article]], sort=False).sum()
+        if totaux.empty:
+            return quantites
+        lignes = np.flatnonzero(codes_i.isin(totaux.index).to_numpy(dtype=bool))
+        articles = codes[lignes]
+        qte_i = pd.to_numeric(df_i[self.col_map_i['qte']], errors='coerce').fillna(0).to_numpy()
+        capacite = np.clip(qte_i[lignes] - quantites[lignes], 0, None)
+        cumul = pd.Series(capacite).groupby(articles, sort=False).cumsum().to_numpy()
+        total = totaux.reindex(articles).to_numpy(dtype=np.float64)
+        repartis = np.clip(total - (cumul - capacite), 0, capacite)
+        premiere = ~pd.Series(articles).duplicated().to_numpy()
+        reste = totaux - pd.Series(repartis).groupby(articles, sort=False).sum()
+        repartis[premiere] += reste.reindex(articles[premiere]).to_numpy(dtype=np.float64)
+        quantites[lignes] += repartis
+        return quantites
+
+    def _frames_export(self):
+        """Fichiers Terrain / Info avec les colonnes nécessaires au fichier final"""
+        if not self.chargement_differe or self._fichiers is None:
+            return self.df_t_raw, self.df_i_raw if self._info_complet is None else self._info_complet
+        h_t, h_i = self.file_keys or (None, None)
+        file_t, file_i = self._fichiers
+        with self.diagnostic.etape('chargement export') as etape:
+            (df_t, _), (df_i, _) = self._charger_tous([(file_t, h_t, PLAN_TERRAIN_EXPORT),
+                                                       (file_i, h_i, PLAN_INFO_EXPORT)])
+            etape.lignes_sortie = len(df_t) + len(df_i)
+        return df_t, df_i
+
+    def _estimation(self, files):
+        """Estimation mémoire du traitement, nulle si la comparaison est déjà en cache"""
+        if not self.budget.actif:
+            return 0
+        if self.cache is not None and self.file_keys and ('comparaison',) + self.file_keys in self.cache:
+            return 0
+        return estimer_memoire(files)
+
+    def _estimation_final(self, files):
+        """Estimation mémoire du fichier final (indépendante du cache de comparaison)"""
+        return estimer_memoire_final(files) if self.budget.actif else 0
+
+    def _reserver(self, conseil=None):
+        """Réserve l'estimation du traitement pendant une étape lourde"""
+        return self.budget.reserver(self.estimation_memoire, CONSEIL_ATTENTE if conseil is None else conseil)
+
+    def _refuser(self, estimation, conseil):
+        raise BudgetDepasse(estimation, self.budget.disponible(), self.budget.limite, conseil)
+
+    def _preparer_flux(self, file_terrain, file_info, estimation):
+        """
+        Comparaison en flux à la place du chargement : seules les colonnes sont identifiées
+        ici (premier bloc de chaque fichier), process_comparison lit ensuite les fichiers par blocs
+        """
+        self.par_blocs = True
+        self.estimation_memoire = estimation
+        self._fichiers = (FichierMemoire(lire_contenu(file_terrain), file_terrain.name),
+                          FichierMemoire(lire_contenu(file_info), file_info.name))
+        col_maps = []
+        for file in self._fichiers:
+            file.seek(0)
+            blocs = lire_par_blocs(file, TAILLE_BLOC_ENTETE, PLAN_COMPARAISON)
+            bloc = next(blocs, None)
+            blocs.close()
+            if bloc is None:
+                return False
+            col_maps.append(self._identifier_colonnes(bloc))
+        self.col_map_t, self.col_map_i = col_maps
+        self.df_t_raw = self.df_i_raw = None
+        return all(col_map[role] for col_map in col_maps for role in ('code', 'lot', 'qte'))
+
+    def cache_stats(self):
+        """Compteurs hits / misses du cache (None sans cache)"""
+        return self.cache.stats() if self.cache is not None else None
+
+    def memory_report(self):
+        """Mémoire par colonne avant / après compactage des fichiers chargés (par nom de fichier)"""
+        return dict(self.rapports_memoire)
+
+    def run_report(self):
+        """Rapport des étapes mesurées (durée, lignes, mémoire), vide si le diagnostic est inactif"""
+        return self.diagnostic.rapport()
+
     def process_comparison(self):
-        """Exécute la logique de nettoyage et de fusion"""
-        df_t = self.df_t_raw.copy()
-        df_i = self.df_i_raw.copy()
-        
-        tc_code, ic_code = self.col_map_t['code'], self.col_map_i['code']
-        tc_lot, ic_lot = self.col_map_t['lot'], self.col_map_i['lot']
+        """
+        Exécute la logique de nettoyage et de fusion.
+        Le résultat peut provenir du cache : ne pas le modifier en place.
+        """
+        if self.par_blocs:
+            cle = self.file_keys and ('comparaison en flux',) + self.file_keys
+            merged = self._depuis_cache(cle, self._comparer_en_flux)
+            self._cles = self._jointure = self.changements = None
+            self._merged = merged
+            return merged
+        cle = self.file_keys and ('comparaison',) + self.file_keys
+        with self.diagnostic.etape('comparaison', len(self.df_t_raw) + len(self.df_i_raw)) as etape:
+            merged, self._cles, self._jointure, self.changements = self._depuis_cache(cle, self._comparer_reserve)
+            etape.lignes_sortie = len(merged)
+        self._merged = merged
+        return merged
+
+    def _comparer_reserve(self):
+        with self._reserver():
+            return self._comparer()
+
+    def _comparer_en_flux(self):
+        with self._reserver():
+            file_t, file_i = self._fichiers
+            return self.process_comparison_chunked(file_t, file_i, chunksize=TAILLE_BLOC_FLUX)
+
+    def _fichiers_comparaison(self):
+        """Fichiers Info / Terrain avec leurs colonnes de comparaison et l'empreinte de chaque ligne"""
+        fichiers = {}
+        with self.diagnostic.etape('empreintes des lignes', len(self.df_t_raw) + len(self.df_i_raw)):
+            for cote, df, col_map in (('i', self.df_i_raw, self.col_map_i), ('t', self.df_t_raw, self.col_map_t)):
+                colonnes = (col_map['code'], col_map['lot'], col_map['qte'], col_map['lib'])
+                hachees = list(dict.fromkeys(col for col in colonnes if col))
+                fichiers[cote] = (df, colonnes, empreintes_lignes(df, hachees))
+        return fichiers
+
+    def _comparer(self):
+        # Instantanés : nouvelle extraction comparée ligne à ligne à une comparaison précédente
+        fichiers = None
+        if self.instantanes is not None and self.file_keys:
+            fichiers = self._fichiers_comparaison()
+            for precedente in self.instantanes.candidates():
+                with self.diagnostic.etape('comparaison incrementale') as etape:
+                    resultat = comparer_increment(precedente, fichiers)
+                    etape.lignes_sortie = None if resultat is None else len(resultat[1])
+                if resultat is not None:
+                    entree, merged, changements = resultat
+                    self.instantanes.enregistrer(self.file_keys, entree)
+                    cles = {cote: (entree[cote].codes, entree[cote].lots) for cote in ('t', 'i')}
+                    merged, jointure = self._sans_positions(merged)
+                    return merged, cles, jointure, changements
+
         tc_qte, ic_qte = self.col_map_t['qte'], self.col_map_i['qte']
         tc_lib, ic_lib = self.col_map_t['lib'], self.col_map_i['lib']
 
-        # Standardisation
-        df_t[tc_code] = df_t[tc_code].apply(formater_sans_decimale)
-        df_i[ic_code] = df_i[ic_code].apply(formater_sans_decimale)
-        df_t['Lot_Clean'] = df_t[tc_lot].apply(nettoyer_lot)
-        df_i['Lot_Clean'] = df_i[ic_lot].apply(nettoyer_lot)
-
-        # Dictionnaire Libellés
-        lib_master = {}
-        if tc_lib:
-            temp = df_t[[tc_code, tc_lib]].dropna().drop_duplicates(subset=[tc_code])
-            lib_master.update(dict(zip(temp[tc_code], temp[tc_lib])))
-        if ic_lib:
-            temp = df_i[[ic_code, ic_lib]].dropna().drop_duplicates(subset=[ic_code])
-            lib_master.update(dict(zip(temp[ic_code], temp[ic_lib])))
-
-        # Agrégation
-        t_agg = df_t.groupby([tc_code, 'Lot_Clean'])[tc_qte].sum().reset_index()
-        t_agg.columns = ['Code', 'Lot', 'Qte_Terrain']
-        i_agg = df_i.groupby([ic_code, 'Lot_Clean'])[ic_qte].sum().reset_index()
-        i_agg.columns = ['Code', 'Lot', 'Qte_Info']
+        nb_lignes = len(self.df_t_raw) + len(self.df_i_raw)
+
+        # Standardisation (clés conservées pour le fichier final)
+        with self.diagnostic.etape('normalisation', nb_lignes) as etape:
+            cles = self._cles_jointure()
+            etape.lignes_sortie = nb_lignes
+        t_codes, t_lots = cles['t']
+        i_codes, i_lots = cles['i']
+
+        # Dictionnaire Libellés (premier libellé de chaque code, Info prioritaire)
+        with self.diagnostic.etape('libelles', nb_lignes) as etape:
+            lib_t = libelles_premiers(t_codes, self.df_t_raw[tc_lib]) if tc_lib else {}
+            lib_i = libelles_premiers(i_codes, self.df_i_raw[ic_lib]) if ic_lib else {}
+            lib_master = {**lib_t, **lib_i}
+            etape.lignes_sortie = len(lib_master)
+
+        # Agrégation (avec la première ligne de chaque clé, réutilisée par le fichier final)
+        with self.diagnostic.etape('agregation', nb_lignes) as etape:
+            t_agg = agreger(t_codes, t_lots, self.df_t_raw[tc_qte], np.arange(len(self.df_t_raw)),
+                            'Qte_Terrain', '_Pos_Terrain')
+            i_agg = agreger(i_codes, i_lots, self.df_i_raw[ic_qte], np.arange(len(self.df_i_raw)),
+                            'Qte_Info', '_Pos_Info')
+            etape.lignes_sortie = len(t_agg) + len(i_agg)
 
         # Fusion
-        merged = pd.merge(i_agg, t_agg, on=['Code', 'Lot'], how='outer')
-        merged[['Qte_Info', 'Qte_Terrain']] = merged[['Qte_Info', 'Qte_Terrain']].fillna(0)
-        
-        merged['Libellé'] = merged['Code'].map(lib_master).fillna("LIBELLÉ INCONNU")
-        merged['_Original_Info'] = merged['Qte_Info']
-        merged['Ecart'] = merged['Qte_Info'] - merged['Qte_Terrain']
-        
+        with self.diagnostic.etape('fusion', len(t_agg) + len(i_agg)) as etape:
+            merged_complet = fusionner_agregats(i_agg, t_agg, lib_master)
+            merged, jointure = self._sans_positions(merged_complet)
+            etape.lignes_sortie = len(merged)
+
+        if fichiers is not None:
+            # Point de départ de la prochaine extraction
+            self.instantanes.enregistrer(self.file_keys, {
+                'i': Instantane(fichiers['i'][1], fichiers['i'][2], i_codes, i_lots, i_agg, lib_i),
+                't': Instantane(fichiers['t'][1], fichiers['t'][2], t_codes, t_lots, t_agg, lib_t),
+                'merged': merged_complet,
+            })
+        return merged, cles, jointure, None
+
+    @staticmethod
+    def _sans_positions(merged):
+        """Tableau sans les colonnes _Pos_*, et première ligne Info / Terrain de chaque clé (-1 si absente)"""
+        jointure = {
+            'i': merged['_Pos_Info'].fillna(-1).to_numpy(dtype=np.intp),
+            't': merged['_Pos_Terrain'].fillna(-1).to_numpy(dtype=np.intp),
+        }
+        return merged.drop(columns=['_Pos_Info', '_Pos_Terrain']), jointure
+
+    def discrepancy_view(self, merged=None):
+        """
+        Écarts du tableau de comparaison avec tris et texte de recherche précalculés,
+        pour l'affichage page par page (partagé via le cache, ne pas modifier)
+        """
+        merged = self._merged if merged is None else merged
+        cle = self.file_keys and merged is self._merged and ('ecarts',) + self.file_keys
+        with self.diagnostic.etape('vue des ecarts', len(merged)) as etape:
+            vue = self._depuis_cache(cle or None, lambda: VueEcarts(merged))
+            etape.lignes_sortie = len(vue)
+        return vue
+
+    def process_comparison_chunked(self, file_terrain, file_info, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Comparaison en flux : les CSV sont lus par blocs de chunksize lignes et les sommes
+        (Code, Lot) cumulées au fil de l'eau. Même résultat que process_comparison, avec
+        une mémoire bornée par le nombre d'articles et non par la taille des fichiers.
+        Retourne None si un fichier est illisible ou sans colonnes code / lot / quantité.
+        """
+        with self.diagnostic.etape('comparaison en flux') as etape:
+            merged = self._comparer_par_blocs(file_terrain, file_info, chunksize)
+            etape.lignes_sortie = None if merged is None else len(merged)
         return merged
 
+    def _comparer_par_blocs(self, file_terrain, file_info, chunksize):
+        agregats = {}
+        for cote, file in (('Qte_Terrain', file_terrain), ('Qte_Info', file_info)):
+            file.seek(0)
+            agregat, col_map = AgregatPartiel(cote), None
+            try:
+                for bloc in lire_par_blocs(file, chunksize, PLAN_COMPARAISON):
+                    if col_map is None:
+                        col_map = self._identifier_colonnes(bloc)
+                        if not all(col_map[role] for role in ('code', 'lot', 'qte')):
+                            return None
+                    agregat.ajouter(bloc, col_map['code'], col_map['lot'], col_map['qte'], col_map['lib'])
+            except Exception:
+                return None
+            if col_map is None:
+                return None
+            agregats[cote] = agregat
+
+        # Libellés : Terrain d'abord, Info prioritaire
+        libelles = pd.concat([agregats['Qte_Info'].libelles, agregats['Qte_Terrain'].libelles])
+        lib_master = libelles[~libelles.index.duplicated()]
+        return fusionner_agregats(agregats['Qte_Info'].resultat(),
+                                  agregats['Qte_Terrain'].resultat(), lib_master)
+
     def generate_diff_report(self, edited_df):
         """Génère le fichier Excel simple des écarts"""
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            export_rpt = edited_df[['Code', 'Libellé', 'Lot', 'Qte_Terrain', 'Qte_Info', 'Ecart_Final']]
-            formatter_excel_simple(export_rpt, writer, "Rapport Ecarts")
-        return buffer
+        return io.BytesIO(self.diff_report_export(edited_df).donnees())
 
     def generate_final_update(self, edited_df, original_merged_df):
         """Logique complexe de reconstruction du fichier final"""
-        # 1. Mise à jour globale
-        df_global = original_merged_df.copy()
-        df_global.set_index(['Code', 'Lot'], inplace=True)
-        df_corrections = edited_df.set_index(['Code', 'Lot'])
-        df_global.update(df_corrections[['Qte_Info']])
-        df_global.reset_index(inplace=True)
-        
-        df_valid_full = df_global[df_global['Qte_Info'] != 0].copy()
-
-        # 2. Identification Metadata
-        def find_i(keys): return trouver_colonne(self.df_i_raw, keys)
-        def find_t(keys): return trouver_colonne(self.df_t_raw, keys)
-
-        # Mapping des colonnes avancées
-        cols_meta = {
-            'ean': (find_i(['ean', 'code_barre']), find_t(['ean', 'code_barre'])),
-            'ser': (find_i(['serie', 'serial', 's/n']), find_t(['serie', 'serial'])),
-            'emp': (find_i(['emplacement', 'rack']), find_t(['emplacement', 'rack'])),
-            'site': (find_i(['site', 'magasin']), find_t(['site', 'magasin'])),
-            'um': (find_i(['um', 'unite']), find_t(['um', 'unite'])),
-            'res': find_i(['reserve', 'réserv']),
-            'dispo': find_i(['dispo', 'utilisable'])
+        return io.BytesIO(self.final_update_export(edited_df, original_merged_df).donnees())
+
+    def diff_report_export(self, edited_df, fmt='xlsx'):
+        """Rapport des écarts, construit seulement quand il est demandé (xlsx, csv ou parquet)"""
+        export_rpt = edited_df[['Code', 'Libellé', 'Lot', 'Qte_Terrain', 'Qte_Info', 'Ecart_Final']]
+
+        def calcul():
+            cle = ('rapport', fmt, empreinte_frame(export_rpt)) if self.cache is not None else None
+            return self._depuis_cache(cle, lambda: self._ecrire(export_rpt, fmt, LARGEURS_SIMPLE, "Rapport Ecarts"))
+        return ExportDiffere(calcul, fmt)
+
+    def final_update_export(self, edited_df, original_merged_df, fmt='xlsx'):
+        """Fichier final de mise à jour, construit seulement quand il est demandé"""
+        def calcul():
+            if self.par_blocs:
+                # Le fichier final reprend toutes les lignes Info : pas de version en flux
+                self._refuser(estimer_memoire(self._fichiers), CONSEIL_FINAL_FLUX)
+            cle = None
+            if self.file_keys:
+                cle = ('final', fmt) + self.file_keys + (
+                    empreinte_frame(edited_df[['Code', 'Lot', 'Qte_Info']]),
+                    empreinte_frame(original_merged_df[['Code', 'Lot', 'Qte_Info']]))
+            return self._depuis_cache(
+                cle, lambda: self._construire_fichier_final(edited_df, original_merged_df, fmt))
+        return ExportDiffere(calcul, fmt)
+
+    def _cles_jointure(self):
+        """Clés (Code, Lot) normalisées de chaque ligne Terrain / Info, calculées une fois"""
+        if self._cles is None:
+            self._cles = {
+                't': (formater_sans_decimale_serie(self.df_t_raw[self.col_map_t['code']]),
+                      nettoyer_lot_serie(self.df_t_raw[self.col_map_t['lot']])),
+                'i': (formater_sans_decimale_serie(self.df_i_raw[self.col_map_i['code']]),
+                      nettoyer_lot_serie(self.df_i_raw[self.col_map_i['lot']])),
+            }
+        return self._cles
+
+    @staticmethod
+    def _premieres_positions(cles, codes, lots):
+        """Position de la première ligne de chaque (Code, Lot) demandé, -1 si absent"""
+        premiers = pd.DataFrame({'Code': cles[0].to_numpy(), 'Lot': cles[1].to_numpy()})
+        premiers = premiers.drop_duplicates()
+        index = pd.MultiIndex.from_arrays([premiers['Code'], premiers['Lot']])
+        positions = index.get_indexer(pd.MultiIndex.from_arrays([codes, lots]))
+        return np.where(positions >= 0, premiers.index.to_numpy()[positions], -1)
+
+    @staticmethod
+    def _aligner(serie, positions):
+        """Valeurs de serie aux positions données (NaN pour -1)"""
+        valeurs = pd_take(serie.array, positions, allow_fill=True)
+        # Catégories propres à chaque fichier : valeurs simples pour combiner Info et Terrain
+        return np.asarray(valeurs, dtype=object) if isinstance(valeurs, pd.Categorical) else valeurs
+
+    @classmethod
+    def _aligner_formate(cls, serie, positions):
+        """EAN / série alignés puis formatés (vide si absent de la ligne, NaN si pas de ligne)"""
+        valeurs = formater_sans_decimale_serie(pd.Series(cls._aligner(serie, positions)))
+        return valeurs.where(positions >= 0)
+
+    def _etat_export(self, original_merged_df):
+        """
+        Table enrichie de toutes les lignes du tableau de comparaison (quantités d'origine),
+        construite une fois par tableau puis corrigée sur place. Partagée via le cache.
+        """
+        etat = self._export
+        if etat is None or etat['merged'] is not original_merged_df:
+            cle = self.file_keys and ('export',) + self.file_keys
+            etat = self._depuis_cache(cle, lambda: self._construire_etat_export(original_merged_df))
+            if etat['merged'] is not original_merged_df:
+                etat = self._construire_etat_export(original_merged_df)
+                if cle:
+                    self.cache.set(cle, etat)
+            self._export = etat
+        return etat
+
+    def _construire_etat_export(self, original_merged_df):
+        """Plan de colonnes résolu une fois et projeté sur toutes les lignes du tableau"""
+        # 1. Identification Metadata (colonnes complètes lues ici en mode différé)
+        df_t_raw, df_i_raw = self._frames_export()
+        meta_i = SCHEMAS.profil(df_i_raw).colonnes
+        meta_t = SCHEMAS.profil(df_t_raw).colonnes
+
+        # 2. Lignes du fichier final et première ligne Info / Terrain de chaque (Code, Lot)
+        lignes, pos_i, pos_t = self._lignes_export(original_merged_df)
+        qte_info = lignes['Qte_Info'].to_numpy()
+        codes = lignes['Code'].to_numpy()
+        lots = lignes['Lot'].to_numpy()
+        libelles = lignes['Libellé'].to_numpy()
+
+        # 3. Plan de colonnes : valeurs calculées (par priorité croissante)
+        calculees = {}
+        ean_i, ean_t = meta_i['ean'], meta_t['ean']
+        site_i, site_t = meta_i['site'], meta_t['site']
+        if site_i:
+            # Site par défaut : valeur la plus fréquente des premières lignes Info par clé
+            site_base = df_i_raw[site_i].iloc[pos_i[pos_i >= 0]]
+            default_site = site_base.mode()[0] if not site_base.dropna().empty else ""
+            site = pd.Series(self._aligner(df_i_raw[site_i], pos_i))
+            if site_t:
+                site = site.fillna(pd.Series(self._aligner(df_t_raw[site_t], pos_t)))
+            calculees[site_i] = site.fillna(default_site).to_numpy()
+        if ean_i:
+            ean = self._aligner_formate(df_i_raw[ean_i], pos_i)
+            if ean_t:
+                ean = ean.fillna(self._aligner_formate(df_t_raw[ean_t], pos_t))
+            calculees[ean_i] = ean.fillna("").to_numpy()
+        ser_i = meta_i['ser']
+        if ser_i:
+            calculees[ser_i] = self._aligner_formate(df_i_raw[ser_i], pos_i).to_numpy()
+        dispo_i = meta_i['dispo']
+        if dispo_i:
+            calculees[dispo_i] = qte_info
+        calculees[self.col_map_i['lib']] = libelles
+        calculees[self.col_map_i['qte']] = qte_info
+        calculees[self.col_map_i['lot']] = lots
+        calculees[self.col_map_i['code']] = codes
+        calculees.pop(None, None)
+
+        # 4. Projection : colonnes Info alignées en un seul reindex, valeurs calculées par-dessus
+        colonnes = [col for col in df_i_raw.columns if col not in ['Code_Join', 'Lot_Join', 'Lot_Clean']]
+        copiees = [col for col in colonnes if col not in calculees]
+        table = df_i_raw[copiees].set_axis(pd.RangeIndex(len(df_i_raw))).reindex(pos_i)
+        table = table.set_axis(pd.RangeIndex(len(pos_i))).assign(
+            **{col: calculees[col] for col in colonnes if col in calculees})[colonnes]
+
+        return {
+            'merged': original_merged_df,
+            'table': table,
+            'cles': pd.MultiIndex.from_arrays([codes, lots]),
+            # Colonnes qui portent la quantité (quantité, disponible)
+            'colonnes_qte': [col for col in colonnes
+                             if calculees.get(col) is qte_info],
+            'qte_base': qte_info,
+            'qte': qte_info.copy(),
+            'corrigees': set(),
+            'verrou': threading.Lock(),
         }
 
-        # 3. Préparation Bases (Info & Terrain)
-        df_base = self.df_i_raw.copy()
-        df_base['Code_Join'] = df_base[self.col_map_i['code']].apply(formater_sans_decimale)
-        df_base['Lot_Join'] = df_base[self.col_map_i['lot']].apply(nettoyer_lot)
-        
-        # Nettoyage EAN/Series dans la base
-        if cols_meta['ean'][0]: df_base[cols_meta['ean'][0]] = df_base[cols_meta['ean'][0]].apply(formater_sans_decimale)
-        if cols_meta['ser'][0]: df_base[cols_meta['ser'][0]] = df_base[cols_meta['ser'][0]].apply(formater_sans_decimale)
-        
-        df_base = df_base.drop_duplicates(subset=['Code_Join', 'Lot_Join'])
-
-        df_backup = self.df_t_raw.copy()
-        df_backup['Code_Join'] = df_backup[self.col_map_t['code']].apply(formater_sans_decimale)
-        df_backup['Lot_Join'] = df_backup[self.col_map_t['lot']].apply(nettoyer_lot)
-        
-        if cols_meta['ean'][1]: df_backup[cols_meta['ean'][1]] = df_backup[cols_meta['ean'][1]].apply(formater_sans_decimale)
-        if cols_meta['ser'][1]: df_backup[cols_meta['ser'][1]] = df_backup[cols_meta['ser'][1]].apply(formater_sans_decimale)
-        
-        df_backup = df_backup.drop_duplicates(subset=['Code_Join', 'Lot_Join'])
-
-        # 4. Fusion Riche
-        df_step1 = pd.merge(df_valid_full, df_base, left_on=['Code', 'Lot'], right_on=['Code_Join', 'Lot_Join'], how='left', suffixes=('', '_info'))
-        df_final_rich = pd.merge(df_step1, df_backup, left_on=['Code', 'Lot'], right_on=['Code_Join', 'Lot_Join'], how='left', suffixes=('', '_terr'))
-
-        # 5. Reconstruction colonne par colonne
-        df_export = pd.DataFrame()
-        default_site = ""
-        if cols_meta['site'][0] and not df_base[cols_meta['site'][0]].dropna().empty:
-            default_site = df_base[cols_meta['site'][0]].mode()[0]
-
-        for col in self.df_i_raw.columns:
-            if col in ['Code_Join', 'Lot_Join', 'Lot_Clean']: continue
-            
-            # Mapping direct des valeurs calculées
-            if col == self.col_map_i['code']: df_export[col] = df_final_rich['Code']
-            elif col == self.col_map_i['lot']: df_export[col] = df_final_rich['Lot']
-            elif col == self.col_map_i['qte']: df_export[col] = df_final_rich['Qte_Info']
-            elif col == self.col_map_i['lib']: df_export[col] = df_final_rich['Libellé']
-            elif cols_meta['dispo'] and col == cols_meta['dispo']: df_export[col] = df_final_rich['Qte_Info']
-            
-            # Logique de fallback (Info -> Terrain -> Vide)
-            elif cols_meta['ean'][0] and col == cols_meta['ean'][0]:
-                df_export[col] = df_final_rich[col].fillna(df_final_rich.get(f"{cols_meta['ean'][1]}_terr")).fillna("")
-            
-            elif cols_meta['site'][0] and col == cols_meta['site'][0]:
-                df_export[col] = df_final_rich[col].fillna(df_final_rich.get(f"{cols_meta['site'][1]}_terr")).fillna(default_site)
-            
-            # Gestion générique des autres colonnes
-            else:
-                if col in df_final_rich.columns:
-                    df_export[col] = df_final_rich[col]
-                elif f"{col}_info" in df_final_rich.columns:
-                    df_export[col] = df_final_rich[f"{col}_info"]
-                else:
-                    df_export[col] = ""
+    def _lignes_export(self, original_merged_df):
+        """
+        Lignes (Code, Lot, Libellé, Qte_Info) du fichier final et première ligne Info / Terrain de
+        chacune : reprise de la comparaison quand le tableau fourni est celui de process_comparison,
+        recherche par clé sinon. Comparaison limitée aux articles scannés : les articles non scannés
+        du fichier Info complet sont ajoutés avec leur quantité d'origine.
+        """
+        lignes = original_merged_df[['Code', 'Lot', 'Libellé', 'Qte_Info']]
+        codes, lots = lignes['Code'].to_numpy(), lignes['Lot'].to_numpy()
+        if self._jointure is not None and self._merged is original_merged_df:
+            pos_i, pos_t = self._jointure['i'], self._jointure['t']
+        else:
+            cles = self._cles_jointure()
+            pos_i = self._premieres_positions(cles['i'], codes, lots)
+            pos_t = self._premieres_positions(cles['t'], codes, lots)
+        if self._info_complet is None:
+            return lignes, pos_i, pos_t
+
+        df_i = self._info_complet
+        codes_i = formater_sans_decimale_serie(df_i[self.col_map_i['code']]).reset_index(drop=True)
+        lots_i = nettoyer_lot_serie(df_i[self.col_map_i['lot']]).reset_index(drop=True)
+        # Positions dans le fichier Info complet (celles de la comparaison portent sur les articles scannés)
+        pos_i = self._premieres_positions((codes_i, lots_i), codes, lots)
+        autres = np.flatnonzero(~codes_i.isin(lignes['Code']).to_numpy(dtype=bool))
+        if not len(autres):
+            return lignes, pos_i, pos_t
+        codes_a, lots_a = codes_i.take(autres).reset_index(drop=True), lots_i.take(autres).reset_index(drop=True)
+        agg = agreger(codes_a, lots_a, df_i[self.col_map_i['qte']].take(autres).reset_index(drop=True),
+                      autres, 'Qte_Info', '_Pos_Info')
+        col_lib = self.col_map_i['lib']
+        libelles = libelles_premiers(codes_a, df_i[col_lib].take(autres).reset_index(drop=True)) if col_lib else {}
+        agg['Libellé'] = agg['Code'].map(libelles).fillna("LIBELLÉ INCONNU")
+        # Même ordre (Code, Lot) que le tableau de comparaison
+        tout = pd.concat([lignes.assign(_Pos_Info=pos_i, _Pos_Terrain=pos_t),
+                          agg.assign(_Pos_Terrain=-1)], ignore_index=True)
+        tout = tout.sort_values(['Code', 'Lot'], kind='stable', ignore_index=True)
+        return (tout[['Code', 'Lot', 'Libellé', 'Qte_Info']], tout['_Pos_Info'].to_numpy(dtype=np.intp),
+                tout['_Pos_Terrain'].to_numpy(dtype=np.intp))
+
+    @staticmethod
+    def _appliquer_corrections(etat, edited_df):
+        """
+        Ramène l'état aux quantités d'origine + corrections de edited_df, en ne touchant
+        que les lignes corrigées maintenant ou lors de l'appel précédent.
+        """
+        positions = etat['cles'].get_indexer(pd.MultiIndex.from_arrays([edited_df['Code'], edited_df['Lot']]))
+        corr = edited_df['Qte_Info'].to_numpy()
+        ok = (positions >= 0) & pd.notna(corr)
+        positions, corr = positions[ok], corr[ok]
+
+        qte, base = etat['qte'], etat['qte_base']
+        # Lignes corrigées auparavant et plus maintenant : retour à la quantité d'origine
+        annulees = np.fromiter(etat['corrigees'].difference(positions.tolist()), dtype=np.intp)
+        qte[annulees] = base[annulees]
+        qte[positions] = corr
+        etat['corrigees'] = set(positions.tolist())
 
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            formatter_excel_maj(df_export, writer, "Inventaire_Complet")
-        
-        return buffer
+    def build_final_export(self, edited_df, original_merged_df):
+        """
+        Tableau final au format du fichier Info. Chaque colonne de sortie a une source
+        résolue une fois (valeur calculée, colonne Info, repli Terrain, site par défaut).
+        La table enrichie est conservée : une nouvelle saisie ne corrige que les lignes
+        (Code, Lot) modifiées, puis les lignes à quantité nulle sont écartées.
+        """
+        with self.diagnostic.etape('table finale', len(edited_df)) as etape:
+            etat = self._etat_export(original_merged_df)
+            with etat['verrou']:
+                self._appliquer_corrections(etat, edited_df)
+                valide = etat['qte'] != 0
+                df_export = etat['table'].assign(**{col: etat['qte'] for col in etat['colonnes_qte']})
+            if not valide.all():
+                df_export = df_export[valide].reset_index(drop=True)
+            etape.lignes_sortie = len(df_export)
+        return df_export
+
+    def _construire_fichier_final(self, edited_df, original_merged_df, fmt='xlsx'):
+        with self.budget.reserver(self.estimation_final, CONSEIL_ATTENTE):
+            df_export = self.build_final_export(edited_df, original_merged_df)
+        return self._ecrire(df_export, fmt, LARGEURS_MAJ, "Inventaire_Complet")
+
+    def _ecrire(self, df, fmt, largeurs, feuille):
+        """Écriture d'un fichier exporté (mesurée comme une étape)"""
+        with self.diagnostic.etape(f'ecriture {feuille} ({fmt})', len(df)) as etape:
+            contenu = exporter(df, fmt, largeurs, feuille)
+            etape.lignes_sortie = len(df)
+        return contenu
 
-    def search_item(self, df_source, query):
+    def build_search_index(self, df_source, toutes_colonnes=False):
+        """Construit l'index de scan (code, EAN, série) du fichier de référence"""
+        with self.diagnostic.etape('index de recherche', len(df_source)) as etape:
+            self.search_index = IndexRecherche(df_source, toutes_colonnes=toutes_colonnes)
+            etape.lignes_sortie = len(df_source)
+        return self.search_index
+
+    def search_item(self, df_source, query, approche=False):
         """
         Cherche un article par Code, EAN ou Série.
         Retourne la ligne correspondante (Series) ou None.
+        approche : sans correspondance exacte, retourne le meilleur candidat (faute de frappe, préfixe).
         """
         if df_source is None or not query:
             return None
             
-        q = str(query).strip().upper()
-        
-        # On définit les colonnes où chercher
-        cols_to_search = []
-        
-        # On récupère les noms de colonnes identifiés lors du chargement
-        keys_to_check = ['code', 'ean', 'serie'] # clés internes mapping
-        
-        
-        for col in df_source.columns:
-            col_str = str(col).upper()
-            pass
-
-        mask = pd.Series(False, index=df_source.index)
-        
-        for col in df_source.columns:
-            try:
-                col_normalized = df_source[col].astype(str).str.strip().str.upper()
-                mask = mask | (col_normalized == q)
-            except:
-                pass
-        
-        results = df_source[mask]
-        
-        if not results.empty:
-            return results.iloc[0]
-        return None
\ No newline at end of file
+        # Index construit une seule fois par fichier de référence
+        if self.search_index is None or self.search_index.df is not df_source:
+            self.build_search_index(df_source)
+
+        ligne = self.search_index.chercher(query)
+        if ligne is None and approche:
+            candidats = self.search_index.candidats(query, limite=1)
+            if candidats:
+                ligne = df_source.iloc[candidats[0]['position']]
+        return ligne
+
+    def search_candidates(self, df_source, query, limite=10):
+        """
+        Lignes candidates pour une saisie (exacte, faute de frappe, préfixe de code / EAN),
+        les plus probables d'abord, avec les colonnes Correspondance, Type et Distance.
+        """
+        if df_source is None or not query:
+            return None
+        if self.search_index is None or self.search_index.df is not df_source:
+            self.build_search_index(df_source)
+
+        candidats = pd.DataFrame(self.search_index.candidats(query, limite),
+                                 columns=['cle', 'type', 'distance', 'position'])
+        lignes = df_source.iloc[candidats['position'].to_numpy()].reset_index(drop=True)
+        return pd.concat([candidats[['cle', 'type', 'distance']].set_axis(
+            ['Correspondance', 'Type', 'Distance'], axis=1), lignes], axis=1)
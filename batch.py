@@ -0,0 +1,164 @@
+"""
+Comparaison MAGASIN VS POUS en lot, sans interface, sur plusieurs magasins en parallèle.
+
+Usage :
+    python batch.py DOSSIER --sortie rapports [--processus 8] [--format xlsx] [--bloc 100000]
+    python batch.py manifeste.csv --sortie rapports
+
+DOSSIER : un sous-dossier par magasin contenant un fichier MAGASIN et un fichier POUS,
+ou des fichiers à plat appariés par nom (MAGASIN_S01.xlsx / POUS_S01.csv -> magasin S01).
+manifeste.csv : colonnes nom, magasin, pous (chemins relatifs au manifeste acceptés).
+
+Écrit un rapport d'écarts par magasin et resume.csv (nombre d'écarts par magasin).
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from backend import StockProcessor
+from export import FORMATS_EXPORT
+from utils import FichierMemoire
+
+EXTENSIONS = ('.xlsx', '.xls', '.csv', '.ods', '.xlsm')
+# Mots clés des noms de fichiers (POUS testé en premier : "STOCK MAGASIN" désigne aussi un export POUS)
+MOTS_INFO = ('pous', 'info')
+MOTS_TERRAIN = ('magasin', 'terrain')
+
+
+def _cote(nom_fichier):
+    """'info', 'terrain' ou None selon le nom du fichier"""
+    nom = nom_fichier.lower()
+    if not nom.endswith(EXTENSIONS):
+        return None
+    if any(m in nom for m in MOTS_INFO):
+        return 'info'
+    if any(m in nom for m in MOTS_TERRAIN):
+        return 'terrain'
+    return None
+
+
+def _identifiant(nom_fichier):
+    """Nom du magasin d'un fichier à plat : nom sans extension ni mot clé MAGASIN / POUS"""
+    base = os.path.splitext(nom_fichier)[0]
+    base = re.sub('|'.join(MOTS_INFO + MOTS_TERRAIN), '', base, flags=re.IGNORECASE)
+    return re.sub(r'^[\s_\-.]+|[\s_\-.]+$', '', base) or base
+
+
+def paires_dossier(dossier):
+    """(nom, fichier MAGASIN, fichier POUS) trouvés dans un dossier, triés par nom"""
+    paires, a_plat = {}, {}
+    for entree in sorted(os.scandir(dossier), key=lambda e: e.name):
+        if entree.is_dir():
+            fichiers = {}
+            for f in sorted(os.listdir(entree.path)):
+                cote = _cote(f)
+                if cote:
+                    fichiers.setdefault(cote, os.path.join(entree.path, f))
+            if len(fichiers) == 2:
+                paires[entree.name] = (fichiers['terrain'], fichiers['info'])
+        elif _cote(entree.name):
+            a_plat.setdefault(_identifiant(entree.name), {}).setdefault(_cote(entree.name), entree.path)
+    for nom, fichiers in a_plat.items():
+        if len(fichiers) == 2 and nom not in paires:
+            paires[nom] = (fichiers['terrain'], fichiers['info'])
+    return [(nom, t, i) for nom, (t, i) in sorted(paires.items())]
+
+
+def paires_manifeste(chemin):
+    """(nom, fichier MAGASIN, fichier POUS) d'un manifeste CSV (colonnes nom, magasin, pous)"""
+    manifeste = pd.read_csv(chemin, sep=None, engine='python', dtype=str)
+    manifeste.columns = manifeste.columns.str.strip().str.lower()
+    racine = os.path.dirname(os.path.abspath(chemin))
+    return [(str(ligne['nom']).strip(),
+             os.path.join(racine, str(ligne['magasin']).strip()),
+             os.path.join(racine, str(ligne['pous']).strip()))
+            for _, ligne in manifeste.iterrows()]
+
+
+def _ouvrir(chemin):
+    """Fichier en mémoire avec un attribut name, comme un upload Streamlit"""
+    with open(chemin, 'rb') as f:
+        return FichierMemoire(f.read(), os.path.basename(chemin))
+
+
+def traiter_magasin(nom, chemin_terrain, chemin_info, sortie, fmt='xlsx', bloc=None):
+    """
+    Comparaison d'un magasin et écriture de son rapport d'écarts (exécuté dans un processus du pool).
+    Retourne la ligne du résumé ; les erreurs sont reportées dans la colonne statut.
+    """
+    debut = time.perf_counter()
+    ligne = {'magasin': nom, 'fichier_magasin': chemin_terrain, 'fichier_pous': chemin_info,
+             'articles': 0, 'ecarts': 0, 'surplus_pous': 0, 'manquants_pous': 0,
+             'ecart_absolu': 0.0, 'rapport': '', 'statut': 'ok'}
+    try:
+        file_t, file_i = _ouvrir(chemin_terrain), _ouvrir(chemin_info)
+        processor = StockProcessor(chargement_differe=True)
+        if bloc:
+            merged = processor.process_comparison_chunked(file_t, file_i, chunksize=bloc)
+        elif processor.load_data(file_t, file_i):
+            merged = processor.process_comparison()
+        else:
+            merged = None
+        if merged is None:
+            ligne['statut'] = "Colonnes introuvables"
+        else:
+            ecarts = merged[merged['Ecart'] != 0]
+            ecarts = ecarts.assign(Ecart_Final=ecarts['Qte_Info'] - ecarts['Qte_Terrain'])
+            export = processor.diff_report_export(ecarts, fmt)
+            rapport = os.path.join(sortie, export.nom(f"Rapport_Ecarts_{nom}"))
+            with open(rapport, 'wb') as f:
+                f.write(export.donnees())
+            ligne.update(articles=len(merged), ecarts=len(ecarts),
+                         surplus_pous=int((ecarts['Ecart'] > 0).sum()),
+                         manquants_pous=int((ecarts['Ecart'] < 0).sum()),
+                         ecart_absolu=float(ecarts['Ecart'].abs().sum()), rapport=rapport)
+    except Exception as e:
+        ligne['statut'] = f"Erreur : {e}"
+    ligne['duree_s'] = round(time.perf_counter() - debut, 2)
+    return ligne
+
+
+def comparer_magasins(paires, sortie, processus=None, fmt='xlsx', bloc=None):
+    """Traite toutes les paires sur un pool de processus et retourne le résumé (un magasin par ligne)"""
+    os.makedirs(sortie, exist_ok=True)
+    lignes = []
+    with ProcessPoolExecutor(max_workers=processus) as pool:
+        taches = {pool.submit(traiter_magasin, nom, t, i, sortie, fmt, bloc): nom for nom, t, i in paires}
+        for tache in as_completed(taches):
+            ligne = tache.result()
+            print(f"{ligne['magasin']:>20} | {ligne['ecarts']:>7} écarts | {ligne['duree_s']:>6.2f} s | {ligne['statut']}")
+            lignes.append(ligne)
+    resume = pd.DataFrame(lignes)
+    if not resume.empty:
+        resume = resume.sort_values('magasin', ignore_index=True)
+    resume.to_csv(os.path.join(sortie, "resume.csv"), index=False)
+    return resume
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison MAGASIN VS POUS de plusieurs magasins")
+    parser.add_argument("source", help="Dossier de fichiers ou manifeste CSV (nom, magasin, pous)")
+    parser.add_argument("--sortie", default="rapports", help="Dossier des rapports et du résumé")
+    parser.add_argument("--processus", type=int, default=None, help="Processus en parallèle (défaut : nombre de cœurs)")
+    parser.add_argument("--format", default='xlsx', choices=list(FORMATS_EXPORT), help="Format des rapports")
+    parser.add_argument("--bloc", type=int, default=None,
+                        help="Comparaison en flux par blocs de N lignes (gros fichiers CSV)")
+    args = parser.parse_args()
+
+    paires = paires_dossier(args.source) if os.path.isdir(args.source) else paires_manifeste(args.source)
+    if not paires:
+        print(f"Aucune paire MAGASIN / POUS trouvée dans {args.source}")
+        return 1
+    debut = time.perf_counter()
+    resume = comparer_magasins(paires, args.sortie, args.processus, args.format, args.bloc)
+    erreurs = int((resume['statut'] != 'ok').sum())
+    print(f"{len(resume)} magasins, {int(resume['ecarts'].sum())} écarts, {erreurs} en erreur "
+          f"en {time.perf_counter() - debut:.1f} s -> {os.path.join(args.sortie, 'resume.csv')}")
+    return 1 if erreurs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,482 @@
+"""
+Micro-benchmarks du comparateur de stock.
+
+Usage :
+    python bench.py scan [--tailles 10000 100000 300000]
+    python bench.py chargement [--tailles 5000 50000] [--formats csv xlsx xls ods]
+    python bench.py final [--tailles 10000 100000 300000]
+    python bench.py export [--tailles 10000 100000 300000]
+    python bench.py parallele [--tailles 20000 100000] [--formats xlsx ods]
+    python bench.py suite [--tailles 10000 100000 1000000] [--format csv] [--sortie bench_resultats.json]
+    python bench.py regression --reference bench_reference.json [--seuil 0.25] [--tolerance 0.002]
+"""
+import argparse
+import datetime
+import importlib.util
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from backend import StockProcessor
+from normalisation import formater_sans_decimale_serie, nettoyer_lot_serie
+from plan_lecture import MOTS_CLES_META_INFO, MOTS_CLES_META_TERRAIN
+from recherche import IndexRecherche
+from export import exporter, formats_disponibles
+from generateur import FORMATS, generer_paire
+from parallele import charger_fichiers
+from utils import charger_fichier_pandas, trouver_colonne, FichierMemoire, formatter_excel_maj, LARGEURS_MAJ
+
+
+def _inventaire_synthetique(n, seed=0):
+    """Petit fichier POUS synthétique (colonnes déjà normalisées en minuscules)"""
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(100000, 100000 + max(n // 3, 1), n)
+    return pd.DataFrame({
+        'site': 'S1',
+        'code article': codes,
+        'libellé': [f"ARTICLE {c}" for c in codes],
+        'lot': rng.choice(['STOCK', 'RECYCL0', 'L1', 'L2'], n),
+        'quantité': rng.integers(0, 50, n),
+        'ean': (3000000000000 + codes).astype(float),
+        'emplacement': rng.choice(['A1', 'B2', 'C3'], n),
+    })
+
+
+def _chrono(fonction, repetitions):
+    """Temps moyen d'un appel en millisecondes"""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) * 1000 / repetitions
+
+
+def _scan_masque(df, query):
+    """Recherche historique : masque sur toutes les colonnes du fichier"""
+    q = str(query).strip().upper()
+    mask = pd.Series(False, index=df.index)
+    for col in df.columns:
+        mask = mask | (df[col].astype(str).str.strip().str.upper() == q)
+    res = df[mask]
+    return None if res.empty else res.iloc[0]
+
+
+def bench_scan(tailles, repetitions=200):
+    """Latence d'un scan : masque plein fichier vs index pré-construit"""
+    print(f"{'lignes':>10} | {'masque (ms)':>12} | {'construction index (ms)':>24} | {'scan indexé (ms)':>17}")
+    for n in tailles:
+        df = _inventaire_synthetique(n)
+        query = str(df['code article'].iloc[n // 2])
+        t_masque = _chrono(lambda: _scan_masque(df, query), max(1, repetitions // 100))
+        t_construction = _chrono(lambda: IndexRecherche(df), 1)
+        index = IndexRecherche(df)
+        t_index = _chrono(lambda: index.chercher(query), repetitions)
+        print(f"{n:>10} | {t_masque:>12.2f} | {t_construction:>24.1f} | {t_index:>17.4f}")
+
+
+def _ecrire_xls(lignes):
+    """Ecrit un .xls (xlwt, optionnel) : pandas ne sait plus produire ce format"""
+    import xlwt
+    classeur = xlwt.Workbook()
+    feuille = classeur.add_sheet("POUS")
+    for i, ligne in enumerate(lignes):
+        for j, valeur in enumerate(ligne):
+            if pd.notna(valeur):
+                feuille.write(i, j, valeur.item() if hasattr(valeur, 'item') else valeur)
+    buffer = io.BytesIO()
+    classeur.save(buffer)
+    return buffer.getvalue()
+
+
+def fichier_avec_entete_decale(df, fmt):
+    """Contenu binaire d'un export POUS avec deux lignes parasites au-dessus de l'en-tête"""
+    parasites = [["Export POUS"] + [None] * (df.shape[1] - 1), [None] * df.shape[1]]
+    lignes = parasites + [list(df.columns)] + df.astype(object).values.tolist()
+    brut = pd.DataFrame(lignes)
+    if fmt == 'csv':
+        return brut.to_csv(index=False, header=False).encode()
+    if fmt == 'xls':
+        return _ecrire_xls(lignes)
+    buffer = io.BytesIO()
+    brut.to_excel(buffer, index=False, header=False, engine='odf' if fmt == 'ods' else 'openpyxl')
+    return buffer.getvalue()
+
+
+def _charger_double_lecture(file):
+    """Chargeur historique : aperçu de 20 lignes puis relecture complète avec header"""
+    if file.name.endswith('.csv'):
+        apercu = pd.read_csv(file, header=None, nrows=20)
+    else:
+        apercu = pd.read_excel(file, header=None, nrows=20)
+    header_idx = 0
+    for i, row in apercu.iterrows():
+        row_str = row.astype(str).str.lower().str.cat(sep=' ')
+        if 'code' in row_str and ('lot' in row_str or 'article' in row_str):
+            header_idx = i
+            break
+    file.seek(0)
+    if file.name.endswith('.csv'):
+        return pd.read_csv(file, header=header_idx)
+    return pd.read_excel(file, header=header_idx)
+
+
+def bench_chargement(tailles, formats):
+    """Temps de chargement d'un fichier : double lecture historique vs lecture unique"""
+    print(f"{'format':>6} | {'lignes':>8} | {'double lecture (s)':>18} | {'lecture unique (s)':>18}")
+    for fmt in formats:
+        if fmt == 'xls' and importlib.util.find_spec('xlwt') is None:
+            print(f"{fmt:>6} | xlwt non installé, format ignoré")
+            continue
+        for n in tailles:
+            data = fichier_avec_entete_decale(_inventaire_synthetique(n), fmt)
+            nom = f"pous.{fmt}"
+            t_double = _chrono(lambda: _charger_double_lecture(FichierMemoire(data, nom)), 1)
+            t_unique = _chrono(lambda: charger_fichier_pandas(FichierMemoire(data, nom)), 1)
+            print(f"{fmt:>6} | {n:>8} | {t_double / 1000:>18.2f} | {t_unique / 1000:>18.2f}")
+
+
+def bench_parallele(tailles, formats):
+    """Chargement des deux fichiers : séquentiel vs parallèle"""
+    # Pool de processus démarré avant les mesures (une fois par process)
+    charger_fichiers([FichierMemoire(fichier_avec_entete_decale(_inventaire_synthetique(10), 'xlsx'), "x.xlsx")])
+    print(f"{'format':>6} | {'lignes':>8} | {'chargement':>22} | {'séquentiel (s)':>14} | {'parallèle (s)':>13}")
+    for fmt in formats:
+        for n in tailles:
+            info = _inventaire_synthetique(n)
+            terrain = info[['code article', 'lot', 'quantité', 'libellé', 'ean']].sample(frac=0.9, random_state=1)
+            data_t, data_i = fichier_avec_entete_decale(terrain, fmt), fichier_avec_entete_decale(info, fmt)
+
+            def load_data(parallele):
+                processor = StockProcessor(parallele=parallele)
+                return processor.load_data(FichierMemoire(data_t, f"magasin.{fmt}"),
+                                           FichierMemoire(data_i, f"pous.{fmt}"))
+            t_seq = _chrono(lambda: load_data(False), 1)
+            t_par = _chrono(lambda: load_data(True), 1)
+            print(f"{fmt:>6} | {n:>8} | {'MAGASIN + POUS':>22} | {t_seq / 1000:>14.2f} | {t_par / 1000:>13.2f}")
+
+
+# Étapes mesurées par la suite (dans l'ordre d'exécution)
+ETAPES_SUITE = ['charger_fichier_pandas', 'load_data', 'process_comparison', 'generate_diff_report',
+                'generate_final_update', 'search_item']
+# Étapes qui modifient l'état du processeur : mesurées une fois par tour complet
+ETAPES_PAR_TOUR = ['process_comparison', 'generate_final_update']
+# Temps mesuré minimal par étape (s) : les étapes courtes sont répétées jusqu'à l'atteindre
+DUREE_MIN_S = 0.2
+NB_MAX_TOURS = 20
+# Marge absolue du contrôle de régression : K_BRUIT x dispersion mesurée, au moins la tolérance
+K_BRUIT = 2
+
+
+def _mesurer_etapes(nb_lignes, fmt, repetitions, nb_requetes=200):
+    """
+    Échantillons (s) de chaque étape sur une paire synthétique ; search_item : nb_requetes requêtes.
+    Au moins repetitions tours, et au moins DUREE_MIN_S mesurées par étape (répétée sur place si
+    elle ne dépend pas de l'état du processeur, sinon par tours supplémentaires).
+    """
+    paire = generer_paire(nb_lignes, seed=nb_lignes)
+    data_t, data_i = paire.fichiers(fmt)
+    fichiers = lambda: (FichierMemoire(data_t, f"magasin.{fmt}"), FichierMemoire(data_i, f"pous.{fmt}"))
+    echantillons = {etape: [] for etape in ETAPES_SUITE}
+
+    def mesurer(etape, fonction, sur_place=True):
+        debut_etape = time.perf_counter()
+        while True:
+            debut = time.perf_counter()
+            resultat = fonction()
+            echantillons[etape].append(time.perf_counter() - debut)
+            if not sur_place or time.perf_counter() - debut_etape >= DUREE_MIN_S:
+                return resultat
+
+    def charger():
+        processor = StockProcessor()
+        assert processor.load_data(*fichiers())
+        return processor
+
+    # Requêtes : codes, EAN (formes brutes), inconnus
+    rng = np.random.default_rng(0)
+    lignes = rng.integers(0, len(paire.info), nb_requetes)
+    requetes = [str(paire.info['Code Article'].iloc[i]) if k % 3 == 0 else
+                str(paire.info['EAN'].iloc[i]) if k % 3 == 1 else f"INCONNU{k}"
+                for k, i in enumerate(lignes)]
+
+    tour = 0
+    while tour < repetitions or (tour < NB_MAX_TOURS and
+                                 min(sum(echantillons[e]) for e in ETAPES_PAR_TOUR) < DUREE_MIN_S):
+        tour += 1
+        mesurer('charger_fichier_pandas', lambda: charger_fichier_pandas(fichiers()[1]))
+        processor = mesurer('load_data', charger)
+        merged = mesurer('process_comparison', processor.process_comparison, sur_place=False)
+        if (merged['Ecart'] != 0).sum() != paire.nb_ecarts:
+            raise AssertionError(f"{nb_lignes} lignes : écarts trouvés différents des écarts générés")
+
+        edited = merged[merged['Ecart'] != 0].copy()
+        edited.iloc[::2, edited.columns.get_loc('Qte_Info')] = edited['Qte_Terrain'].iloc[::2]
+        edited['Ecart_Final'] = edited['Qte_Info'] - edited['Qte_Terrain']
+        mesurer('generate_diff_report', lambda: processor.generate_diff_report(edited))
+        mesurer('generate_final_update', lambda: processor.generate_final_update(edited, merged), sur_place=False)
+
+        # L'index de recherche est construit au premier appel
+        ref = processor.df_i_raw
+        processor.search_item(ref, requetes[0])
+        mesurer('search_item', lambda: [processor.search_item(ref, q) for q in requetes])
+    return echantillons
+
+
+def bench_suite(tailles, fmt, repetitions):
+    """
+    Meilleur temps de chaque étape par taille (dict taille -> étape -> secondes, affichés en ms),
+    et dispersion des mesures (médiane - meilleur temps) pour le contrôle de régression
+    """
+    resultats, bruit = {}, {}
+    print(f"{'lignes':>10} | " + " | ".join(f"{e:>22}" for e in ETAPES_SUITE) + "   (ms)")
+    for n in tailles:
+        echantillons = _mesurer_etapes(n, fmt, repetitions)
+        resultats[str(n)] = {e: min(echantillons[e]) for e in ETAPES_SUITE}
+        bruit[str(n)] = {e: float(np.median(echantillons[e])) - min(echantillons[e]) for e in ETAPES_SUITE}
+        print(f"{n:>10} | " + " | ".join(f"{resultats[str(n)][e] * 1000:>22.3f}" for e in ETAPES_SUITE))
+    return {
+        'meta': {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'format': fmt,
+                 'repetitions': repetitions, 'python': platform.python_version(),
+                 'pandas': pd.__version__, 'machine': platform.node()},
+        'resultats': resultats,
+        'bruit': bruit,
+    }
+
+
+def verifier_regression(reference, courant, seuil, plancher, tolerance):
+    """
+    Étapes plus lentes que la référence de plus de seuil (0.25 = +25 %), plus une marge absolue :
+    K_BRUIT fois la dispersion mesurée (la plus grande des deux exécutions), au moins tolerance
+    secondes. Les temps de référence sous plancher secondes sont comparés au plancher.
+    """
+    regressions = []
+    print(f"{'lignes':>10} | {'étape':>22} | {'référence (ms)':>14} | {'actuel (ms)':>11} | "
+          f"{'limite (ms)':>11} | ratio")
+    for taille, etapes in reference['resultats'].items():
+        for etape, t_ref in etapes.items():
+            t = courant['resultats'].get(taille, {}).get(etape)
+            if t is None:
+                continue
+            bruit = max(run.get('bruit', {}).get(taille, {}).get(etape, 0.0) for run in (reference, courant))
+            limite = max(t_ref, plancher) * (1 + seuil) + max(tolerance, K_BRUIT * bruit)
+            ratio = t / max(t_ref, plancher)
+            alerte = " <- RÉGRESSION" if t > limite else ""
+            print(f"{taille:>10} | {etape:>22} | {t_ref * 1000:>14.3f} | {t * 1000:>11.3f} | "
+                  f"{limite * 1000:>11.3f} | {ratio:.2f}{alerte}")
+            if alerte:
+                regressions.append((taille, etape, ratio))
+    return regressions
+
+
+def _export_final_historique(processor, edited_df, original_merged_df):
+    """Reconstruction historique du fichier final (fusions riches + boucle colonne par colonne)"""
+    # 1. Mise à jour globale
+    df_global = original_merged_df.copy()
+    df_global.set_index(['Code', 'Lot'], inplace=True)
+    df_corrections = edited_df.set_index(['Code', 'Lot'])
+    df_global.update(df_corrections[['Qte_Info']])
+    df_global.reset_index(inplace=True)
+
+    df_valid_full = df_global[df_global['Qte_Info'] != 0].copy()
+
+    # 2. Identification Metadata
+    df_t_raw, df_i_raw = processor._frames_export()
+    def find_i(role): return trouver_colonne(df_i_raw, MOTS_CLES_META_INFO[role])
+    def find_t(role): return trouver_colonne(df_t_raw, MOTS_CLES_META_TERRAIN[role])
+
+    # Mapping des colonnes avancées
+    cols_meta = {
+        'ean': (find_i('ean'), find_t('ean')),
+        'ser': (find_i('ser'), find_t('ser')),
+        'emp': (find_i('emp'), find_t('emp')),
+        'site': (find_i('site'), find_t('site')),
+        'um': (find_i('um'), find_t('um')),
+        'res': find_i('res'),
+        'dispo': find_i('dispo')
+    }
+
+    # 3. Préparation Bases (Info & Terrain)
+    df_base = df_i_raw.copy()
+    df_base['Code_Join'] = formater_sans_decimale_serie(df_base[processor.col_map_i['code']])
+    df_base['Lot_Join'] = nettoyer_lot_serie(df_base[processor.col_map_i['lot']])
+
+    # Nettoyage EAN/Series dans la base
+    if cols_meta['ean'][0]: df_base[cols_meta['ean'][0]] = formater_sans_decimale_serie(df_base[cols_meta['ean'][0]])
+    if cols_meta['ser'][0]: df_base[cols_meta['ser'][0]] = formater_sans_decimale_serie(df_base[cols_meta['ser'][0]])
+
+    df_base = df_base.drop_duplicates(subset=['Code_Join', 'Lot_Join'])
+
+    df_backup = df_t_raw.copy()
+    df_backup['Code_Join'] = formater_sans_decimale_serie(df_backup[processor.col_map_t['code']])
+    df_backup['Lot_Join'] = nettoyer_lot_serie(df_backup[processor.col_map_t['lot']])
+
+    if cols_meta['ean'][1]: df_backup[cols_meta['ean'][1]] = formater_sans_decimale_serie(df_backup[cols_meta['ean'][1]])
+    if cols_meta['ser'][1]: df_backup[cols_meta['ser'][1]] = formater_sans_decimale_serie(df_backup[cols_meta['ser'][1]])
+
+    df_backup = df_backup.drop_duplicates(subset=['Code_Join', 'Lot_Join'])
+
+    # 4. Fusion Riche
+    df_step1 = pd.merge(df_valid_full, df_base, left_on=['Code', 'Lot'], right_on=['Code_Join', 'Lot_Join'], how='left', suffixes=('', '_info'))
+    df_final_rich = pd.merge(df_step1, df_backup, left_on=['Code', 'Lot'], right_on=['Code_Join', 'Lot_Join'], how='left', suffixes=('', '_terr'))
+
+    # 5. Reconstruction colonne par colonne
+    df_export = pd.DataFrame()
+    default_site = ""
+    if cols_meta['site'][0] and not df_base[cols_meta['site'][0]].dropna().empty:
+        default_site = df_base[cols_meta['site'][0]].mode()[0]
+
+    for col in df_i_raw.columns:
+        if col in ['Code_Join', 'Lot_Join', 'Lot_Clean']: continue
+
+        # Mapping direct des valeurs calculées
+        if col == processor.col_map_i['code']: df_export[col] = df_final_rich['Code']
+        elif col == processor.col_map_i['lot']: df_export[col] = df_final_rich['Lot']
+        elif col == processor.col_map_i['qte']: df_export[col] = df_final_rich['Qte_Info']
+        elif col == processor.col_map_i['lib']: df_export[col] = df_final_rich['Libellé']
+        elif cols_meta['dispo'] and col == cols_meta['dispo']: df_export[col] = df_final_rich['Qte_Info']
+
+        # Logique de fallback (Info -> Terrain -> Vide)
+        elif cols_meta['ean'][0] and col == cols_meta['ean'][0]:
+            df_export[col] = df_final_rich[col].fillna(df_final_rich.get(f"{cols_meta['ean'][1]}_terr")).fillna("")
+
+        elif cols_meta['site'][0] and col == cols_meta['site'][0]:
+            df_export[col] = df_final_rich[col].fillna(df_final_rich.get(f"{cols_meta['site'][1]}_terr")).fillna(default_site)
+
+        # Gestion générique des autres colonnes
+        else:
+            if col in df_final_rich.columns:
+                df_export[col] = df_final_rich[col]
+            elif f"{col}_info" in df_final_rich.columns:
+                df_export[col] = df_final_rich[f"{col}_info"]
+            else:
+                df_export[col] = ""
+    return df_export
+
+
+def bench_fichier_final(tailles):
+    """Construction du fichier final : reconstruction historique vs projection par plan de colonnes"""
+    print(f"{'lignes':>10} | {'historique (s)':>14} | {'projection (s)':>14} | identique")
+    for n in tailles:
+        info = _inventaire_synthetique(n)
+        info['extra'] = 'x'
+        terrain = info[['code article', 'lot', 'quantité', 'libellé', 'ean']].sample(frac=0.8, random_state=1)
+        processor = StockProcessor()
+        processor.load_data(FichierMemoire(terrain.to_csv(index=False).encode(), "magasin.csv"),
+                            FichierMemoire(info.to_csv(index=False).encode(), "pous.csv"))
+        merged = processor.process_comparison()
+        edited = merged[merged['Ecart'] != 0].copy()
+        edited['Qte_Info'] = edited['Qte_Terrain']
+
+        t_hist = _chrono(lambda: _export_final_historique(processor, edited, merged), 1)
+        t_proj = _chrono(lambda: processor.build_final_export(edited, merged), 1)
+        identique = _export_final_historique(processor, edited, merged).equals(
+            processor.build_final_export(edited, merged))
+        print(f"{n:>10} | {t_hist / 1000:>14.2f} | {t_proj / 1000:>14.2f} | {identique}")
+
+
+def _pic_memoire(fonction):
+    """Pic de mémoire Python alloué (Mo) pendant un appel (mesuré à part : tracemalloc ralentit)"""
+    tracemalloc.start()
+    fonction()
+    pic = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return pic / 1024 ** 2
+
+
+def _excel_writer(df):
+    """Export historique : pd.ExcelWriter, classeur complet en mémoire"""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        formatter_excel_maj(df, writer, "Inventaire_Complet")
+    return buffer.getvalue()
+
+
+def bench_export(tailles):
+    """Écriture du fichier final : ExcelWriter vs xlsx en flux, CSV et Parquet"""
+    ecritures = {'ExcelWriter': _excel_writer}
+    for fmt in formats_disponibles():
+        ecritures[fmt] = lambda df, fmt=fmt: exporter(df, fmt, LARGEURS_MAJ, "Inventaire_Complet")
+    print(f"{'lignes':>10} | {'écriture':>12} | {'temps (s)':>9} | {'pic mémoire (Mo)':>16}")
+    for n in tailles:
+        df = _inventaire_synthetique(n)
+        for nom, ecrire in ecritures.items():
+            duree = _chrono(lambda: ecrire(df), 1) / 1000
+            pic = _pic_memoire(lambda: ecrire(df))
+            print(f"{n:>10} | {nom:>12} | {duree:>9.2f} | {pic:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du comparateur de stock")
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    p_scan = sous.add_parser("scan", help="Latence du scan INVENTAIRE TOURNANT")
+    p_scan.add_argument("--tailles", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+
+    p_chargement = sous.add_parser("chargement", help="Temps de chargement par format de fichier")
+    p_chargement.add_argument("--tailles", type=int, nargs="+", default=[5_000, 50_000])
+    p_chargement.add_argument("--formats", nargs="+", default=['csv', 'xlsx', 'xls', 'ods'],
+                              choices=['csv', 'xlsx', 'xls', 'ods'])
+
+    p_final = sous.add_parser("final", help="Construction du fichier final de mise à jour")
+    p_final.add_argument("--tailles", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+
+    p_export = sous.add_parser("export", help="Écriture du fichier final par format")
+    p_export.add_argument("--tailles", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+
+    p_parallele = sous.add_parser("parallele", help="Chargement séquentiel vs parallèle")
+    p_parallele.add_argument("--tailles", type=int, nargs="+", default=[20_000, 100_000])
+    p_parallele.add_argument("--formats", nargs="+", default=['xlsx', 'ods'], choices=['csv', 'xlsx', 'ods'])
+
+    p_suite = sous.add_parser("suite", help="Temps de chaque étape sur des paires synthétiques")
+    p_suite.add_argument("--tailles", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p_suite.add_argument("--format", default='csv', choices=FORMATS)
+    p_suite.add_argument("--repetitions", type=int, default=3)
+    p_suite.add_argument("--sortie", default="bench_resultats.json", help="Fichier JSON des résultats")
+
+    p_regression = sous.add_parser("regression", help="Échoue si une étape est plus lente que la référence")
+    p_regression.add_argument("--reference", required=True, help="Résultats JSON de bench.py suite")
+    p_regression.add_argument("--seuil", type=float, default=0.25, help="Ralentissement toléré (0.25 = +25 %%)")
+    p_regression.add_argument("--plancher", type=float, default=0.001,
+                              help="Temps de référence minimal pris en compte (s)")
+    # Bruit du chronomètre (CI partagée) : quelques ms quelle que soit la durée de l'étape
+    p_regression.add_argument("--tolerance", type=float, default=0.002,
+                              help="Marge absolue minimale au-delà du seuil (s)")
+    p_regression.add_argument("--sortie", default=None, help="Fichier JSON des nouveaux résultats")
+
+    args = parser.parse_args()
+    if args.commande == "scan":
+        bench_scan(args.tailles)
+    elif args.commande == "chargement":
+        bench_chargement(args.tailles, args.formats)
+    elif args.commande == "final":
+        bench_fichier_final(args.tailles)
+    elif args.commande == "export":
+        bench_export(args.tailles)
+    elif args.commande == "parallele":
+        bench_parallele(args.tailles, args.formats)
+    elif args.commande == "suite":
+        resultats = bench_suite(args.tailles, args.format, args.repetitions)
+        with open(args.sortie, 'w') as f:
+            json.dump(resultats, f, indent=2)
+        print(f"Résultats enregistrés dans {args.sortie}")
+    elif args.commande == "regression":
+        with open(args.reference) as f:
+            reference = json.load(f)
+        meta = reference['meta']
+        courant = bench_suite([int(t) for t in reference['resultats']], meta['format'], meta['repetitions'])
+        if args.sortie:
+            with open(args.sortie, 'w') as f:
+                json.dump(courant, f, indent=2)
+        regressions = verifier_regression(reference, courant, args.seuil, args.plancher, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} étape(s) au-delà du seuil de {args.seuil:.0%}")
+            return 1
+        print("Aucune régression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
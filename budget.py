@@ -0,0 +1,115 @@
+"""
+Budget mémoire des traitements (comparaison et fichier final), partagé par les sessions du process.
+
+La mémoire d'un traitement est estimée avant de lire les fichiers, à partir de leur taille et
+de leur format. Chaque étape lourde réserve son estimation : quand les traitements en cours
+et le nouveau dépassent le budget, la comparaison passe en flux (CSV) ou est refusée avec un
+message clair, au lieu de faire tomber le serveur.
+"""
+import contextlib
+import os
+import threading
+
+# Pic mémoire d'un traitement complet (chargement, comparaison, fichier final) rapporté à la
+# taille des fichiers (mesuré avec generateur.py sur 50 000 et 200 000 lignes)
+FACTEURS_MEMOIRE = {'csv': 16, 'xlsx': 32, 'xlsm': 32, 'xls': 32, 'ods': 45}
+# Comparaison en flux : sommes par (Code, Lot), libellés et un bloc à la fois (pas de fichier final)
+FACTEUR_FLUX = 9
+# Fichier final seul (relecture du POUS complet, table enrichie, écriture), comparaison déjà faite :
+# pic mesuré sur 200 000 lignes de 4x (csv) et 8x (xlsx) la taille des fichiers, avec une marge
+FACTEURS_FINAL = {'csv': 6, 'xlsx': 12, 'xlsm': 12, 'xls': 12, 'ods': 16}
+MO = 1024 ** 2
+
+
+class BudgetDepasse(Exception):
+    """Traitement refusé : son estimation mémoire dépasse le budget disponible"""
+
+    def __init__(self, estimation, disponible, limite, conseil=""):
+        self.estimation = estimation
+        self.disponible = disponible
+        self.limite = limite
+        message = (f"Traitement refusé : environ {estimation / MO:.0f} Mo nécessaires, "
+                   f"{max(disponible, 0) / MO:.0f} Mo disponibles sur un budget de {limite / MO:.0f} Mo.")
+        super().__init__(f"{message} {conseil}".strip())
+
+
+def taille_fichier(file):
+    """Taille d'un fichier uploadé ou ouvert (octets), sans le lire"""
+    if hasattr(file, 'size'):
+        return file.size
+    if hasattr(file, 'getbuffer'):
+        return file.getbuffer().nbytes
+    position = file.tell()
+    taille = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return taille
+
+
+def extension(file):
+    return os.path.splitext(getattr(file, 'name', ''))[1].lower().lstrip('.')
+
+
+def estimer_memoire(files, flux=False):
+    """Pic mémoire estimé (octets) du traitement de ces fichiers, complet ou en flux"""
+    return sum(taille_fichier(file) * (FACTEUR_FLUX if flux else FACTEURS_MEMOIRE.get(extension(file), 32))
+               for file in files)
+
+
+def estimer_memoire_final(files):
+    """Pic mémoire estimé (octets) de la construction du fichier final à partir de ces fichiers"""
+    return sum(taille_fichier(file) * FACTEURS_FINAL.get(extension(file), 12) for file in files)
+
+
+class BudgetMemoire:
+    """Mémoire réservée par les traitements en cours, bornée par limite (octets, None = sans limite)"""
+
+    def __init__(self, limite=None):
+        self.limite = limite
+        self._reserve = 0
+        self._verrou = threading.Lock()
+
+    @property
+    def actif(self):
+        return self.limite is not None
+
+    def disponible(self):
+        with self._verrou:
+            return None if self.limite is None else self.limite - self._reserve
+
+    def accepte(self, estimation):
+        """True si une estimation tient dans ce qui reste du budget"""
+        disponible = self.disponible()
+        return disponible is None or estimation <= disponible
+
+    @contextlib.contextmanager
+    def reserver(self, estimation, conseil=""):
+        """Réserve estimation octets pendant une étape, BudgetDepasse si elle ne tient pas"""
+        if self.limite is None or not estimation:
+            yield
+            return
+        with self._verrou:
+            disponible = self.limite - self._reserve
+            if estimation > disponible:
+                raise BudgetDepasse(estimation, disponible, self.limite, conseil)
+            self._reserve += estimation
+        try:
+            yield
+        finally:
+            with self._verrou:
+                self._reserve -= estimation
+
+    def stats(self):
+        with self._verrou:
+            return {'limite': self.limite, 'reserve': self._reserve}
+
+
+def budget_depuis_env(valeur):
+    """Budget en Mo lu dans STOCKITO_BUDGET_MO (vide ou invalide = sans limite)"""
+    try:
+        return int(float(valeur) * MO) if valeur else None
+    except ValueError:
+        return None
+
+
+# Budget partagé par toutes les sessions du process Streamlit
+BUDGET_MEMOIRE = BudgetMemoire(budget_depuis_env(os.environ.get('STOCKITO_BUDGET_MO')))
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils import lire_contenu
+
+
+def empreinte_fichier(file):
+    """Empreinte du contenu d'un fichier (extension comprise : elle choisit le parseur)"""
+    h = hashlib.blake2b(lire_contenu(file), digest_size=16)
+    h.update(os.path.splitext(getattr(file, 'name', ''))[1].lower().encode())
+    return h.hexdigest()
+
+
+def empreinte_frame(df):
+    """Empreinte du contenu d'un DataFrame (valeurs + index)"""
+    return hashlib.blake2b(pd.util.hash_pandas_object(df).to_numpy().tobytes(),
+                           digest_size=16).hexdigest()
+
+
+def taille_estimee(valeur):
+    """Taille mémoire approximative d'une entrée de cache (octets)"""
+    if isinstance(valeur, pd.DataFrame):
+        return int(valeur.memory_usage(index=True, deep=True).sum())
+    if isinstance(valeur, pd.Series):
+        return int(valeur.memory_usage(index=True, deep=True))
+    if isinstance(valeur, pd.Index):
+        return int(valeur.memory_usage(deep=True))
+    if isinstance(valeur, np.ndarray):
+        return int(valeur.nbytes)
+    if isinstance(valeur, (bytes, bytearray)):
+        return len(valeur)
+    if isinstance(valeur, (tuple, list)):
+        return sum(taille_estimee(v) for v in valeur)
+    if isinstance(valeur, dict):
+        return sum(taille_estimee(v) for v in valeur.values())
+    if hasattr(valeur, '__dict__'):
+        # Objet de traitement (vue des écarts...) : somme de ses attributs
+        return sum(taille_estimee(v) for v in vars(valeur).values())
+    return 64
+
+
+class CacheLRU:
+    """
+    Cache LRU borné en taille, partagé entre les reruns Streamlit (niveau module).
+    Les valeurs stockées ne doivent pas être modifiées par les appelants.
+    """
+
+    def __init__(self, taille_max_octets=1024 ** 3, nb_max_entrees=32):
+        self.taille_max_octets = taille_max_octets
+        self.nb_max_entrees = nb_max_entrees
+        self._entrees = OrderedDict()
+        self._taille = 0
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, cle, defaut=None):
+        with self._verrou:
+            if cle in self._entrees:
+                self._entrees.move_to_end(cle)
+                self.hits += 1
+                return self._entrees[cle][0]
+            self.misses += 1
+            return defaut
+
+    def __contains__(self, cle):
+        """Présence d'une clé, sans toucher aux compteurs ni à l'ordre LRU"""
+        with self._verrou:
+            return cle in self._entrees
+
+    def set(self, cle, valeur):
+        taille = taille_estimee(valeur)
+        with self._verrou:
+            if cle in self._entrees:
+                self._taille -= self._entrees.pop(cle)[1]
+            if taille > self.taille_max_octets:
+                return valeur
+            self._entrees[cle] = (valeur, taille)
+            self._taille += taille
+            while (self._taille > self.taille_max_octets
+                   or len(self._entrees) > self.nb_max_entrees):
+                _, (_, taille_evincee) = self._entrees.popitem(last=False)
+                self._taille -= taille_evincee
+                self.evictions += 1
+        return valeur
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self._taille = 0
+
+    def stats(self):
+        """Compteurs pour le suivi (hits, misses, évictions, occupation)"""
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'entrees': len(self._entrees),
+                'taille_octets': self._taille,
+            }
+
+
+# Cache partagé par toutes les sessions du process Streamlit
+CACHE_TRAITEMENTS = CacheLRU()
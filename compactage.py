@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from schemas import SCHEMAS
+
+# Colonne texte convertie en catégorie si elle a au plus cette part de valeurs distinctes
+SEUIL_CATEGORIES = 0.5
+# Rôles dont les valeurs sont des identifiants (quasi uniques) : texte compact, jamais catégorie
+ROLES_IDENTIFIANTS = ('code', 'ean', 'ser')
+
+
+def colonnes_identifiants(df):
+    """Colonnes code / EAN / série d'un fichier chargé"""
+    trouvees = SCHEMAS.colonnes(df, ROLES_IDENTIFIANTS).values()
+    return {col for col in trouvees if col is not None}
+
+
+def _entier_compact(serie):
+    """Entiers ramenés en int32 quand toutes les valeurs y tiennent"""
+    info = np.iinfo(np.int32)
+    if serie.dtype.itemsize > 4 and (serie.empty or (serie.min() >= info.min and serie.max() <= info.max)):
+        return serie.astype(np.int32)
+    return serie
+
+
+def _texte_compact(serie, identifiant, seuil_categories):
+    """Catégorie pour les valeurs répétitives, chaîne compacte pour les identifiants"""
+    nature = pd.api.types.infer_dtype(serie, skipna=True)
+    if identifiant:
+        # str(valeur) : même texte que celui normalisé par la comparaison et le scan
+        return serie.astype('str') if nature != 'empty' else serie
+    if serie.nunique(dropna=True) <= seuil_categories * len(serie):
+        return serie.astype('category')
+    if nature == 'string' and serie.dtype == object:
+        return serie.astype('str')
+    return serie
+
+
+def compacter(df, identifiants=None, seuil_categories=SEUIL_CATEGORIES):
+    """
+    Copie compacte d'un fichier chargé : colonnes texte répétitives en catégories
+    (lot, site, emplacement, UM, libellé...), codes / EAN / séries en chaînes compactes,
+    entiers en int32. Les valeurs ne changent pas, seul leur stockage change.
+    """
+    if identifiants is None:
+        identifiants = colonnes_identifiants(df)
+    # Colonnes prises par position (des noms peuvent se répéter après normalisation)
+    colonnes = {}
+    for j, col in enumerate(df.columns):
+        serie = df.iloc[:, j]
+        if pd.api.types.is_bool_dtype(serie.dtype):
+            colonnes[j] = serie
+        elif pd.api.types.is_integer_dtype(serie.dtype):
+            colonnes[j] = _entier_compact(serie)
+        elif serie.dtype == object or pd.api.types.is_string_dtype(serie.dtype):
+            colonnes[j] = _texte_compact(serie, col in identifiants, seuil_categories)
+        else:
+            colonnes[j] = serie
+    compact = pd.DataFrame(colonnes, index=df.index)
+    compact.columns = df.columns
+    return compact
+
+
+def rapport_memoire(avant, apres):
+    """Mémoire par colonne avant / après compactage (octets), avec une ligne TOTAL"""
+    rapport = pd.DataFrame({
+        'type_avant': avant.dtypes.astype(str),
+        'type_apres': apres.dtypes.astype(str),
+        'octets_avant': avant.memory_usage(index=False, deep=True),
+        'octets_apres': apres.memory_usage(index=False, deep=True),
+    })
+    rapport.loc['TOTAL'] = ['', '', rapport['octets_avant'].sum(), rapport['octets_apres'].sum()]
+    rapport['gain'] = 1 - rapport['octets_apres'] / rapport['octets_avant'].where(rapport['octets_avant'] > 0)
+    return rapport
@@ -0,0 +1,121 @@
+import datetime
+import json
+import os
+import time
+import tracemalloc
+
+
+def rss_mo():
+    """Mémoire résidente du process (Mo), None si indisponible (lecture de /proc sous Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class _EtapeInactive:
+    """Étape sans mesure : contexte vide partagé, les attributs affectés sont ignorés"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, nom, valeur):
+        pass
+
+
+_INACTIVE = _EtapeInactive()
+
+
+class _Etape:
+    """Mesure d'une étape : durée, lignes en entrée / sortie, mémoire"""
+
+    def __init__(self, diagnostic, nom, lignes_entree):
+        self._diagnostic = diagnostic
+        self.nom = nom
+        self.lignes_entree = lignes_entree
+        self.lignes_sortie = None
+
+    def __enter__(self):
+        self._diagnostic._debut_etape(self)
+        self._rss = rss_mo()
+        self._debut = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duree = time.perf_counter() - self._debut
+        rss = rss_mo()
+        self._diagnostic._fin_etape(self, {
+            'etape': self.nom,
+            'duree_s': round(duree, 6),
+            'lignes_entree': self.lignes_entree,
+            'lignes_sortie': self.lignes_sortie,
+            'rss_mo': None if rss is None else round(rss, 1),
+            'rss_delta_mo': None if rss is None or self._rss is None else round(rss - self._rss, 1),
+            'erreur': None if exc is None else repr(exc),
+        })
+        return False
+
+
+class Diagnostic:
+    """
+    Instrumentation par étape de StockProcessor. Inactif par défaut : etape() renvoie alors
+    un contexte vide partagé, sans mesure ni allocation.
+    memoire=True ajoute le pic de mémoire Python de chaque étape (tracemalloc, qui ralentit
+    nettement les traitements).
+    """
+
+    def __init__(self, actif=False, memoire=False):
+        self.actif = actif
+        self.memoire = memoire
+        self.etapes = []
+        self.debut = datetime.datetime.now()
+        # Pics de mémoire des étapes en cours (les étapes imbriquées remontent leur pic)
+        self._pics = []
+        self._tracemalloc_lance = False
+
+    def etape(self, nom, lignes_entree=None):
+        """Contexte mesurant une étape ; l'étape peut renseigner lignes_sortie"""
+        if not self.actif:
+            return _INACTIVE
+        return _Etape(self, nom, lignes_entree)
+
+    def _debut_etape(self, etape):
+        if not self.memoire:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracemalloc_lance = True
+        if self._pics:
+            self._pics[-1] = max(self._pics[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._pics.append(tracemalloc.get_traced_memory()[0])
+
+    def _fin_etape(self, etape, mesure):
+        if self.memoire and self._pics:
+            pic = max(self._pics.pop(), tracemalloc.get_traced_memory()[1])
+            mesure['pic_python_mo'] = round(pic / 1024 ** 2, 1)
+            if self._pics:
+                self._pics[-1] = max(self._pics[-1], pic)
+            elif self._tracemalloc_lance:
+                tracemalloc.stop()
+                self._tracemalloc_lance = False
+        self.etapes.append(mesure)
+
+    def vider(self):
+        self.etapes = []
+        self.debut = datetime.datetime.now()
+
+    def rapport(self):
+        """Rapport structuré de l'exécution (étapes dans l'ordre où elles se terminent)"""
+        return {
+            'debut': self.debut.isoformat(timespec='seconds'),
+            'memoire_python': self.memoire,
+            'etapes': list(self.etapes),
+        }
+
+    def rapport_json(self):
+        return json.dumps(self.rapport(), indent=2, ensure_ascii=False)
@@ -0,0 +1,152 @@
+import datetime
+import importlib.util
+import io
+import threading
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# Formats d'export : extension, type MIME
+FORMATS_EXPORT = {
+    'xlsx': ('xlsx', "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'csv': ('csv', "text/csv"),
+    'parquet': ('parquet', "application/vnd.apache.parquet"),
+}
+
+# Formats de date appliqués comme par pd.ExcelWriter
+FORMAT_DATE = "YYYY-MM-DD"
+FORMAT_DATE_HEURE = "YYYY-MM-DD HH:MM:SS"
+
+# Lignes converties à la fois par l'écriture xlsx en flux
+TAILLE_BLOC_XLSX = 10_000
+# En dessous, le classeur est construit en mémoire (pas de fichiers temporaires)
+SEUIL_FLUX_XLSX = 50_000
+
+
+def formats_disponibles():
+    """Formats utilisables dans cet environnement (Parquet seulement avec pyarrow ou fastparquet)"""
+    formats = ['xlsx', 'csv']
+    if any(importlib.util.find_spec(m) is not None for m in ('pyarrow', 'fastparquet')):
+        formats.append('parquet')
+    return formats
+
+
+def _valeurs_colonne(serie):
+    """
+    Valeurs Python d'une colonne prêtes pour xlsxwriter (mêmes conversions que pandas) :
+    vide pour les manquants, 'inf' pour les infinis, texte pour le reste.
+    Indique aussi si la colonne contient des dates.
+    """
+    manquant = serie.isna().to_numpy()
+    dates = False
+    if pd.api.types.is_bool_dtype(serie.dtype) or pd.api.types.is_integer_dtype(serie.dtype):
+        valeurs = serie.astype(object).tolist()
+    elif pd.api.types.is_float_dtype(serie.dtype):
+        brut = serie.to_numpy(dtype=float, na_value=np.nan)
+        valeurs = brut.tolist()
+        for i in np.flatnonzero(np.isinf(brut)):
+            valeurs[i] = 'inf' if brut[i] > 0 else '-inf'
+    elif pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        valeurs, dates = serie.dt.to_pydatetime().tolist(), True
+    else:
+        valeurs = [_valeur_objet(v) for v in serie.tolist()]
+        dates = any(isinstance(v, datetime.date) for v in valeurs)
+    return [None if m else v for v, m in zip(valeurs, manquant)], dates
+
+
+def _valeur_objet(valeur):
+    """Conversion d'une valeur de colonne objet (comme ExcelWriter._value_with_fmt)"""
+    if isinstance(valeur, np.generic):
+        return valeur.item()
+    if isinstance(valeur, (bool, int, float, str, datetime.date)):
+        return valeur
+    if isinstance(valeur, datetime.timedelta):
+        return valeur.total_seconds() / 86400
+    return str(valeur)
+
+
+def ecrire_xlsx(df, largeurs=(), feuille="Feuil1", taille_bloc=TAILLE_BLOC_XLSX):
+    """
+    Classeur xlsx écrit ligne par ligne en mode constant_memory de xlsxwriter :
+    chaque ligne est vidée sur disque dès que la suivante commence, et les valeurs
+    sont converties par blocs de taille_bloc lignes. Les petits tableaux (moins de
+    SEUIL_FLUX_XLSX lignes) sont écrits en mémoire, sans fichiers temporaires.
+    largeurs : liste (plage Excel, largeur) appliquée avant l'écriture des lignes.
+    """
+    buffer = io.BytesIO()
+    options = {'constant_memory': True} if len(df) >= SEUIL_FLUX_XLSX else {'in_memory': True}
+    classeur = xlsxwriter.Workbook(buffer, options)
+    ws = classeur.add_worksheet(feuille)
+    for plage, largeur in largeurs:
+        ws.set_column(plage, largeur)
+    formats_dates = {}
+
+    ws.write_row(0, 0, [str(c) for c in df.columns])
+    for debut in range(0, len(df), taille_bloc):
+        bloc = df.iloc[debut:debut + taille_bloc]
+        colonnes = [_valeurs_colonne(bloc.iloc[:, j]) for j in range(bloc.shape[1])]
+        cols_dates = [j for j, (_, dates) in enumerate(colonnes) if dates]
+        for i, ligne in enumerate(zip(*(valeurs for valeurs, _ in colonnes)), start=debut + 1):
+            ws.write_row(i, 0, ligne)
+            for j in cols_dates:
+                if isinstance(ligne[j], datetime.date):
+                    # Format choisi par valeur, comme pd.ExcelWriter
+                    fmt = FORMAT_DATE_HEURE if isinstance(ligne[j], datetime.datetime) else FORMAT_DATE
+                    if fmt not in formats_dates:
+                        formats_dates[fmt] = classeur.add_format({'num_format': fmt})
+                    ws.write_datetime(i, j, ligne[j], formats_dates[fmt])
+    classeur.close()
+    return buffer.getvalue()
+
+
+def ecrire_csv(df):
+    """CSV UTF-8 sans index"""
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def ecrire_parquet(df):
+    """Parquet sans index ; les colonnes objet de types mélangés sont écrites en texte"""
+    mixtes = {}
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) in ('mixed', 'mixed-integer'):
+            mixtes[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    buffer = io.BytesIO()
+    (df.assign(**mixtes) if mixtes else df).to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def exporter(df, fmt='xlsx', largeurs=(), feuille="Feuil1"):
+    """Contenu binaire de df dans le format demandé"""
+    if fmt == 'xlsx':
+        return ecrire_xlsx(df, largeurs, feuille)
+    if fmt == 'csv':
+        return ecrire_csv(df)
+    if fmt == 'parquet':
+        return ecrire_parquet(df)
+    raise ValueError(f"Format d'export inconnu : {fmt}")
+
+
+class ExportDiffere:
+    """
+    Fichier d'export construit au premier accès seulement (clic sur le bouton de téléchargement),
+    puis conservé. donnees peut être passé directement à st.download_button(data=...).
+    """
+
+    def __init__(self, construire, fmt='xlsx'):
+        if fmt not in FORMATS_EXPORT:
+            raise ValueError(f"Format d'export inconnu : {fmt}")
+        self._construire = construire
+        self.fmt = fmt
+        self.extension, self.mime = FORMATS_EXPORT[fmt]
+        self._contenu = None
+        self._verrou = threading.Lock()
+
+    def nom(self, base):
+        """Nom de fichier avec l'extension du format"""
+        return f"{base}.{self.extension}"
+
+    def donnees(self):
+        with self._verrou:
+            if self._contenu is None:
+                self._contenu = self._construire()
+            return self._contenu
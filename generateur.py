@@ -0,0 +1,178 @@
+"""
+Générateur de paires de fichiers MAGASIN / POUS synthétiques, avec les défauts des vrais exports :
+EAN en notation scientifique, codes en '.0', lots RECYCL0, lignes parasites au-dessus de l'en-tête.
+
+Usage :
+    python generateur.py --lignes 100000 [--taux-ecarts 0.05] [--format csv|xlsx|ods] [--sortie dossier]
+"""
+import argparse
+import io
+import os
+import numpy as np
+import pandas as pd
+
+# Écritures d'un même lot normalisé (nettoyer_lot les ramène toutes au premier)
+VARIANTES_LOTS = {
+    'STOCK': ['STOCK', 'RECYCL0', 'STOCK+RECYCL0', 'stock ', 'STOCK RECYCL0'],
+    'SAV': ['SAV', 'sav'],
+    'DEMO': ['DEMO'],
+}
+FORMATS = ('csv', 'xlsx', 'ods')
+
+
+class PaireSynthetique:
+    """Fichiers MAGASIN / POUS générés et nombre d'écarts (Code, Lot) attendus"""
+
+    def __init__(self, terrain, info, nb_ecarts):
+        self.terrain = terrain
+        self.info = info
+        self.nb_ecarts = nb_ecarts
+
+    def fichiers(self, fmt='csv', lignes_parasites=True):
+        """Contenus binaires (MAGASIN, POUS) dans le format demandé"""
+        return (ecrire(self.terrain, fmt, "Inventaire magasin" if lignes_parasites else None),
+                ecrire(self.info, fmt, "Extraction POUS" if lignes_parasites else None))
+
+
+def generer_paire(nb_lignes, taux_ecarts=0.05, seed=0):
+    """
+    Paire MAGASIN / POUS d'environ nb_lignes lignes POUS. taux_ecarts : part des clés (Code, Lot)
+    dont la quantité comptée diffère (quantité modifiée, article non compté ou trouvé en plus).
+    """
+    rng = np.random.default_rng(seed)
+    nb_cles = max(nb_lignes * 4 // 5, 1)
+    codes = rng.choice(np.arange(100000, 100000 + 4 * nb_cles), nb_cles, replace=False)
+    lots = rng.choice(list(VARIANTES_LOTS), nb_cles, p=[0.8, 0.15, 0.05])
+    cles = pd.DataFrame({'code': codes, 'lot': lots}).drop_duplicates(ignore_index=True)
+    cles['qte'] = rng.integers(1, 60, len(cles))
+    cles['ean'] = 3000000000000 + cles['code'] * 7
+
+    # POUS : certaines clés réparties sur deux emplacements (même total)
+    doubles = rng.random(len(cles)) < (nb_lignes - len(cles)) / len(cles)
+    suite = cles[doubles].copy()
+    suite['qte'] = rng.integers(0, suite['qte'] + 1)
+    info = cles.copy()
+    info.loc[doubles, 'qte'] -= suite['qte']
+    info = pd.concat([info, suite]).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+    # Comptage terrain : mêmes quantités sauf sur les clés en écart
+    totaux = info.groupby(['code', 'lot'], sort=False)['qte'].sum().reset_index()
+    ecart = rng.random(len(totaux)) < taux_ecarts
+    mode = rng.integers(0, 3, len(totaux))
+    terrain = totaux.copy()
+    decalage = rng.integers(1, 10, len(totaux)) * rng.choice([-1, 1], len(totaux))
+    modifiee = ecart & (mode == 0)
+    terrain.loc[modifiee, 'qte'] = (terrain['qte'] + decalage)[modifiee].clip(lower=0)
+    absente = ecart & (mode == 1)
+    terrain = terrain[~absente]
+    nb_en_plus = int((ecart & (mode == 2)).sum())
+    debut_en_plus = 100000 + 4 * nb_cles
+    en_plus = pd.DataFrame({'code': rng.integers(debut_en_plus, debut_en_plus + 4 * nb_en_plus + 1, nb_en_plus),
+                            'lot': 'STOCK', 'qte': rng.integers(1, 20, nb_en_plus)})
+    en_plus['ean'] = 3000000000000 + en_plus['code'] * 7
+    en_plus = en_plus.drop_duplicates(['code', 'lot'])
+    terrain = pd.concat([terrain.merge(cles[['code', 'lot', 'ean']], on=['code', 'lot']), en_plus],
+                        ignore_index=True)
+    # Écarts attendus, sur les sommes (Code, Lot) après normalisation
+    ref = totaux.merge(terrain[['code', 'lot', 'qte']], on=['code', 'lot'], how='outer',
+                       suffixes=('_i', '_t')).fillna(0)
+    nb_ecarts = int((ref['qte_i'] != ref['qte_t']).sum())
+
+    return PaireSynthetique(_colonnes_terrain(terrain, rng), _colonnes_info(info, rng), nb_ecarts)
+
+
+def _code_brut(codes, rng):
+    """Codes tels qu'exportés : entiers, ou texte en '.0' pour une partie"""
+    brut = codes.astype(object)
+    flottants = rng.random(len(codes)) < 0.2
+    brut[flottants] = [f"{c}.0" for c in codes[flottants]]
+    return brut
+
+
+def _ean_brut(eans, rng):
+    """EAN tels qu'exportés : entiers, '.0' ou notation scientifique (avec virgule parfois)"""
+    brut = eans.astype(object)
+    tirage = rng.random(len(eans))
+    sci = tirage < 0.3
+    brut[sci] = [f"{e:.12E}" for e in eans[sci]]
+    virgule = sci & (tirage < 0.05)
+    brut[virgule] = [v.replace('.', ',') for v in brut[virgule]]
+    point_zero = (tirage >= 0.3) & (tirage < 0.4)
+    brut[point_zero] = [f"{e}.0" for e in eans[point_zero]]
+    return brut
+
+
+def _lot_brut(lots, rng):
+    """Lots avec les différentes écritures d'un même lot"""
+    brut = np.empty(len(lots), dtype=object)
+    for lot, variantes in VARIANTES_LOTS.items():
+        choix = lots == lot
+        brut[choix] = np.array(variantes, dtype=object)[rng.integers(0, len(variantes), choix.sum())]
+    return brut
+
+
+def _colonnes_info(info, rng):
+    codes = info['code'].to_numpy()
+    qte = info['qte'].to_numpy()
+    reserve = np.minimum(qte, rng.integers(0, 3, len(info)))
+    return pd.DataFrame({
+        'Site': rng.choice(['MAG01', 'MAG01', 'MAG01', 'MAG02'], len(info)),
+        'Code Article': _code_brut(codes, rng),
+        'Libellé': [f"ARTICLE {c}" for c in codes],
+        'Lot': _lot_brut(info['lot'].to_numpy(), rng),
+        'Quantité': qte,
+        'Réservé': reserve,
+        'Disponible': qte - reserve,
+        'EAN': _ean_brut(info['ean'].to_numpy(), rng),
+        'Emplacement': rng.choice(['A01', 'A02', 'B01', 'C03', 'R12'], len(info)),
+        'UM': 'PCE',
+    })
+
+
+def _colonnes_terrain(terrain, rng):
+    terrain = terrain.sample(frac=1, random_state=1).reset_index(drop=True)
+    codes = terrain['code'].to_numpy()
+    return pd.DataFrame({
+        'Code': _code_brut(codes, rng),
+        'Designation': [f"ARTICLE {c}" for c in codes],
+        'Lot': _lot_brut(terrain['lot'].to_numpy(), rng),
+        'Qte': terrain['qte'].to_numpy(),
+        'EAN': _ean_brut(terrain['ean'].to_numpy(), rng),
+    })
+
+
+def ecrire(df, fmt='csv', titre=None):
+    """Contenu binaire d'un fichier, avec un titre et une ligne vide au-dessus de l'en-tête si titre"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Format inconnu : {fmt}")
+    lignes = [list(df.columns)] + df.astype(object).values.tolist()
+    if titre:
+        lignes = [[titre] + [None] * (df.shape[1] - 1), [None] * df.shape[1]] + lignes
+    brut = pd.DataFrame(lignes)
+    if fmt == 'csv':
+        return brut.to_csv(index=False, header=False).encode()
+    buffer = io.BytesIO()
+    brut.to_excel(buffer, index=False, header=False, engine='odf' if fmt == 'ods' else 'openpyxl')
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paire de fichiers MAGASIN / POUS synthétiques")
+    parser.add_argument("--lignes", type=int, default=10_000)
+    parser.add_argument("--taux-ecarts", type=float, default=0.05)
+    parser.add_argument("--format", default='csv', choices=FORMATS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sortie", default=".")
+    args = parser.parse_args()
+
+    paire = generer_paire(args.lignes, args.taux_ecarts, args.seed)
+    os.makedirs(args.sortie, exist_ok=True)
+    for nom, data in zip(("MAGASIN", "POUS"), paire.fichiers(args.format)):
+        with open(os.path.join(args.sortie, f"{nom}_{args.lignes}.{args.format}"), 'wb') as f:
+            f.write(data)
+    print(f"{len(paire.terrain)} lignes MAGASIN, {len(paire.info)} lignes POUS, "
+          f"{paire.nb_ecarts} écarts attendus -> {args.sortie}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Comparaison incrémentale entre extractions successives d'un même stock.
+
+Chaque comparaison laisse un instantané par fichier : empreinte de chaque ligne (colonnes
+code / lot / quantité / libellé), clés (Code, Lot) normalisées, agrégats et libellés, plus
+le tableau de comparaison. Une nouvelle extraction est comparée ligne à ligne à l'instantané :
+seules les lignes nouvelles sont normalisées, seuls les articles touchés sont regroupés et
+fusionnés à nouveau, le reste du tableau est repris. Le résultat est le même qu'un calcul complet.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from agregation import fusionner_agregats
+from normalisation import formater_sans_decimale_serie, nettoyer_lot_serie
+
+# Au-delà de cette part de lignes changées, le calcul complet est plus rapide
+SEUIL_CHANGEMENTS = 0.25
+NB_MAX_INSTANTANES = 2
+# Sel des lignes identiques répétées (n-ième occurrence d'une même empreinte)
+_SEL_OCCURRENCE = np.uint64(0x9E3779B97F4A7C15)
+COLONNES_CHANGEMENTS = ['Fichier', 'Code', 'Lot', 'Avant', 'Après', 'Statut']
+
+
+def empreintes_lignes(df, colonnes):
+    """Empreinte de chaque ligne sur les colonnes données, unique même pour des lignes répétées"""
+    empreintes = pd.util.hash_pandas_object(df[colonnes], index=False).to_numpy()
+    occurrences = pd.Series(empreintes).groupby(empreintes, sort=False).cumcount().to_numpy()
+    with np.errstate(over='ignore'):
+        return empreintes + occurrences.astype(np.uint64) * _SEL_OCCURRENCE
+
+
+def libelles_premiers(codes, libelles):
+    """Premier libellé renseigné de chaque code"""
+    temp = pd.DataFrame({'Code': codes, 'Lib': libelles}).dropna().drop_duplicates(subset=['Code'])
+    return dict(zip(temp['Code'], temp['Lib']))
+
+
+def agreger(codes, lots, qte, positions, nom_qte, nom_pos):
+    """Somme des quantités et première ligne de chaque (Code, Lot)"""
+    agg = pd.DataFrame({'Code': codes, 'Lot': lots, nom_qte: qte, nom_pos: positions})
+    return agg.groupby(['Code', 'Lot']).agg(
+        **{nom_qte: (nom_qte, 'sum'), nom_pos: (nom_pos, 'first')}).reset_index()
+
+
+class Instantane:
+    """État d'un fichier après comparaison : empreintes de lignes, clés normalisées, agrégats, libellés"""
+
+    def __init__(self, colonnes, empreintes, codes, lots, agg, libelles):
+        # Colonnes code / lot / quantité / libellé du fichier (même disposition exigée)
+        self.colonnes = colonnes
+        self.empreintes = pd.Index(empreintes)
+        self.codes = codes
+        self.lots = lots
+        self.agg = agg
+        self.libelles = libelles
+
+    def comparer(self, df, colonnes, empreintes, nom_qte, nom_pos):
+        """
+        Nouvel instantané pour df, en ne traitant que les lignes changées, ou None si la
+        disposition diffère, si trop de lignes ont changé ou si les lignes des articles
+        inchangés ont été réordonnées. Retourne (instantané, codes touchés, lignes ajoutées, lignes retirées,
+        nouvelle position de chaque ligne de l'instantané (-1 si retirée)).
+        """
+        if colonnes != self.colonnes:
+            return None
+        anciennes = self.empreintes.get_indexer(empreintes)
+        reprises = np.flatnonzero(anciennes >= 0)
+        ajoutees = np.flatnonzero(anciennes < 0)
+        nouvelle_position = np.full(len(self.empreintes), -1, dtype=np.intp)
+        nouvelle_position[anciennes[reprises]] = reprises
+        retirees = np.flatnonzero(nouvelle_position < 0)
+        if len(ajoutees) + len(retirees) > SEUIL_CHANGEMENTS * max(len(df), 1):
+            return None
+
+        col_code, col_lot, col_qte, col_lib = colonnes
+        # Clés normalisées : reprises de l'instantané, calculées pour les seules lignes ajoutées
+        ordre = np.empty(len(df), dtype=np.intp)
+        ordre[np.concatenate([reprises, ajoutees])] = np.arange(len(df))
+
+        def completer(precedentes, normaliser, colonne):
+            valeurs = precedentes.take(anciennes[reprises])
+            if len(ajoutees):
+                valeurs = pd.concat([valeurs, normaliser(df[colonne].iloc[ajoutees])], ignore_index=True)
+            return valeurs.take(ordre).reset_index(drop=True)
+
+        codes = completer(self.codes, formater_sans_decimale_serie, col_code)
+        lots = completer(self.lots, nettoyer_lot_serie, col_lot)
+
+        touches = pd.unique(np.concatenate([codes.take(ajoutees).to_numpy(dtype=object),
+                                            self.codes.take(retirees).to_numpy(dtype=object)]))
+        # Articles touchés : regroupés à nouveau sur leurs seules lignes
+        dans_touches = codes.isin(touches).to_numpy(dtype=bool)
+        # Articles non touchés repris tels quels : leurs lignes doivent être restées dans le même
+        # ordre pour que la première ligne de chaque clé reste la première
+        if (np.diff(anciennes[~dans_touches]) < 0).any():
+            return None
+        lignes = np.flatnonzero(dans_touches)
+        agg_touches = agreger(codes.take(lignes).reset_index(drop=True), lots.take(lignes).reset_index(drop=True),
+                              df[col_qte].take(lignes).reset_index(drop=True), lignes, nom_qte, nom_pos)
+        gardes = self.agg[~self.agg['Code'].isin(touches)]
+        gardes = gardes.assign(**{nom_pos: nouvelle_position[gardes[nom_pos].to_numpy()]})
+        agg = pd.concat([gardes, agg_touches], ignore_index=True)
+
+        exclus = set(touches)
+        libelles = {code: lib for code, lib in self.libelles.items() if code not in exclus}
+        if col_lib:
+            libelles.update(libelles_premiers(codes.take(lignes).reset_index(drop=True),
+                                              df[col_lib].take(lignes).reset_index(drop=True)))
+        instantane = Instantane(colonnes, empreintes, codes, lots, agg, libelles)
+        return instantane, touches, len(ajoutees), len(retirees), nouvelle_position
+
+
+def changements_cote(fichier, avant, apres, touches, nom_qte):
+    """Quantités (Code, Lot) modifiées, ajoutées ou retirées parmi les articles touchés"""
+    avant = avant[avant['Code'].isin(touches)][['Code', 'Lot', nom_qte]]
+    apres = apres[apres['Code'].isin(touches)][['Code', 'Lot', nom_qte]]
+    diff = pd.merge(avant, apres, on=['Code', 'Lot'], how='outer', suffixes=('_avant', '_apres'))
+    diff = diff.rename(columns={f'{nom_qte}_avant': 'Avant', f'{nom_qte}_apres': 'Après'})
+    diff = diff[diff['Avant'].ne(diff['Après'])]
+    statut = np.where(diff['Avant'].isna(), 'AJOUTÉ', np.where(diff['Après'].isna(), 'RETIRÉ', 'MODIFIÉ'))
+    return diff.assign(Fichier=fichier, Statut=statut)[COLONNES_CHANGEMENTS]
+
+
+class MagasinInstantanes:
+    """Dernières comparaisons (instantanés Info / Terrain + tableau), les plus récentes d'abord"""
+
+    def __init__(self, nb_max=NB_MAX_INSTANTANES):
+        self.nb_max = nb_max
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, cle, entree):
+        with self._verrou:
+            self._entrees[cle] = entree
+            self._entrees.move_to_end(cle, last=False)
+            while len(self._entrees) > self.nb_max:
+                self._entrees.popitem()
+
+    def candidates(self):
+        with self._verrou:
+            return list(self._entrees.values())
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+def comparer_increment(precedente, fichiers):
+    """
+    Tableau de comparaison à partir d'une comparaison précédente et des nouveaux fichiers.
+    fichiers : {'i': (df, colonnes, empreintes), 't': (...)} ; None si le calcul complet s'impose.
+    Retourne (entrée d'instantané, merged avec _Pos_Info / _Pos_Terrain, résumé des changements).
+    """
+    noms = {'i': ('Qte_Info', '_Pos_Info', 'POUS'), 't': ('Qte_Terrain', '_Pos_Terrain', 'MAGASIN')}
+    nouveaux, touches, resume, positions = {}, [], [], {}
+    for cote, (df, colonnes, empreintes) in fichiers.items():
+        nom_qte, nom_pos, fichier = noms[cote]
+        resultat = precedente[cote].comparer(df, colonnes, empreintes, nom_qte, nom_pos)
+        if resultat is None:
+            return None
+        nouveaux[cote], touches_cote, ajoutees, retirees, positions[cote] = resultat
+        touches.append(touches_cote)
+        resume.append({'fichier': fichier, 'lignes_ajoutees': ajoutees, 'lignes_retirees': retirees,
+                       'articles_touches': len(touches_cote)})
+    touches = pd.unique(np.concatenate(touches)) if touches else np.array([], dtype=object)
+
+    # Tableau : lignes des articles touchés refusionnées, les autres reprises (positions décalées)
+    lib_master = {**nouveaux['t'].libelles, **nouveaux['i'].libelles}
+    refaites = fusionner_agregats(nouveaux['i'].agg[nouveaux['i'].agg['Code'].isin(touches)],
+                                  nouveaux['t'].agg[nouveaux['t'].agg['Code'].isin(touches)], lib_master)
+    gardes = precedente['merged'][~precedente['merged']['Code'].isin(touches)]
+    decalees = {}
+    for cote in ('i', 't'):
+        nom_pos = noms[cote][1]
+        anciennes = gardes[nom_pos].to_numpy()
+        connues = ~np.isnan(anciennes)
+        nouvelles = np.full(len(anciennes), np.nan)
+        nouvelles[connues] = positions[cote][anciennes[connues].astype(np.intp)]
+        decalees[nom_pos] = nouvelles
+    merged = pd.concat([gardes.assign(**decalees), refaites], ignore_index=True)
+    merged = merged.sort_values(['Code', 'Lot'], ignore_index=True)
+
+    changements = pd.concat([changements_cote(noms[c][2], precedente[c].agg, nouveaux[c].agg, touches, noms[c][0])
+                             for c in ('i', 't')], ignore_index=True)
+    entree = {'i': nouveaux['i'], 't': nouveaux['t'], 'merged': merged}
+    return entree, merged, {'resume': resume, 'changements': changements}
+
+
+# Instantanés partagés par les sessions du process Streamlit
+INSTANTANES = MagasinInstantanes()
@@ -0,0 +1,221 @@
+"""
+Journal de l'inventaire tournant (STOCK OK / CORRECTION) dans une base SQLite locale.
+
+Les scans sont mis en file puis écrits par lots, en une transaction, par un thread dédié :
+les tablettes ne se bloquent pas sur le disque et la base (mode WAL) reste lisible pendant
+l'écriture. Le journal survit au rechargement de la page et au redémarrage du serveur.
+"""
+import atexit
+import datetime
+import os
+import sqlite3
+import threading
+import types
+import numpy as np
+import pandas as pd
+from export import ExportDiffere, exporter
+from normalisation import formater_sans_decimale_serie
+from schemas import SCHEMAS
+from utils import formater_sans_decimale, LARGEURS_MAJ
+
+CHEMIN_JOURNAL = os.environ.get('STOCKITO_JOURNAL') or "journal_inventaire.sqlite"
+# Écriture dès TAILLE_LOT événements en attente, sinon au plus tard après DELAI_ECRITURE_S
+TAILLE_LOT = 200
+DELAI_ECRITURE_S = 0.5
+TAILLE_PAGE = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS evenements (
+    id INTEGER PRIMARY KEY,
+    horodatage TEXT NOT NULL,
+    fichier TEXT NOT NULL,
+    code TEXT NOT NULL,
+    libelle TEXT,
+    ancien INTEGER,
+    nouveau INTEGER,
+    statut TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_evenements_code_horodatage ON evenements (code, horodatage);
+CREATE INDEX IF NOT EXISTS idx_evenements_fichier_horodatage ON evenements (fichier, horodatage);
+"""
+_INSERTION = ("INSERT INTO evenements (horodatage, fichier, code, libelle, ancien, nouveau, statut) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?)")
+COLONNES_HISTORIQUE = ['Heure', 'Code', 'Libellé', 'Ancien', 'Nouveau', 'Statut']
+
+
+class JournalInventaire:
+    """Journal persistant des scans, écrit par lots ; fichier = empreinte du fichier POUS scanné"""
+
+    def __init__(self, chemin=CHEMIN_JOURNAL, taille_lot=TAILLE_LOT, delai=DELAI_ECRITURE_S):
+        self.chemin = chemin
+        self.taille_lot = taille_lot
+        self.delai = delai
+        self._en_attente = []
+        self._verrou = threading.Lock()
+        # Sérialise les écritures (thread d'écriture et synchroniser())
+        self._verrou_ecriture = threading.Lock()
+        self._reveil = threading.Event()
+        self._ecrivain = None
+        self._local = threading.local()
+        # Dernières corrections par fichier, lues une fois dans la base puis tenues à jour
+        self._corrections = {}
+
+    def _connexion(self):
+        """Connexion propre au thread (sqlite3 n'en partage pas entre threads)"""
+        cnx = getattr(self._local, 'cnx', None)
+        if cnx is None:
+            cnx = sqlite3.connect(self.chemin, timeout=30)
+            cnx.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL : pas de fsync à chaque transaction, base toujours cohérente
+            cnx.execute("PRAGMA synchronous=NORMAL")
+            cnx.executescript(_SCHEMA)
+            self._local.cnx = cnx
+        return cnx
+
+    def ajouter(self, fichier, code, libelle, ancien, nouveau, statut, horodatage=None):
+        """Met un événement en file d'écriture (retour immédiat)"""
+        horodatage = horodatage or datetime.datetime.now()
+        evenement = (horodatage.isoformat(timespec='seconds'), fichier, formater_sans_decimale(code),
+                     None if libelle is None else str(libelle), _entier(ancien), _entier(nouveau), statut)
+        with self._verrou:
+            self._en_attente.append(evenement)
+            if statut == 'CORRECTION' and fichier in self._corrections:
+                self._corrections[fichier][evenement[2]] = evenement[5]
+            plein = len(self._en_attente) >= self.taille_lot
+            if self._ecrivain is None:
+                self._ecrivain = threading.Thread(target=self._boucle_ecriture, name='journal', daemon=True)
+                self._ecrivain.start()
+                atexit.register(self.synchroniser)
+        if plein:
+            self._reveil.set()
+
+    def _boucle_ecriture(self):
+        while True:
+            self._reveil.wait(self.delai)
+            self._reveil.clear()
+            self.synchroniser()
+
+    def synchroniser(self):
+        """Écrit tout de suite les événements en attente (une transaction)"""
+        with self._verrou_ecriture:
+            self._vider_file()
+
+    def _vider_file(self):
+        # Appelé avec _verrou_ecriture
+        with self._verrou:
+            lot, self._en_attente = self._en_attente, []
+        if lot:
+            with self._connexion() as cnx:
+                cnx.executemany(_INSERTION, lot)
+
+    def _lire(self, requete, parametres=()):
+        # Les lectures voient aussi les derniers scans encore en file
+        self.synchroniser()
+        return self._connexion().execute(requete, parametres).fetchall()
+
+    def nombre(self, fichier):
+        return self._lire("SELECT COUNT(*) FROM evenements WHERE fichier = ?", (fichier,))[0][0]
+
+    def page(self, fichier, numero=1, taille=TAILLE_PAGE):
+        """Page numero (1 = plus récents) de l'historique d'un fichier"""
+        lignes = self._lire(
+            "SELECT strftime('%d/%m %H:%M', horodatage), code, libelle, ancien, nouveau, statut "
+            "FROM evenements WHERE fichier = ? ORDER BY horodatage DESC, id DESC LIMIT ? OFFSET ?",
+            (fichier, taille, (max(numero, 1) - 1) * taille))
+        return pd.DataFrame(lignes, columns=COLONNES_HISTORIQUE)
+
+    def historique_article(self, code, fichier=None):
+        """Événements d'un article, du plus récent au plus ancien (tous fichiers si fichier=None)"""
+        requete = ("SELECT strftime('%d/%m %H:%M', horodatage), code, libelle, ancien, nouveau, statut "
+                   "FROM evenements WHERE code = ?")
+        parametres = [formater_sans_decimale(code)]
+        if fichier is not None:
+            requete += " AND fichier = ?"
+            parametres.append(fichier)
+        lignes = self._lire(requete + " ORDER BY horodatage DESC, id DESC", parametres)
+        return pd.DataFrame(lignes, columns=COLONNES_HISTORIQUE)
+
+    def _corrections_fichier(self, fichier):
+        with self._verrou:
+            connues = self._corrections.get(fichier)
+        if connues is not None:
+            return connues
+        # Pas d'écriture entre la lecture de la base et la prise en compte de la file
+        with self._verrou_ecriture:
+            self._vider_file()
+            lignes = self._connexion().execute(
+                "SELECT code, nouveau FROM evenements WHERE id IN ("
+                "SELECT MAX(id) FROM evenements WHERE fichier = ? AND statut = 'CORRECTION' GROUP BY code)",
+                (fichier,)).fetchall()
+            with self._verrou:
+                connues = self._corrections.setdefault(fichier, dict(lignes))
+                for evenement in self._en_attente:
+                    if evenement[1] == fichier and evenement[6] == 'CORRECTION':
+                        connues[evenement[2]] = evenement[5]
+        return connues
+
+    def corrections(self, fichier):
+        """Dernière quantité corrigée de chaque article d'un fichier (code normalisé -> quantité)"""
+        connues = self._corrections_fichier(fichier)
+        with self._verrou:
+            return dict(connues)
+
+    def vue_corrections(self, fichier):
+        """Mêmes corrections en lecture seule, à jour des événements ajoutés ensuite (sans copie)"""
+        return types.MappingProxyType(self._corrections_fichier(fichier))
+
+
+def _entier(valeur):
+    return None if valeur is None or pd.isna(valeur) else int(valeur)
+
+
+def mise_a_jour_pous(df, col_code, col_qte, corrections):
+    """
+    Fichier POUS avec les corrections du journal. Une correction porte sur le total de l'article :
+    une hausse va sur sa première ligne, une baisse est prise sur ses lignes dans l'ordre.
+    Codes / EAN formatés et lignes à quantité nulle écartées, comme le fichier final.
+    """
+    codes = formater_sans_decimale_serie(df[col_code]).to_numpy(dtype=object)
+    qte = pd.to_numeric(df[col_qte], errors='coerce').fillna(0).to_numpy()
+    nouvelle = qte.astype(np.float64)
+    groupes = pd.Series(np.arange(len(df))).groupby(codes, sort=False).indices
+    for code, total in corrections.items():
+        positions = groupes.get(code)
+        if positions is None:
+            continue
+        ecart = total - nouvelle[positions].sum()
+        if ecart < 0:
+            for p in positions:
+                pris = min(max(nouvelle[p], 0), -ecart)
+                nouvelle[p] -= pris
+                ecart += pris
+                if ecart >= 0:
+                    break
+        nouvelle[positions[0]] += ecart
+
+    if np.issubdtype(qte.dtype, np.integer) or np.array_equal(nouvelle, np.round(nouvelle)):
+        nouvelle = nouvelle.astype(np.int64)
+    maj = df.assign(**{col_code: codes, col_qte: nouvelle})
+    meta = SCHEMAS.profil(df).colonnes
+    col_dispo = meta['dispo']
+    if col_dispo and col_dispo != col_qte:
+        # Disponible suit la correction (réservé inchangé)
+        dispo = pd.to_numeric(df[col_dispo], errors='coerce').fillna(0).to_numpy()
+        maj[col_dispo] = dispo + (nouvelle - qte)
+    col_ean = meta['ean']
+    if col_ean:
+        maj[col_ean] = formater_sans_decimale_serie(df[col_ean]).to_numpy()
+    return maj[nouvelle != 0].reset_index(drop=True)
+
+
+def export_mise_a_jour(journal, reference, fmt='xlsx'):
+    """Fichier POUS corrigé d'une référence partagée, construit seulement quand il est demandé"""
+    def calcul():
+        maj = mise_a_jour_pous(reference.df, reference.colonnes['code'], reference.colonnes['qte'],
+                               journal.corrections(reference.empreinte))
+        return exporter(maj, fmt, LARGEURS_MAJ, "Inventaire_Complet")
+    return ExportDiffere(calcul, fmt)
+
+
+# Journal partagé par toutes les sessions du process Streamlit
+JOURNAL = JournalInventaire()
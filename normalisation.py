@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# Alias de lots ramenés au lot 'STOCK' (cf. utils.nettoyer_lot)
+LOTS_STOCK = ['STOCK+RECYCL0', 'RECYCL0', 'STOCK RECYCL0', 'STOCK+RECYCLO']
+
+
+def _en_texte(serie):
+    """Equivalent colonne de str(valeur).strip() (les manquants restent manquants)"""
+    if serie.dtype.kind in 'mM' or isinstance(serie.dtype, pd.PeriodDtype):
+        # astype(str) formate les dates différemment de str(Timestamp)
+        serie = serie.astype(object)
+    return serie.astype(str).str.strip()
+
+
+def _majuscules(txt):
+    """str.upper() colonne, en gardant la casse Python pour les caractères non ASCII (ß -> SS)"""
+    val = txt.str.upper()
+    special = ~txt.str.isascii().to_numpy(dtype=bool)
+    if special.any():
+        val[special] = txt[special].map(str.upper)
+    return val
+
+
+def _format_entier(valeurs):
+    """"{:.0f}".format(v) sur un tableau de floats"""
+    arrondis = np.rint(valeurs)
+    # Voie rapide : l'entier arrondi s'écrit à l'identique ("-0" excepté)
+    rapide = (np.isfinite(arrondis) & (np.abs(arrondis) < 2 ** 62)
+              & ((arrondis != 0) | ~np.signbit(valeurs)))
+    resultat = np.empty(len(valeurs), dtype=object)
+    resultat[rapide] = arrondis[rapide].astype(np.int64).astype(str).astype(object)
+    if not rapide.all():
+        resultat[~rapide] = np.char.mod('%.0f', valeurs[~rapide]).astype(object)
+    return resultat
+
+
+def _vers_float(textes):
+    """float() appliqué à un tableau de textes, NaN quand la conversion échoue"""
+    valeurs = np.asarray(textes, dtype=object)
+    try:
+        return valeurs.astype(float), np.ones(len(valeurs), dtype=bool)
+    except (ValueError, TypeError):
+        # Au moins une valeur invalide : conversion au cas par cas
+        resultat = np.full(len(valeurs), np.nan)
+        ok = np.zeros(len(valeurs), dtype=bool)
+        for i, v in enumerate(valeurs):
+            try:
+                resultat[i] = float(v)
+                ok[i] = True
+            except (ValueError, TypeError):
+                pass
+        return resultat, ok
+
+
+def _par_categories(serie, normaliser):
+    """Colonne catégorielle : seules les catégories sont normalisées, puis reportées par leurs codes"""
+    # Le manquant (code -1) prend la dernière valeur
+    categories = pd.Series(np.append(serie.cat.categories.to_numpy(dtype=object), np.nan), dtype=object)
+    valeurs = normaliser(categories).to_numpy(dtype=object)
+    return pd.Series(valeurs[serie.cat.codes.to_numpy()], index=serie.index, dtype='str')
+
+
+def formater_sans_decimale_serie(serie):
+    """Version colonne de formater_sans_decimale (même résultat, sans apply)"""
+    if serie.empty:
+        return serie.apply(lambda v: v)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return _par_categories(serie, formater_sans_decimale_serie)
+    manquant = serie.isna().to_numpy()
+    txt = _en_texte(serie).fillna("")
+
+    # Notation scientifique : "{:.0f}".format(float(txt.replace(',', '.')))
+    sci = txt.str.contains("E+", case=False, regex=False).to_numpy(dtype=bool) & ~manquant
+    if sci.any():
+        valeurs, ok = _vers_float(txt[sci].str.replace(',', '.', regex=False))
+        idx_sci = np.flatnonzero(sci)
+        sci_ok = idx_sci[ok]
+        sci[idx_sci[~ok]] = False
+        if len(sci_ok):
+            txt.iloc[sci_ok] = _format_entier(valeurs[ok])
+
+    # Suffixe '.0' (uniquement hors notation scientifique convertie)
+    suffixe = txt.str.endswith('.0').to_numpy(dtype=bool) & ~sci & ~manquant
+    if suffixe.any():
+        txt[suffixe] = txt[suffixe].str[:-2]
+
+    txt[manquant] = ""
+    return txt.astype(str)
+
+
+def nettoyer_lot_serie(serie):
+    """Version colonne de nettoyer_lot (même résultat, sans apply)"""
+    if serie.empty:
+        return serie.apply(lambda v: v)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return _par_categories(serie, nettoyer_lot_serie)
+    manquant = serie.isna().to_numpy()
+    val = _majuscules(_en_texte(serie).fillna(""))
+    val = val.where(~val.isin(LOTS_STOCK), 'STOCK')
+    sans_lot = manquant | val.isin(['', 'NAN']).to_numpy(dtype=bool)
+    val[sans_lot] = "SANS_LOT"
+    return val.astype(str)
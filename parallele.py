@@ -0,0 +1,49 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from utils import charger_fichier_pandas, lire_contenu, FichierMemoire
+
+# Processus de lecture des classeurs (openpyxl / odf gardent le GIL pendant le parsing)
+NB_PROCESSUS_CHARGEMENT = min(4, os.cpu_count() or 1)
+
+_pools = {}
+_verrou = threading.Lock()
+
+
+def _pool(nom):
+    """Pools partagés par le process (créés au premier usage, réutilisés ensuite)"""
+    with _verrou:
+        if nom not in _pools:
+            if nom == 'processus':
+                # Pas de fork du process Streamlit (threads du journal, du service de scan...) :
+                # un verrou pris par un autre thread au moment du fork bloquerait le processus fils
+                methodes = multiprocessing.get_all_start_methods()
+                contexte = multiprocessing.get_context('forkserver' if 'forkserver' in methodes else 'spawn')
+                _pools[nom] = ProcessPoolExecutor(NB_PROCESSUS_CHARGEMENT, mp_context=contexte)
+            else:
+                _pools[nom] = ThreadPoolExecutor(thread_name_prefix='chargement')
+        return _pools[nom]
+
+
+def _charger(data, nom, plan):
+    if nom.endswith('.csv'):
+        # Le parseur CSV de pandas libère le GIL : un thread suffit
+        return charger_fichier_pandas(FichierMemoire(data, nom), plan)
+    # Classeur lu dans un processus du pool (première feuille, comme le chargement séquentiel)
+    return _pool('processus').submit(charger_fichier_pandas, FichierMemoire(data, nom), plan).result()
+
+
+def lancer_chargement(file, plan=None):
+    """
+    Lance le chargement d'un fichier en arrière-plan et retourne un Future
+    (même résultat que charger_fichier_pandas).
+    Le contenu est copié : le fichier d'origine peut être relu pendant le chargement.
+    """
+    return _pool('threads').submit(_charger, lire_contenu(file), file.name, plan)
+
+
+def charger_fichiers(fichiers, plan=None):
+    """Charge plusieurs fichiers en même temps (liste de DataFrame ou None, dans l'ordre)"""
+    lectures = [lancer_chargement(file, plan) for file in fichiers]
+    return [lecture.result() for lecture in lectures]
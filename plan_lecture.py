@@ -0,0 +1,53 @@
+from schemas import SCHEMAS, MOTS_CLES_COMPARAISON, MOTS_CLES_META_INFO, MOTS_CLES_META_TERRAIN
+
+# Types imposés par rôle : 'str' à la lecture, 'numerique' après lecture.
+# Les codes gardent l'inférence du parseur : '0123' lu comme 123 doit continuer
+# à correspondre au 123 numérique d'un fichier Excel.
+TYPES_ROLES = {'lib': 'str', 'qte': 'numerique'}
+
+
+class PlanLecture:
+    """
+    Plan de lecture d'un fichier : colonnes à lire (par rôle) et types imposés.
+    Il est résolu sur l'en-tête détecté, avant la lecture complète, et gardé dans le
+    profil de schéma de cet en-tête (une seule résolution par disposition de fichier).
+    """
+
+    def __init__(self, nom, roles, toutes_colonnes=False):
+        self.nom = nom
+        self.roles = list(roles)
+        self.toutes_colonnes = toutes_colonnes
+
+    def resoudre(self, entetes):
+        """Rôle -> nom de colonne, sur la liste des noms normalisés"""
+        return SCHEMAS.colonnes(entetes, self.roles)
+
+    def calculer(self, profil):
+        """(positions, types) de ce plan sur un profil de schéma"""
+        resolues = {role: profil.colonnes[role] for role in self.roles}
+        if self.toutes_colonnes:
+            positions = None
+        else:
+            retenues = {col for col in resolues.values() if col is not None}
+            positions = [i for i, nom in enumerate(profil.entetes) if nom in retenues]
+        types = {resolues[role]: t for role, t in TYPES_ROLES.items() if resolues.get(role)}
+        return positions, types
+
+    def lecture(self, entetes):
+        """(positions, types) du plan sur cet en-tête, repris du profil si la disposition est connue"""
+        return SCHEMAS.profil(entetes).plan(self)
+
+    def positions(self, entetes):
+        """Positions des colonnes à lire (dans l'ordre du fichier), None pour toutes"""
+        return self.lecture(entetes)[0]
+
+    def types(self, entetes):
+        """Nom normalisé -> type imposé ('str' ou 'numerique')"""
+        return self.lecture(entetes)[1]
+
+
+# Plans utilisés par StockProcessor
+PLAN_COMPARAISON = PlanLecture('comparaison', MOTS_CLES_COMPARAISON)
+PLAN_TERRAIN_EXPORT = PlanLecture('terrain_export', {**MOTS_CLES_COMPARAISON, **MOTS_CLES_META_TERRAIN})
+PLAN_INFO_EXPORT = PlanLecture('info_export', {**MOTS_CLES_COMPARAISON, **MOTS_CLES_META_INFO},
+                               toutes_colonnes=True)
@@ -0,0 +1,240 @@
+import copy
+import threading
+import numpy as np
+import pandas as pd
+from utils import formater_sans_decimale, lire_contenu
+from normalisation import formater_sans_decimale_serie
+from schemas import SCHEMAS
+
+# Rôles des colonnes scannables (code article, EAN, série)
+ROLES_SCAN = ('code', 'ean', 'ser')
+
+
+def normaliser_scan(valeur):
+    """Normalise une saisie de scan comme les clés de l'index"""
+    return formater_sans_decimale(valeur).upper()
+
+
+# Recherche approchée : longueur minimale de saisie (en dessous, presque tout est à distance 1)
+LONGUEUR_MIN_APPROCHE = 4
+# Clés préfixées examinées pour classer les complétions (les plus courtes d'abord)
+FENETRE_PREFIXE = 500
+# Ordre des types de correspondance dans les candidats
+RANG_TYPES = {'exact': 0, 'approche': 1, 'prefixe': 2}
+
+
+def voisins(cle, alphabet):
+    """Clés à distance d'édition 1 : suppression, transposition, substitution, insertion"""
+    coupes = [(cle[:i], cle[i:]) for i in range(len(cle) + 1)]
+    for gauche, droite in coupes:
+        if droite:
+            yield gauche + droite[1:]
+            if len(droite) > 1:
+                yield gauche + droite[1] + droite[0] + droite[2:]
+            for c in alphabet:
+                if c != droite[0]:
+                    yield gauche + c + droite[1:]
+        for c in alphabet:
+            yield gauche + c + droite
+
+
+def colonnes_scannables(df):
+    """Colonnes code / EAN / série identifiées dans le fichier"""
+    colonnes = []
+    for col in SCHEMAS.colonnes(df, ROLES_SCAN).values():
+        if col is not None and col not in colonnes:
+            colonnes.append(col)
+    return colonnes
+
+
+class IndexRecherche:
+    """
+    Index valeur normalisée -> positions de lignes, construit une fois au chargement.
+    Une recherche coûte un accès dictionnaire au lieu d'un masque sur tout le fichier.
+    candidats() ajoute la recherche par préfixe et par faute de frappe (distance 1), sur les
+    clés triées et l'alphabet des clés, préparés au premier appel ou dès la construction (approche=True).
+    """
+
+    def __init__(self, df, toutes_colonnes=False, approche=False):
+        self.df = df
+        if toutes_colonnes:
+            self.colonnes = list(df.columns)
+        else:
+            self.colonnes = colonnes_scannables(df) or list(df.columns)
+
+        cles, positions = [], []
+        for col in self.colonnes:
+            valeurs = formater_sans_decimale_serie(df[col]).str.upper()
+            valide = (valeurs != "").to_numpy(dtype=bool)
+            cles.append(valeurs.to_numpy(dtype=object)[valide])
+            positions.append(np.flatnonzero(valide))
+
+        cles = np.concatenate(cles) if cles else np.array([], dtype=object)
+        positions = np.concatenate(positions) if positions else np.array([], dtype=np.intp)
+
+        # Tri (clé, position) : chaque clé pointe sur une tranche de positions croissantes
+        codes, uniques = pd.factorize(cles)
+        ordre = np.lexsort((positions, codes))
+        codes, self._positions = codes[ordre], positions[ordre]
+        bornes = np.flatnonzero(np.diff(codes)) + 1
+        debuts = np.concatenate([[0], bornes]) if len(codes) else np.array([], dtype=np.intp)
+        fins = np.concatenate([bornes, [len(codes)]]) if len(codes) else np.array([], dtype=np.intp)
+        self._tranches = dict(zip(np.asarray(uniques, dtype=object)[codes[debuts]],
+                                  zip(debuts.tolist(), fins.tolist())))
+        # Clé -> première position, pour résoudre une colonne de scans en une jointure
+        self._cles = pd.Index(np.asarray(uniques, dtype=object)[codes[debuts]])
+        self._premieres = self._positions[debuts]
+        self._triees = None
+        self._alphabet = None
+        self._verrou = threading.Lock()
+        if approche:
+            self._preparer_approche()
+
+    def _preparer_approche(self):
+        """Clés triées (préfixes par recherche dichotomique) et caractères utilisés (fautes de frappe)"""
+        with self._verrou:
+            if self._triees is None:
+                self._alphabet = ''.join(sorted(set(''.join(self._cles.tolist()))))
+                self._triees = self._cles.sort_values().to_numpy(dtype=object)
+
+    def __len__(self):
+        return len(self._tranches)
+
+    def positions(self, query):
+        """Positions (iloc) de toutes les lignes correspondant au scan, sans doublon"""
+        tranche = self._tranches.get(normaliser_scan(query))
+        if tranche is None:
+            return np.array([], dtype=np.intp)
+        return np.unique(self._positions[tranche[0]:tranche[1]])
+
+    def premiere_position(self, query):
+        """Position de la première ligne correspondant au scan, ou None"""
+        tranche = self._tranches.get(normaliser_scan(query))
+        if tranche is None:
+            return None
+        return int(self._positions[tranche[0]])
+
+    def premieres_positions(self, queries):
+        """Version colonne de premiere_position : une position par scan, -1 si inconnu"""
+        cles = formater_sans_decimale_serie(pd.Series(queries, dtype=object)).str.upper()
+        trouves = self._cles.get_indexer(cles.to_numpy(dtype=object))
+        return np.where(trouves >= 0, self._premieres[trouves], -1)
+
+    def chercher(self, query):
+        """Retourne la première ligne correspondante (Series) ou None"""
+        pos = self.premiere_position(query)
+        if pos is None:
+            return None
+        return self.df.iloc[pos]
+
+    def candidats(self, query, limite=10):
+        """
+        Clés proches d'une saisie, les plus probables d'abord : correspondance exacte,
+        faute de frappe (une édition, même longueur d'abord), puis complétions du préfixe
+        (les plus courtes d'abord). Liste de dict cle / type / distance / position.
+        """
+        cle = normaliser_scan(query)
+        if not cle:
+            return []
+        if self._triees is None:
+            self._preparer_approche()
+        trouves = {}
+        if cle in self._tranches:
+            trouves[cle] = ('exact', 0)
+        if len(cle) >= LONGUEUR_MIN_APPROCHE:
+            for voisin in voisins(cle, self._alphabet):
+                if voisin not in trouves and voisin in self._tranches:
+                    trouves[voisin] = ('approche', 1)
+        debut = int(np.searchsorted(self._triees, cle))
+        for complete in self._triees[debut:debut + FENETRE_PREFIXE]:
+            if not complete.startswith(cle):
+                break
+            trouves.setdefault(complete, ('prefixe', len(complete) - len(cle)))
+
+        ordre = sorted(trouves.items(), key=lambda c: (RANG_TYPES[c[1][0]], c[1][1],
+                                                       abs(len(c[0]) - len(cle)), c[0]))
+        return [{'cle': c, 'type': t, 'distance': d, 'position': int(self._positions[self._tranches[c][0]])}
+                for c, (t, d) in ordre[:limite]]
+
+
+class CumulArticles:
+    """
+    Table de cumul par article (code normalisé) calculée au chargement du fichier :
+    quantité totale, nombre de lots, libellé et EAN de la première ligne.
+    Les corrections sont gardées à part (vue du journal, en lecture seule) : la table peut être
+    partagée entre sessions (vue()). Une correction s'enregistre dans le journal.
+    """
+
+    def __init__(self, df, col_code, col_qte, col_lib=None, col_lot=None, col_ean=None):
+        self.df = df
+        self.col_code, self.col_qte, self.col_lot = col_code, col_qte, col_lot
+
+        cumul = pd.DataFrame({
+            'Code': formater_sans_decimale_serie(df[col_code]).to_numpy(dtype=object),
+            'Qte': pd.to_numeric(df[col_qte], errors='coerce').fillna(0).to_numpy(),
+            'Position': np.arange(len(df)),
+        }).groupby('Code', sort=False).agg(
+            Qte_Totale=('Qte', 'sum'), Nb_Lots=('Qte', 'size'), Position=('Position', 'first'))
+
+        positions = cumul['Position'].to_numpy()
+        cumul['Libellé'] = df[col_lib].to_numpy()[positions] if col_lib else None
+        cumul['EAN'] = (formater_sans_decimale_serie(df[col_ean]).to_numpy()[positions]
+                        if col_ean else None)
+        self.table = cumul
+        self.corrections = {}
+
+    def vue(self):
+        """Même table (non copiée) avec ses propres corrections, pour une session"""
+        vue = copy.copy(self)
+        vue.corrections = {}
+        return vue
+
+    def article(self, code):
+        """Ligne de cumul d'un article (Series) ou None"""
+        cle = formater_sans_decimale(code)
+        if cle not in self.table.index:
+            return None
+        ligne = self.table.loc[cle]
+        if cle in self.corrections:
+            ligne = ligne.copy()
+            ligne['Qte_Totale'] = self.corrections[cle]
+        return ligne
+
+    def fiche(self, code):
+        """
+        Fiche de scan : première ligne de l'article avec la quantité cumulée
+        (lot 'MULTI-LOTS (CUMUL)' quand plusieurs lignes sont regroupées).
+        """
+        cumul = self.article(code)
+        if cumul is None:
+            return None
+        item = self.df.iloc[int(cumul['Position'])].to_dict()
+        item[self.col_qte] = cumul['Qte_Totale']
+        if cumul['Nb_Lots'] > 1 and self.col_lot:
+            item[self.col_lot] = "MULTI-LOTS (CUMUL)"
+        return item
+
+
+# Premières valeurs d'un journal de scans reconnues comme en-tête
+MOTS_ENTETE_SCANS = ('code', 'ean', 'scan', 'barre', 'article', 'serie')
+# Ligne "scan;quantité" (séparateur ; tabulation ou virgule, champs suivants ignorés)
+MOTIF_SCAN_QUANTITE = r'^(?P<scan>.+?)\s*[;\t,]\s*(?P<qte>-?\d+)\s*(?:[;\t,].*)?$'
+
+
+def lire_scans(file):
+    """
+    Journal d'un scanner hors ligne (texte ou CSV) : un code / EAN / série par ligne,
+    éventuellement suivi d'une quantité (code;quantité). Colonnes Scan et Quantite (1 par défaut).
+    """
+    texte = lire_contenu(file).decode('utf-8-sig', errors='replace')
+    lignes = pd.Series([ligne.strip() for ligne in texte.splitlines() if ligne.strip()], dtype=object)
+    if lignes.empty:
+        return pd.DataFrame({'Scan': pd.Series(dtype=object), 'Quantite': pd.Series(dtype=np.int64)})
+    if any(mot in lignes.iloc[0].lower() for mot in MOTS_ENTETE_SCANS):
+        lignes = lignes.iloc[1:]
+
+    champs = lignes.str.extract(MOTIF_SCAN_QUANTITE)
+    # Ligne sans quantité : la ligne entière est le scan, compté une fois
+    scans = champs['scan'].fillna(lignes)
+    quantites = pd.to_numeric(champs['qte'], errors='coerce').fillna(1).astype(np.int64)
+    return pd.DataFrame({'Scan': scans.to_numpy(dtype=object), 'Quantite': quantites.to_numpy()})
@@ -0,0 +1,205 @@
+"""
+Fichiers POUS de référence de l'inventaire tournant, partagés par toutes les sessions du process.
+
+Chaque tablette qui charge le même fichier (même contenu) reçoit la même référence : données,
+colonnes détectées, index de scan et cumul par article, en lecture seule. Les données sont
+écrites une fois en Feather non compressé puis relues en mémoire projetée (memory map) :
+les colonnes texte et numériques pointent sur les pages du fichier, communes à tout le process.
+Une référence est libérée quand plus aucune session ne l'utilise.
+"""
+import importlib.util
+import io
+import os
+import tempfile
+import threading
+import weakref
+import pandas as pd
+from cache import empreinte_fichier
+from compactage import compacter, rapport_memoire
+from recherche import IndexRecherche, CumulArticles
+from schemas import SCHEMAS
+from utils import charger_fichier_pandas
+
+# Fichiers Feather gardés sur disque (les plus anciens, hors références en cours, sont supprimés)
+DOSSIER_REFERENCES = os.environ.get('STOCKITO_REFERENCES') or os.path.join(tempfile.gettempdir(),
+                                                                          'stockito_references')
+NB_MAX_FICHIERS = 8
+# Rôles des colonnes utilisées par l'inventaire tournant
+ROLES_TOURNANT = ('code', 'qte', 'lib', 'lot', 'ean')
+# Rapport mémoire rangé dans les métadonnées du fichier Feather
+_CLE_RAPPORT = b'stockito_rapport_memoire'
+
+
+def arrow_disponible():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+class Reference:
+    """Fichier de référence chargé : données compactes, colonnes, index de scan et cumul (lecture seule)"""
+
+    def __init__(self, empreinte, nom, df, rapport=None, projete=False):
+        self.empreinte = empreinte
+        self.nom = nom
+        self.df = df
+        self.rapport = rapport
+        # True si les données sont lues depuis le fichier Feather projeté en mémoire
+        self.projete = projete
+        self.colonnes = SCHEMAS.colonnes(df, ROLES_TOURNANT)
+        self.index = IndexRecherche(df, approche=True)
+        self.cumul = CumulArticles(df, self.colonnes['code'], self.colonnes['qte'],
+                                   col_lib=self.colonnes['lib'], col_lot=self.colonnes['lot'],
+                                   col_ean=self.colonnes['ean'])
+
+
+class JetonReference:
+    """
+    Usage d'une référence par une session. La référence est rendue par liberer(),
+    ou automatiquement quand le jeton disparaît avec la session.
+    """
+
+    def __init__(self, magasin, reference):
+        self.reference = reference
+        # Cumul propre à la session : les corrections d'une tablette ne touchent pas les autres
+        self.cumul = reference.cumul.vue()
+        self._finaliseur = weakref.finalize(self, magasin._rendre, reference.empreinte)
+
+    def liberer(self):
+        self._finaliseur()
+
+    @property
+    def actif(self):
+        return self._finaliseur.alive
+
+
+class MagasinReferences:
+    """Références partagées par empreinte de contenu, comptées par session, libérées à zéro usage"""
+
+    def __init__(self, dossier=DOSSIER_REFERENCES, nb_max_fichiers=NB_MAX_FICHIERS):
+        self.dossier = dossier
+        self.nb_max_fichiers = nb_max_fichiers
+        self._entrees = {}  # empreinte -> [Reference, nombre de jetons]
+        self._verrou = threading.Lock()
+        # Un chargement à la fois par fichier : les sessions suivantes attendent la même référence
+        self._verrous_chargement = {}
+
+    def acquerir(self, file):
+        """Jeton de la référence du fichier (chargée au premier usage), ou None si illisible"""
+        empreinte = empreinte_fichier(file)
+        with self._verrou:
+            verrou = self._verrous_chargement.setdefault(empreinte, threading.Lock())
+        with verrou:
+            with self._verrou:
+                entree = self._entrees.get(empreinte)
+                if entree is not None:
+                    entree[1] += 1
+                    return JetonReference(self, entree[0])
+            reference = None
+            try:
+                reference = self._charger(file, empreinte)
+            finally:
+                with self._verrou:
+                    self._verrous_chargement.pop(empreinte, None)
+                    if reference is not None:
+                        self._entrees[empreinte] = [reference, 1]
+            return None if reference is None else JetonReference(self, reference)
+
+    def _rendre(self, empreinte):
+        with self._verrou:
+            entree = self._entrees.get(empreinte)
+            if entree is None:
+                return
+            entree[1] -= 1
+            if entree[1] <= 0:
+                # Plus de session : les pages projetées sont rendues avec les derniers objets
+                del self._entrees[empreinte]
+
+    def reference(self, empreinte=None):
+        """Référence déjà chargée par une session (sans jeton), la seule chargée si empreinte=None"""
+        with self._verrou:
+            if empreinte is None:
+                return next(iter(self._entrees.values()))[0] if len(self._entrees) == 1 else None
+            entree = self._entrees.get(empreinte)
+            return None if entree is None else entree[0]
+
+    def stats(self):
+        """Références en mémoire et nombre de sessions qui les utilisent"""
+        with self._verrou:
+            return [{'fichier': ref.nom, 'empreinte': empreinte, 'sessions': nb, 'lignes': len(ref.df),
+                     'projete': ref.projete}
+                    for empreinte, (ref, nb) in self._entrees.items()]
+
+    def _chemin(self, empreinte):
+        return os.path.join(self.dossier, f"{empreinte}.feather")
+
+    def _charger(self, file, empreinte):
+        chemin = self._chemin(empreinte)
+        if arrow_disponible() and os.path.exists(chemin):
+            try:
+                return self._lire(chemin, empreinte, file.name)
+            except Exception:
+                # Fichier Feather illisible (écriture d'une autre version d'Arrow...) : refait depuis la source
+                self._supprimer(chemin)
+
+        file.seek(0)
+        brut = charger_fichier_pandas(file)
+        if brut is None:
+            return None
+        df = compacter(brut)
+        rapport = rapport_memoire(brut, df)
+        del brut
+        # Colonnes en double (non représentables en Arrow) : référence gardée en mémoire
+        if arrow_disponible() and df.columns.is_unique:
+            try:
+                self._ecrire(chemin, df, rapport)
+                return self._lire(chemin, empreinte, file.name)
+            except Exception:
+                self._supprimer(chemin)
+        return Reference(empreinte, file.name, df, rapport)
+
+    @staticmethod
+    def _supprimer(chemin):
+        try:
+            os.remove(chemin)
+        except OSError:
+            pass
+
+    def _ecrire(self, chemin, df, rapport):
+        """Fichier Feather non compressé (condition de la lecture projetée), écrit de façon atomique"""
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        os.makedirs(self.dossier, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               _CLE_RAPPORT: rapport.to_json(orient='split').encode()})
+        temporaire = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+        feather.write_feather(table, temporaire, compression='uncompressed')
+        os.replace(temporaire, chemin)
+        self._nettoyer()
+
+    @staticmethod
+    def _lire(chemin, empreinte, nom):
+        import pyarrow.feather as feather
+        table = feather.read_table(chemin, memory_map=True)
+        # split_blocks : pas de regroupement des colonnes numériques (donc pas de copie)
+        df = table.to_pandas(split_blocks=True)
+        rapport = (table.schema.metadata or {}).get(_CLE_RAPPORT)
+        if rapport is not None:
+            rapport = pd.read_json(io.StringIO(rapport.decode()), orient='split')
+        return Reference(empreinte, nom, df, rapport, projete=True)
+
+    def _nettoyer(self):
+        """Garde les nb_max_fichiers fichiers Feather les plus récents (hors références en cours)"""
+        with self._verrou:
+            en_cours = {self._chemin(empreinte) for empreinte in self._entrees}
+        try:
+            fichiers = [e for e in os.scandir(self.dossier) if e.name.endswith('.feather')]
+        except OSError:
+            return
+        fichiers.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        for entree in fichiers[self.nb_max_fichiers:]:
+            if entree.path not in en_cours:
+                self._supprimer(entree.path)
+
+
+# Magasin partagé par toutes les sessions du process Streamlit
+REFERENCES = MagasinReferences()
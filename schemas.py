@@ -0,0 +1,173 @@
+"""
+Profils de schéma : rôle -> colonne de chaque disposition de fichier, résolus une fois par process.
+
+Un profil est rangé sous la signature de l'en-tête (empreinte des noms de colonnes normalisés).
+Une disposition déjà vue reprend son profil sans aucune recherche ; une nouvelle est résolue en
+un passage par une seule expression compilée qui trouve tous les mots clés de chaque nom, puis
+enregistrée. Le profil garde aussi le plan de lecture (positions, types) de chaque PlanLecture.
+
+Une colonne se lit d'abord par son premier mot clé (le plus long à la position la plus à gauche) :
+"emplacement lot" est un emplacement, "code_barre" un EAN. Un rôle prend la première colonne dont
+c'est le rôle principal, à défaut la première qui contient un de ses mots clés. Les mots clés très
+courts ('um') ne comptent qu'en mot entier : "numéro article" est un code, pas une unité.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+# Colonnes utilisées par la comparaison MAGASIN VS POUS
+MOTS_CLES_COMPARAISON = {
+    'code': ['code', 'article', 'ref'],
+    'lot': ['lot', 'serie', 'batch'],
+    'qte': ['qte', 'quant', 'stock'],
+    'lib': ['lib', 'designation', 'nom'],
+}
+
+# Métadonnées reprises dans le fichier final (côté Info / côté Terrain)
+MOTS_CLES_META_INFO = {
+    'ean': ['ean', 'code_barre'],
+    'ser': ['serie', 'serial', 's/n'],
+    'emp': ['emplacement', 'rack'],
+    'site': ['site', 'magasin'],
+    'um': ['um', 'unite'],
+    'res': ['reserve', 'réserv'],
+    'dispo': ['dispo', 'utilisable'],
+}
+MOTS_CLES_META_TERRAIN = {
+    'ean': ['ean', 'code_barre'],
+    'ser': ['serie', 'serial'],
+    'emp': ['emplacement', 'rack'],
+    'site': ['site', 'magasin'],
+    'um': ['um', 'unite'],
+}
+
+# Tous les rôles d'un profil (les mots clés Info couvrent ceux du Terrain)
+MOTS_CLES_ROLES = {**MOTS_CLES_COMPARAISON, **MOTS_CLES_META_INFO}
+NB_MAX_PROFILS = 64
+# Mots clés de cette longueur ou moins reconnus seulement en mot entier (entre non alphanumériques)
+LONGUEUR_MOT_ENTIER = 2
+
+
+def _mot_entier(mot):
+    return len(mot) <= LONGUEUR_MOT_ENTIER
+
+
+def _motif_mot(mot):
+    """Motif d'un mot clé : sous-chaîne, ou mot entier pour les mots clés courts"""
+    if _mot_entier(mot):
+        return rf"(?<![^\W_]){re.escape(mot)}(?![^\W_])"
+    return re.escape(mot)
+
+
+def _prefixe(court, mot):
+    """True si court est trouvé au début de mot (en mot entier s'il est court)"""
+    if not mot.startswith(court):
+        return False
+    return not _mot_entier(court) or len(mot) == len(court) or not mot[len(court)].isalnum()
+
+
+def signature_entete(entetes):
+    """Empreinte d'une liste de noms de colonnes normalisés (ordre compris)"""
+    return hashlib.blake2b("\x1f".join(map(str, entetes)).encode(), digest_size=8).hexdigest()
+
+
+class Correspondance:
+    """Mots clés de tous les rôles compilés en une expression : rôles trouvés dans un nom de colonne"""
+
+    def __init__(self, mots_cles=MOTS_CLES_ROLES):
+        self.roles_connus = list(mots_cles)
+        roles_mot = {}
+        for role, mots in mots_cles.items():
+            for mot in mots:
+                roles_mot.setdefault(mot, []).append(role)
+        # Le plus long mot clé est pris à chaque position : ses préfixes (mots clés plus courts
+        # qui commencent au même endroit) lui transmettent leurs rôles
+        self._roles = {mot: {r for autre, roles in roles_mot.items() if _prefixe(autre, mot) for r in roles}
+                       for mot in roles_mot}
+        self._principaux = {mot: set(roles) for mot, roles in roles_mot.items()}
+        alternatives = "|".join(_motif_mot(mot) for mot in sorted(roles_mot, key=len, reverse=True))
+        # Anticipation : une correspondance à chaque position, même imbriquée dans une autre
+        self._motif = re.compile(f"(?=({alternatives}))")
+
+    def roles(self, nom):
+        """(rôles principaux, tous les rôles) d'un nom de colonne"""
+        trouves = [m.group(1) for m in self._motif.finditer(str(nom))]
+        if not trouves:
+            return set(), set()
+        return self._principaux[trouves[0]], set().union(*(self._roles[mot] for mot in trouves))
+
+    def resoudre(self, entetes):
+        """Rôle -> première colonne de rôle principal, sinon première colonne qui le contient"""
+        principale, secondaire = {}, {}
+        for col in entetes:
+            principaux, tous = self.roles(col)
+            for role in tous:
+                cible = principale if role in principaux else secondaire
+                cible.setdefault(role, col)
+        return {role: principale.get(role, secondaire.get(role)) for role in self.roles_connus}
+
+
+class ProfilSchema:
+    """Disposition d'un fichier : rôle -> colonne et plans de lecture déjà calculés"""
+
+    def __init__(self, signature, entetes, colonnes):
+        self.signature = signature
+        self.entetes = entetes
+        self.colonnes = colonnes
+        self._plans = {}
+
+    def plan(self, plan):
+        """(positions lues, types imposés) d'un PlanLecture sur cette disposition, calculés une fois"""
+        lecture = self._plans.get(plan.nom)
+        if lecture is None:
+            lecture = self._plans[plan.nom] = plan.calculer(self)
+        return lecture
+
+
+class RegistreSchemas:
+    """Profils par signature d'en-tête, partagés par les sessions du process"""
+
+    def __init__(self, correspondance=None, nb_max=NB_MAX_PROFILS):
+        self.correspondance = correspondance if correspondance is not None else Correspondance()
+        self.nb_max = nb_max
+        self._profils = OrderedDict()
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def profil(self, entetes):
+        """Profil d'une liste de noms de colonnes normalisés (ou d'un DataFrame), résolu au premier usage"""
+        entetes = tuple(getattr(entetes, 'columns', entetes))
+        signature = signature_entete(entetes)
+        with self._verrou:
+            profil = self._profils.get(signature)
+            if profil is not None and profil.entetes == entetes:
+                self._profils.move_to_end(signature)
+                self.hits += 1
+                return profil
+            self.misses += 1
+        profil = ProfilSchema(signature, entetes, self.correspondance.resoudre(entetes))
+        with self._verrou:
+            self._profils[signature] = profil
+            while len(self._profils) > self.nb_max:
+                self._profils.popitem(last=False)
+        return profil
+
+    def colonnes(self, entetes, roles=None):
+        """Rôle -> colonne (None si absente), pour les rôles demandés ou tous"""
+        colonnes = self.profil(entetes).colonnes
+        return dict(colonnes) if roles is None else {role: colonnes[role] for role in roles}
+
+    def stats(self):
+        with self._verrou:
+            return {'profils': len(self._profils), 'hits': self.hits, 'misses': self.misses}
+
+    def vider(self):
+        with self._verrou:
+            self._profils.clear()
+            self.hits = self.misses = 0
+
+
+# Registre partagé par toutes les sessions du process Streamlit
+SCHEMAS = RegistreSchemas()
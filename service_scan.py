@@ -0,0 +1,371 @@
+"""
+Service HTTP de scan pour les terminaux (asyncio, bibliothèque standard), hors de la boucle
+de rerun Streamlit. Il répond sur les références POUS déjà chargées par l'application
+(index de scan, cumul par article) et écrit dans le même journal.
+
+Routes (JSON, HTTP/1.1 keep-alive) :
+    GET  /sante                      état du service
+    GET  /references                 fichiers POUS chargés (empreinte, lignes, sessions)
+    GET  /articles/<scan>            fiche d'un article (code, EAN ou série)
+    POST /articles                   {"scans": [...]} -> une fiche (ou null) par scan
+    POST /scans                      {"evenements": [{"scan", "statut": "OK" | "CORRECTION", "quantite"}]}
+Paramètre "fichier" (empreinte, en query ou dans le corps) : facultatif si un seul fichier est chargé.
+
+Lancement : automatique depuis app.py si STOCKITO_SERVICE_SCAN vaut "port" ou "hote:port",
+ou seul : python service_scan.py POUS.xlsx [--port 8765]
+
+Le service écoute sur la boucle locale par défaut. Sur une autre adresse (terminaux du réseau),
+un jeton (STOCKITO_JETON_SCAN) est obligatoire. Les pages web ne peuvent l'appeler que depuis
+les origines listées dans STOCKITO_ORIGINES_SCAN (séparées par des virgules).
+"""
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import sys
+import threading
+import urllib.parse
+import numpy as np
+import pandas as pd
+from references import REFERENCES
+from journal import JOURNAL
+from utils import FichierMemoire
+
+HOTE_DEFAUT = '127.0.0.1'
+PORT_DEFAUT = 8765
+# Connexion keep-alive fermée après ce délai sans requête
+DELAI_INACTIVITE_S = 60
+TAILLE_MAX_CORPS = 1024 ** 2
+NB_MAX_ENTETES = 100
+NB_MAX_SCANS = 5000
+STATUTS = ('OK', 'CORRECTION')
+
+_RAISONS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+            404: 'Not Found',
+            405: 'Method Not Allowed', 413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+            500: 'Internal Server Error'}
+
+
+class ErreurRequete(Exception):
+    def __init__(self, statut, message):
+        super().__init__(message)
+        self.statut = statut
+
+
+def boucle_locale(hote):
+    """True si l'adresse d'écoute n'est joignable que depuis cette machine"""
+    if hote == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(hote).is_loopback
+    except ValueError:
+        return False
+
+
+def verifier_exposition(hote, jeton_acces):
+    """Refuse d'écouter hors de la boucle locale sans jeton (écritures dans le journal)"""
+    if not jeton_acces and not boucle_locale(hote):
+        raise ValueError(f"Service de scan sur {hote} : jeton d'accès obligatoire (STOCKITO_JETON_SCAN)")
+
+
+def origines_depuis_env(valeur):
+    """Origines web autorisées lues dans STOCKITO_ORIGINES_SCAN (aucune si vide)"""
+    return tuple(o.strip().rstrip('/') for o in (valeur or '').split(',') if o.strip())
+
+
+def _valeur_json(valeur):
+    """Valeur d'une fiche sérialisable (scalaires numpy, manquants -> null)"""
+    if isinstance(valeur, np.generic):
+        valeur = valeur.item()
+    if valeur is None or (not isinstance(valeur, str) and pd.isna(valeur)):
+        return None
+    return valeur if isinstance(valeur, (str, int, float, bool)) else str(valeur)
+
+
+class ServiceScan:
+    """Traitement des requêtes sur les références partagées (un objet par serveur)"""
+
+    def __init__(self, references=REFERENCES, journal=JOURNAL, jeton_acces=None, origines=()):
+        self.references = references
+        self.journal = journal
+        # Si défini, exigé dans l'en-tête X-Jeton (écritures comprises)
+        self.jeton_acces = jeton_acces
+        # Origines des pages web autorisées ; les requêtes d'une autre origine sont refusées
+        self.origines = tuple(origines)
+
+    def origine_autorisee(self, entetes):
+        """Origine de la requête si elle est autorisée, None sans en-tête Origin, False sinon"""
+        origine = entetes.get('origin')
+        if origine is None:
+            return None
+        return origine if origine.rstrip('/') in self.origines else False
+
+    def _reference(self, fichier):
+        reference = self.references.reference(fichier)
+        if reference is None:
+            raise ErreurRequete(404, "Fichier POUS non chargé" if fichier
+                                else "Aucun ou plusieurs fichiers POUS chargés : préciser fichier")
+        # Cumul partagé, avec les corrections du journal (toutes tablettes)
+        cumul = reference.cumul.vue()
+        cumul.corrections = self.journal.vue_corrections(reference.empreinte)
+        return reference, cumul
+
+    @staticmethod
+    def _fiches(reference, cumul, scans):
+        """Fiche de scan (comme l'onglet INVENTAIRE TOURNANT) de chaque scan, None si inconnu"""
+        positions = reference.index.premieres_positions(scans)
+        trouves = positions >= 0
+        codes = iter(reference.df[reference.colonnes['code']].take(positions[trouves]).tolist())
+        fiches = []
+        for trouve in trouves:
+            fiche = cumul.fiche(next(codes)) if trouve else None
+            fiches.append(None if fiche is None else {col: _valeur_json(v) for col, v in fiche.items()})
+        return fiches
+
+    def traiter(self, methode, chemin, query, entetes, corps):
+        """(statut, réponse JSON) d'une requête"""
+        if self.jeton_acces and not hmac.compare_digest(entetes.get('x-jeton', ''), self.jeton_acces):
+            raise ErreurRequete(401, "Jeton d'accès manquant ou invalide")
+        donnees = {}
+        if corps:
+            try:
+                donnees = json.loads(corps)
+            except ValueError:
+                raise ErreurRequete(400, "Corps JSON invalide")
+            if not isinstance(donnees, dict):
+                raise ErreurRequete(400, "Objet JSON attendu")
+        fichier = donnees.get('fichier') or query.get('fichier')
+        parties = [urllib.parse.unquote(p) for p in chemin.strip('/').split('/') if p]
+
+        if parties == ['sante']:
+            return 200, {'statut': 'ok', 'references': len(self.references.stats())}
+        if parties == ['references']:
+            return 200, {'references': self.references.stats()}
+        if parties[:1] == ['articles'] and len(parties) == 2 and methode == 'GET':
+            reference, cumul = self._reference(fichier)
+            fiche = self._fiches(reference, cumul, [parties[1]])[0]
+            if fiche is None:
+                raise ErreurRequete(404, "Article inconnu / Code barre non trouvé")
+            return 200, {'fichier': reference.empreinte, 'article': fiche}
+        if parties == ['articles'] and methode == 'POST':
+            scans = self._liste(donnees, 'scans')
+            reference, cumul = self._reference(fichier)
+            fiches = self._fiches(reference, cumul, [str(s) for s in scans])
+            return 200, {'fichier': reference.empreinte,
+                         'resultats': [{'scan': s, 'article': f} for s, f in zip(scans, fiches)]}
+        if parties == ['scans'] and methode == 'POST':
+            return 200, self._enregistrer(fichier, self._liste(donnees, 'evenements'))
+        if parties and parties[0] in ('sante', 'references', 'articles', 'scans'):
+            raise ErreurRequete(405, "Méthode non autorisée")
+        raise ErreurRequete(404, "Route inconnue")
+
+    @staticmethod
+    def _liste(donnees, cle):
+        valeurs = donnees.get(cle)
+        if not isinstance(valeurs, list):
+            raise ErreurRequete(400, f"Liste '{cle}' attendue")
+        if len(valeurs) > NB_MAX_SCANS:
+            raise ErreurRequete(413, f"Au plus {NB_MAX_SCANS} éléments par requête")
+        return valeurs
+
+    def _enregistrer(self, fichier, evenements):
+        """STOCK OK / CORRECTION au journal (mêmes valeurs que les boutons de l'onglet)"""
+        reference, cumul = self._reference(fichier)
+        col_code, col_lib, col_qte = (reference.colonnes[r] for r in ('code', 'lib', 'qte'))
+        valides = [e for e in evenements if isinstance(e, dict)]
+        fiches = self._fiches(reference, cumul, [str(e.get('scan', e.get('code', ''))) for e in valides])
+        enregistres, rejetes = 0, []
+        for evenement, fiche in zip(valides, fiches):
+            statut = str(evenement.get('statut', '')).upper()
+            if fiche is None or statut not in STATUTS:
+                rejetes.append({'evenement': evenement,
+                                'erreur': "Article inconnu" if fiche is None else "Statut OK ou CORRECTION attendu"})
+                continue
+            # Quantité relue : tient compte des corrections précédentes du même lot d'événements
+            qte_info = cumul.article(fiche.get(col_code))['Qte_Totale']
+            ancien = int(qte_info) if pd.notna(qte_info) else 0
+            if statut == 'CORRECTION':
+                try:
+                    nouveau = int(evenement['quantite'])
+                except (KeyError, TypeError, ValueError):
+                    rejetes.append({'evenement': evenement, 'erreur': "Quantité entière attendue"})
+                    continue
+            else:
+                nouveau = ancien
+            self.journal.ajouter(reference.empreinte, fiche.get(col_code),
+                                 fiche.get(col_lib) if col_lib else None, ancien, nouveau, statut)
+            enregistres += 1
+        rejetes += [{'evenement': e, 'erreur': "Objet attendu"} for e in evenements if not isinstance(e, dict)]
+        return {'fichier': reference.empreinte, 'enregistres': enregistres, 'rejetes': rejetes}
+
+
+async def _lire_requete(lecteur):
+    """(méthode, cible, version, en-têtes, corps), None en fin de connexion"""
+    ligne = await asyncio.wait_for(lecteur.readline(), DELAI_INACTIVITE_S)
+    if not ligne.strip():
+        return None
+    methode, cible, version = ligne.decode('latin-1').split()
+    # En-têtes et corps sous le même délai : une requête commencée ne garde pas la connexion ouverte
+    entetes, corps = await asyncio.wait_for(_lire_entetes_corps(lecteur), DELAI_INACTIVITE_S)
+    return methode.upper(), cible, version, entetes, corps
+
+
+async def _lire_entetes_corps(lecteur):
+    entetes = {}
+    while True:
+        ligne = await lecteur.readline()
+        if ligne in (b'\r\n', b'\n', b''):
+            break
+        if len(entetes) >= NB_MAX_ENTETES:
+            raise ErreurRequete(431, f"Au plus {NB_MAX_ENTETES} en-têtes par requête")
+        nom, _, valeur = ligne.decode('latin-1').partition(':')
+        entetes[nom.strip().lower()] = valeur.strip()
+    taille = int(entetes.get('content-length') or 0)
+    if taille > TAILLE_MAX_CORPS:
+        raise ErreurRequete(413, "Corps trop volumineux")
+    corps = await lecteur.readexactly(taille) if taille else b''
+    return entetes, corps
+
+
+def _reponse(statut, contenu, garder, origine=None):
+    corps = b'' if contenu is None else json.dumps(contenu, ensure_ascii=False).encode()
+    entetes = [f"HTTP/1.1 {statut} {_RAISONS.get(statut, '')}",
+               "Content-Type: application/json; charset=utf-8",
+               f"Content-Length: {len(corps)}",
+               f"Connection: {'keep-alive' if garder else 'close'}"]
+    if origine:
+        # Page de scan servie depuis une origine autorisée (terminal, navigateur)
+        entetes += [f"Access-Control-Allow-Origin: {origine}", "Vary: Origin",
+                    "Access-Control-Allow-Headers: Content-Type, X-Jeton",
+                    "Access-Control-Allow-Methods: GET, POST, OPTIONS"]
+    return ("\r\n".join(entetes) + "\r\n\r\n").encode() + corps
+
+
+async def _connexion(service, lecteur, ecrivain):
+    """Requêtes successives d'une connexion (keep-alive) jusqu'à fermeture ou inactivité"""
+    try:
+        while True:
+            try:
+                requete = await _lire_requete(lecteur)
+            except ErreurRequete as e:
+                ecrivain.write(_reponse(e.statut, {'erreur': str(e)}, False))
+                break
+            except ValueError:
+                ecrivain.write(_reponse(400, {'erreur': "Requête HTTP invalide"}, False))
+                break
+            if requete is None:
+                break
+            methode, cible, version, entetes, corps = requete
+            connexion = entetes.get('connection', '').lower()
+            garder = connexion != 'close' if version == 'HTTP/1.1' else connexion == 'keep-alive'
+            url = urllib.parse.urlsplit(cible)
+            query = dict(urllib.parse.parse_qsl(url.query))
+            origine = service.origine_autorisee(entetes)
+            if origine is False:
+                # Page web d'une autre origine : refusée avant toute lecture ou écriture
+                statut, contenu = 403, {'erreur': "Origine non autorisée"}
+            elif methode == 'OPTIONS':
+                statut, contenu = 204, None
+            else:
+                try:
+                    statut, contenu = service.traiter(methode, url.path, query, entetes, corps)
+                except ErreurRequete as e:
+                    statut, contenu = e.statut, {'erreur': str(e)}
+                except Exception as e:
+                    statut, contenu = 500, {'erreur': repr(e)}
+            ecrivain.write(_reponse(statut, contenu, garder, origine))
+            await ecrivain.drain()
+            if not garder:
+                break
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        ecrivain.close()
+
+
+async def servir(service, hote=HOTE_DEFAUT, port=PORT_DEFAUT, pret=None):
+    serveur = await asyncio.start_server(lambda l, e: _connexion(service, l, e), hote, port)
+    if pret is not None:
+        pret.set()
+    async with serveur:
+        await serveur.serve_forever()
+
+
+_service_lance = None
+_verrou = threading.Lock()
+
+
+def adresse_service(valeur):
+    """(hôte, port) de STOCKITO_SERVICE_SCAN ("port" ou "hote:port"), None si vide"""
+    if not valeur:
+        return None
+    hote, _, port = valeur.rpartition(':')
+    return hote or HOTE_DEFAUT, int(port)
+
+
+def demarrer_service(hote=HOTE_DEFAUT, port=PORT_DEFAUT, jeton_acces=None, origines=()):
+    """
+    Lance le service dans un thread du process (une seule fois) et retourne (hôte, port),
+    ou None si le port est indisponible (autre process déjà à l'écoute...) ou si l'adresse
+    est hors de la boucle locale sans jeton.
+    """
+    global _service_lance
+    with _verrou:
+        if _service_lance is None:
+            try:
+                verifier_exposition(hote, jeton_acces)
+            except ValueError:
+                _service_lance = False
+                return None
+            pret, erreur = threading.Event(), []
+
+            def boucle():
+                try:
+                    asyncio.run(servir(ServiceScan(jeton_acces=jeton_acces, origines=origines), hote, port, pret))
+                except OSError as e:
+                    erreur.append(e)
+                    pret.set()
+
+            threading.Thread(target=boucle, name='service_scan', daemon=True).start()
+            pret.wait(10)
+            _service_lance = False if erreur else (hote, port)
+        return _service_lance or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP de scan sur un fichier POUS")
+    parser.add_argument("pous", help="Fichier POUS de référence")
+    parser.add_argument("--hote", default=HOTE_DEFAUT)
+    parser.add_argument("--port", type=int, default=PORT_DEFAUT)
+    parser.add_argument("--jeton", default=os.environ.get('STOCKITO_JETON_SCAN'),
+                        help="Jeton exigé dans l'en-tête X-Jeton (obligatoire hors boucle locale)")
+    parser.add_argument("--origines", default=os.environ.get('STOCKITO_ORIGINES_SCAN'),
+                        help="Origines web autorisées, séparées par des virgules")
+    args = parser.parse_args()
+    try:
+        verifier_exposition(args.hote, args.jeton)
+    except ValueError as e:
+        print(e)
+        return 1
+
+    with open(args.pous, 'rb') as f:
+        jeton = REFERENCES.acquerir(FichierMemoire(f.read(), os.path.basename(args.pous)))
+    if jeton is None:
+        print(f"Fichier illisible : {args.pous}")
+        return 1
+    print(f"{len(jeton.reference.df)} lignes, fichier {jeton.reference.empreinte} -> "
+          f"http://{args.hote}:{args.port}")
+    try:
+        asyncio.run(servir(ServiceScan(jeton_acces=args.jeton, origines=origines_depuis_env(args.origines)),
+                           args.hote, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        JOURNAL.synchroniser()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Comparaison en flux et comparaison incrémentale : même tableau qu'un calcul complet"""
+import numpy as np
+import pandas as pd
+import pytest
+from backend import StockProcessor
+from cache import CacheLRU
+from generateur import ecrire, generer_paire
+from instantanes import MagasinInstantanes
+from utils import FichierMemoire
+
+
+@pytest.fixture(scope='module')
+def paire():
+    paire = generer_paire(2000, seed=3)
+    terrain, info = paire.terrain.copy(), paire.info.copy()
+    rng = np.random.default_rng(3)
+    # Quantités manquantes des deux côtés
+    terrain['Qte'] = terrain['Qte'].astype(float)
+    terrain.loc[rng.choice(len(terrain), 20, replace=False), 'Qte'] = np.nan
+    info['Quantité'] = info['Quantité'].astype(float)
+    info.loc[rng.choice(len(info), 20, replace=False), 'Quantité'] = np.nan
+    return terrain, info
+
+
+def fichiers(terrain, info):
+    return (FichierMemoire(ecrire(terrain, 'csv', "Inventaire magasin"), 'magasin.csv'),
+            FichierMemoire(ecrire(info, 'csv', "Extraction POUS"), 'pous.csv'))
+
+
+def comparaison_complete(terrain, info):
+    processor = StockProcessor()
+    assert processor.load_data(*fichiers(terrain, info))
+    return processor.process_comparison()
+
+
+@pytest.mark.parametrize("chunksize", [150, 10_000])
+def test_comparaison_en_flux(paire, chunksize):
+    terrain, info = paire
+    merged = StockProcessor().process_comparison_chunked(*fichiers(terrain, info), chunksize=chunksize)
+    pd.testing.assert_frame_equal(merged, comparaison_complete(terrain, info))
+
+
+def test_comparaison_incrementale(paire):
+    terrain, info = paire
+    rng = np.random.default_rng(4)
+    # Seconde extraction POUS : quantités et libellés changés, lignes retirées, lignes ajoutées
+    suivante = info.copy()
+    changees = rng.choice(len(suivante), 40, replace=False)
+    suivante.loc[changees, 'Quantité'] += 3
+    suivante.loc[changees[:5], 'Quantité'] = np.nan
+    suivante.loc[changees[5:10], 'Libellé'] = "NOUVEAU LIBELLE"
+    suivante = suivante.drop(index=rng.choice(len(suivante), 30, replace=False))
+    ajoutees = suivante.sample(20, random_state=4).assign(Lot="NOUVEAU")
+    ajoutees.iloc[:10, ajoutees.columns.get_loc('Code Article')] = [f"9{k:05d}" for k in range(10)]
+    suivante = pd.concat([suivante.iloc[:500], ajoutees, suivante.iloc[500:]], ignore_index=True)
+
+    instantanes = MagasinInstantanes()
+    for extraction, incrementale in ((info, False), (suivante, True)):
+        processor = StockProcessor(cache=CacheLRU(), instantanes=instantanes)
+        assert processor.load_data(*fichiers(terrain, extraction))
+        merged = processor.process_comparison()
+        assert (processor.changements is not None) == incrementale
+        pd.testing.assert_frame_equal(merged, comparaison_complete(terrain, extraction))
@@ -0,0 +1,66 @@
+"""Équivalence des versions colonne de normalisation.py avec les fonctions ligne à ligne de utils.py"""
+import numpy as np
+import pandas as pd
+import pytest
+from normalisation import formater_sans_decimale_serie, nettoyer_lot_serie
+from utils import formater_sans_decimale, nettoyer_lot
+
+VALEURS_TEXTE = ["3,76E+12", "3.76e+12", "1,5E+3", "12E+", "abcE+def", "  4E+2  ", "123.0", "123.00",
+                 "12.5", " 45.0 ", "-0.0", "0123", "ABC", "", " ", "nan", "NaN", None, np.nan]
+VALEURS_LOTS = ["STOCK+RECYCL0", "RECYCL0", "STOCK RECYCL0", "STOCK+RECYCLO", "recycl0", " stock+recycl0 ",
+                "RECYCLO", "Lot A", "  sav ", "straße", "", " ", "nan", "NAN", None, np.nan]
+
+
+def attendu(fonction, serie):
+    return [fonction(v) for v in serie.astype(object)]
+
+
+def verifier(fonction, version_serie, serie):
+    resultat = version_serie(serie)
+    assert list(resultat) == attendu(fonction, serie)
+    assert resultat.index.equals(serie.index)
+
+
+@pytest.mark.parametrize("fonction, version_serie", [
+    (formater_sans_decimale, formater_sans_decimale_serie),
+    (nettoyer_lot, nettoyer_lot_serie),
+])
+@pytest.mark.parametrize("serie", [
+    pd.Series(VALEURS_TEXTE, dtype=object),
+    pd.Series(VALEURS_LOTS, dtype=object),
+    pd.Series(VALEURS_TEXTE, dtype=object, index=range(100, 100 + len(VALEURS_TEXTE))),
+    pd.Series([1.0, 2.5, 3760000000000.0, -0.0, np.nan, 1e21]),
+    pd.Series([1, 25, -3, 0]),
+    pd.Series([1, None, 3], dtype='Int64'),
+    pd.Series([True, False]),
+    pd.Series(pd.to_datetime(["2024-01-05 00:00:00", None, "2024-03-01 12:30:00"], format="ISO8601")),
+    pd.Series(VALEURS_LOTS, dtype='category'),
+    pd.Series(VALEURS_TEXTE, dtype='category'),
+    pd.Series([1.0, 2.0, np.nan, 1.0], dtype='category'),
+    pd.Series(["3,76E+12", "123.0", None, "RECYCL0"], dtype='str'),
+], ids=["texte", "lots", "index", "float", "int", "Int64", "bool", "datetime", "cat_lots", "cat_texte",
+        "cat_float", "str"])
+def test_equivalence(fonction, version_serie, serie):
+    verifier(fonction, version_serie, serie)
+
+
+def test_notation_scientifique_virgule():
+    assert list(formater_sans_decimale_serie(pd.Series(["3,76E+12"]))) == ["3760000000000"]
+
+
+def test_suffixe_decimal():
+    assert list(formater_sans_decimale_serie(pd.Series(["123.0", 45.0]))) == ["123", "45"]
+
+
+def test_alias_stock():
+    lots = pd.Series(["STOCK+RECYCL0", "RECYCL0", "STOCK RECYCL0", "STOCK+RECYCLO", "recycl0"])
+    assert set(nettoyer_lot_serie(lots)) == {"STOCK"}
+
+
+def test_sans_lot():
+    assert list(nettoyer_lot_serie(pd.Series(["", " ", "nan", None, np.nan], dtype=object))) == ["SANS_LOT"] * 5
+
+
+def test_serie_vide():
+    for version_serie in (formater_sans_decimale_serie, nettoyer_lot_serie):
+        assert len(version_serie(pd.Series([], dtype=object))) == 0
@@ -0,0 +1,54 @@
+"""Comptage par journal de scans (load_scan_log) : quantités Terrain par (Code, Lot)"""
+import pytest
+from backend import StockProcessor
+from utils import FichierMemoire
+
+POUS = """Code Article,Libellé,Lot,N° Serie,Quantité,EAN
+100100,VIS,L1,,5,3000000000017
+100100,VIS,L2,,3,3000000000017
+100100,VIS,L3,,2,3000000000017
+200200,MOTEUR,S1,SN001,1,3000000000024
+200200,MOTEUR,S2,SN002,1,3000000000024
+300300,JOINT,L9,,4,3000000000031
+""".encode()
+
+
+def comparer(journal, articles_scannes=True):
+    processor = StockProcessor()
+    assert processor.load_scan_log(FichierMemoire(journal.encode(), 'scans.txt'),
+                                   FichierMemoire(POUS, 'pous.csv'), articles_scannes)
+    merged = processor.process_comparison()
+    terrain = {(code, lot): qte for code, lot, qte in merged[['Code', 'Lot', 'Qte_Terrain']].itertuples(index=False)}
+    return processor, terrain
+
+
+@pytest.mark.parametrize("journal, attendu", [
+    # EAN d'un article à trois lots : réparti dans l'ordre du fichier jusqu'à la quantité POUS
+    ("3000000000017;7", {('100100', 'L1'): 5, ('100100', 'L2'): 2, ('100100', 'L3'): 0}),
+    # Article scanné en entier par son code : aucun écart, quel que soit le nombre de lots
+    ("100100;10", {('100100', 'L1'): 5, ('100100', 'L2'): 3, ('100100', 'L3'): 2}),
+    # Surplus sur la première ligne de l'article
+    ("100100;12\n300300;6", {('100100', 'L1'): 7, ('100100', 'L2'): 3, ('100100', 'L3'): 2,
+                             ('300300', 'L9'): 6}),
+    # Série scannée deux fois : comptée deux fois sur sa ligne, pas sur l'autre série
+    ("SN001\nSN001", {('200200', 'S1'): 2, ('200200', 'S2'): 0}),
+    # Série puis code du même article : le code va à la ligne qui n'est pas encore comptée
+    ("SN001\n200200", {('200200', 'S1'): 1, ('200200', 'S2'): 1}),
+])
+def test_quantites_par_lot(journal, attendu):
+    _, terrain = comparer(journal)
+    assert terrain == attendu
+
+
+def test_scan_inconnu():
+    processor, terrain = comparer("3000000000031;4\n999999\n999999;2")
+    assert terrain == {('300300', 'L9'): 4}
+    inconnus = processor.scans_inconnus
+    assert inconnus['Scan'].tolist() == ['999999']
+    assert inconnus['Quantite'].tolist() == [3]
+
+
+def test_articles_non_scannes_absents():
+    _, terrain = comparer("SN002", articles_scannes=False)
+    assert terrain == {('100100', 'L1'): 0, ('100100', 'L2'): 0, ('100100', 'L3'): 0,
+                       ('200200', 'S1'): 0, ('200200', 'S2'): 1, ('300300', 'L9'): 0}
@@ -0,0 +1,60 @@
+"""Résolution rôle -> colonne des profils de schéma"""
+import pytest
+from generateur import generer_paire
+from plan_lecture import PLAN_COMPARAISON, PLAN_INFO_EXPORT
+from schemas import Correspondance, MOTS_CLES_ROLES, RegistreSchemas
+from utils import trouver_colonne
+
+
+@pytest.fixture(scope='module')
+def correspondance():
+    return Correspondance()
+
+
+def test_dispositions_generees_comme_avant(correspondance):
+    """Exports MAGASIN / POUS habituels : mêmes colonnes que la recherche par sous-chaîne"""
+    paire = generer_paire(50)
+    for df in (paire.info, paire.terrain):
+        entetes = [str(col).strip().lower() for col in df.columns]
+        attendu = {role: trouver_colonne(entetes, mots) for role, mots in MOTS_CLES_ROLES.items()}
+        assert correspondance.resoudre(entetes) == attendu
+
+
+@pytest.mark.parametrize("entetes, attendu", [
+    # 'um' dans "numéro" n'est pas une unité : le code reste "numéro article"
+    (["numéro article", "libellé", "lot", "quantité", "code ean"],
+     {'code': "numéro article", 'ean': "code ean", 'um': None, 'lot': "lot", 'qte': "quantité"}),
+    (["numero", "code", "lot", "qte", "um"], {'code': "code", 'um': "um"}),
+    (["code", "lot", "qte", "u.m."], {'um': None}),
+    (["code", "lot", "qte", "unité"], {'um': None}),
+    (["code", "lot", "qte", "unite de mesure"], {'um': "unite de mesure"}),
+    (["code", "lot", "qte", "code_um"], {'code': "code", 'um': "code_um"}),
+    # Premier mot clé de la colonne : emplacement, EAN
+    (["emplacement lot", "lot", "code article", "qte"], {'lot': "lot", 'emp': "emplacement lot"}),
+    (["code_barre", "code article", "lot", "qte"], {'code': "code article", 'ean': "code_barre"}),
+    # Sans colonne principale, la première qui contient un mot clé du rôle
+    (["code", "lot", "stock dispo"], {'qte': "stock dispo", 'dispo': "stock dispo"}),
+    (["code", "lot", "quantite", "stock dispo"], {'qte': "quantite", 'dispo': "stock dispo"}),
+    (["article", "n° serie", "qte"], {'lot': "n° serie", 'ser': "n° serie"}),
+    (["site", "reference", "designation"], {'code': "reference", 'lib': "designation", 'lot': None}),
+])
+def test_resolution(correspondance, entetes, attendu):
+    resolues = correspondance.resoudre(entetes)
+    assert {role: resolues[role] for role in attendu} == attendu
+
+
+def test_registre_reprend_le_profil():
+    registre = RegistreSchemas()
+    entetes = ["code article", "lot", "quantité", "libellé", "emplacement"]
+    profil = registre.profil(entetes)
+    assert registre.profil(list(entetes)) is profil
+    assert registre.stats() == {'profils': 1, 'hits': 1, 'misses': 1}
+    registre.profil(entetes + ["ean"])
+    assert registre.stats()['misses'] == 2
+
+
+def test_plan_lecture_sur_le_profil():
+    entetes = ["site", "code article", "libellé", "lot", "quantité", "emplacement"]
+    assert PLAN_COMPARAISON.positions(entetes) == [1, 2, 3, 4]
+    assert PLAN_COMPARAISON.types(entetes) == {"libellé": 'str', "quantité": 'numerique'}
+    assert PLAN_INFO_EXPORT.positions(entetes) is None
@@ -1,5 +1,8 @@
+import importlib.util
+import io
 import pandas as pd
 import warnings
+from pandas.io.parsers import TextParser
 
 warnings.filterwarnings("ignore")
 
@@ -33,48 +36,147 @@ def nettoyer_lot(valeur):
     return val
 
 def trouver_colonne(df, keywords):
-    """Cherche une colonne contenant un des mots clés"""
-    for col in df.columns:
+    """Cherche une colonne contenant un des mots clés (DataFrame ou liste de noms)"""
+    for col in getattr(df, 'columns', df):
         for k in keywords:
             if k in col: return col
     return None
 
-def charger_fichier_pandas(file):
-    """Charge un fichier CSV ou Excel en détectant l'en-tête"""
+# Nombre de lignes examinées pour trouver l'en-tête
+LIGNES_ENTETE = 20
+
+
+def moteur_excel():
+    """Moteur de lecture Excel le plus rapide disponible (calamine si installé)"""
+    if importlib.util.find_spec('python_calamine') is not None:
+        return 'calamine'
+    return None
+
+
+def detecter_entete(apercu):
+    """Index de la ligne d'en-tête (contient 'code' et 'lot' ou 'article'), 0 par défaut"""
+    for i, row in apercu.head(LIGNES_ENTETE).iterrows():
+        row_str = row.astype(str).str.lower().str.cat(sep=' ')
+        if 'code' in row_str and ('lot' in row_str or 'article' in row_str):
+            return i
+    return 0
+
+
+def lire_contenu(file):
+    """Contenu binaire d'un fichier uploadé ou ouvert, sans déplacer sa position"""
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+    position = file.tell()
+    data = file.read()
+    file.seek(position)
+    return data
+
+
+class FichierMemoire(io.BytesIO):
+    """Contenu de fichier en mémoire avec un attribut name, comme un upload Streamlit"""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def noms_entete(valeurs):
+    """Noms de colonnes normalisés (comme après chargement) d'une ligne d'en-tête brute"""
+    return [f"unnamed: {i}" if pd.isna(v) or str(v).strip() == "" else str(v).strip().lower()
+            for i, v in enumerate(valeurs)]
+
+
+def _appliquer_plan(plan, entete):
+    """Positions retenues et types imposés par un plan de lecture, sur l'en-tête brut"""
+    if plan is None:
+        return None, {}
+    entete = list(entete)
+    noms = noms_entete(entete)
+    positions, types = plan.lecture(noms)
+    # Types 'str' passés au parseur, par nom brut (s'il est textuel et unique)
+    dtype = {v: 'str' for i, (v, nom) in enumerate(zip(entete, noms))
+             if types.get(nom) == 'str' and isinstance(v, str) and entete.count(v) == 1
+             and (positions is None or i in positions)}
+    return positions, dtype
+
+
+def _promouvoir_entete(brut, header_idx, plan=None):
+    """Construit le DataFrame à partir des lignes brutes et de la ligne d'en-tête détectée"""
+    positions, dtype = _appliquer_plan(plan, brut.iloc[header_idx] if len(brut) else [])
+    if positions is not None:
+        # Colonnes hors plan écartées avant l'inférence de types
+        brut = brut.iloc[:, positions]
+    lignes = brut.iloc[header_idx:].to_numpy(dtype=object)
+    entete = ["" if pd.isna(v) else v for v in lignes[0]] if len(lignes) else []
+    # Même inférence de types que read_excel(header=header_idx)
+    return TextParser([entete] + lignes[1:].tolist(), header=0, skip_blank_lines=False,
+                      dtype=dtype or None).read()
+
+
+def _options_csv(file, plan):
+    """En-tête détecté sur un aperçu borné + colonnes/types du plan, fichier rembobiné"""
+    apercu = pd.read_csv(file, header=None, nrows=LIGNES_ENTETE)
+    header_idx = detecter_entete(apercu)
+    positions, dtype = _appliquer_plan(plan, apercu.iloc[header_idx] if len(apercu) else [])
+    file.seek(0)
+    return dict(header=header_idx, usecols=positions, dtype=dtype or None)
+
+
+def _finaliser(df, plan):
+    """Noms de colonnes normalisés et conversions numériques du plan"""
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+    if plan is not None:
+        for col, t in plan.types(list(df.columns)).items():
+            if t == 'numerique':
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def charger_fichier_pandas(file, plan=None, feuille=0):
+    """
+    Charge un fichier CSV ou Excel en détectant l'en-tête (une seule lecture complète).
+    plan (PlanLecture, optionnel) limite les colonnes lues et impose leurs types.
+    feuille : nom ou position de la feuille lue dans un classeur (la première par défaut).
+    """
     try:
         if file.name.endswith('.csv'):
-            df = pd.read_csv(file, header=None, nrows=20)
+            # CSV : aperçu borné aux premières lignes, puis une lecture complète
+            df = pd.read_csv(file, **_options_csv(file, plan))
         else:
-            df = pd.read_excel(file, header=None, nrows=20)
-        
-        header_idx = 0
-        for i, row in df.iterrows():
-            row_str = row.astype(str).str.lower().str.cat(sep=' ')
-            if 'code' in row_str and ('lot' in row_str or 'article' in row_str):
-                header_idx = i
-                break
-        
-        if file.name.endswith('.csv'):
-            file.seek(0)
-            df = pd.read_csv(file, header=header_idx)
-        else:
-            df = pd.read_excel(file, header=header_idx)
-            
-        df.columns = df.columns.astype(str).str.strip().str.lower()
-        return df
+            # Excel / ODS : le classeur est lu une seule fois, l'en-tête est promu ensuite
+            brut = pd.read_excel(file, sheet_name=feuille, header=None, dtype=object, engine=moteur_excel())
+            df = _promouvoir_entete(brut, detecter_entete(brut), plan)
+        return _finaliser(df, plan)
     except Exception as e:
         return None
 
+
+def lire_par_blocs(file, taille_bloc, plan=None):
+    """
+    Itère sur un fichier par blocs de taille_bloc lignes (mêmes colonnes que charger_fichier_pandas).
+    Seuls les CSV sont réellement lus en flux ; les autres formats donnent un bloc unique.
+    """
+    if file.name.endswith('.csv'):
+        with pd.read_csv(file, chunksize=taille_bloc, **_options_csv(file, plan)) as lecteur:
+            for bloc in lecteur:
+                yield _finaliser(bloc, plan)
+    else:
+        df = charger_fichier_pandas(file, plan)
+        if df is not None:
+            yield df
+
+# Largeurs de colonnes (plage Excel, largeur) des deux fichiers exportés
+LARGEURS_SIMPLE = [('A:A', 30), ('B:B', 70), ('C:F', 20)]
+LARGEURS_MAJ = [('A:C', 15), ('D:D', 50), ('E:Z', 15)]
+
 def formatter_excel_simple(df, writer, sheet_name):
     df.to_excel(writer, sheet_name=sheet_name, index=False)
     worksheet = writer.sheets[sheet_name]
-    worksheet.set_column('A:A', 30) 
-    worksheet.set_column('B:B', 70) 
-    worksheet.set_column('C:F', 20) 
+    for plage, largeur in LARGEURS_SIMPLE:
+        worksheet.set_column(plage, largeur)
 
 def formatter_excel_maj(df, writer, sheet_name):
     df.to_excel(writer, sheet_name=sheet_name, index=False)
     worksheet = writer.sheets[sheet_name]
-    worksheet.set_column('A:C', 15) 
-    worksheet.set_column('D:D', 50)
-    worksheet.set_column('E:Z', 15)
\ No newline at end of file
+    for plage, largeur in LARGEURS_MAJ:
+        worksheet.set_column(plage, largeur)
@@ -0,0 +1,109 @@
+"""
+Tableau des écarts affiché page par page.
+
+Les écarts (lignes Ecart != 0 du tableau de comparaison), l'ordre de chaque tri et le texte de
+recherche sont calculés une fois par tableau ; filtrer et trier coûtent ensuite un masque et une
+sélection de positions. Les saisies restent à part, dans un dict (Code, Lot) -> Qte_Info propre
+à la session : seule la page affichée est construite (et envoyée au navigateur) à chaque rerun.
+"""
+import numpy as np
+import pandas as pd
+
+COLONNES_ECARTS = ['Code', 'Libellé', 'Lot', 'Qte_Terrain', 'Qte_Info', 'Ecart']
+# Tris proposés : libellé -> (colonne, décroissant) ; '|Ecart|' = valeur absolue de l'écart
+TRIS = {
+    "Écart (plus grand d'abord)": ('|Ecart|', True),
+    "Écart (croissant)": ('Ecart', False),
+    "Écart (décroissant)": ('Ecart', True),
+    "Code": ('Code', False),
+    "Libellé": ('Libellé', False),
+    "Lot": ('Lot', False),
+}
+TAILLE_PAGE_ECARTS = 100
+
+
+class VueEcarts:
+    """Écarts d'un tableau de comparaison, avec tris précalculés (lecture seule, partageable)"""
+
+    def __init__(self, merged):
+        self.ecarts = merged[merged['Ecart'] != 0].reset_index(drop=True)
+        self.cles = pd.MultiIndex.from_arrays([self.ecarts['Code'], self.ecarts['Lot']])
+        self._ecart_abs = np.abs(self.ecarts['Ecart'].to_numpy(dtype=np.float64))
+        # Texte de recherche en minuscules : "code libellé lot"
+        self._texte = (self.ecarts['Code'].astype(str) + " " + self.ecarts['Libellé'].astype(str)
+                       + " " + self.ecarts['Lot'].astype(str)).str.lower()
+        # Ordre croissant de chaque colonne triable (tri stable), lu à l'envers pour le décroissant
+        self._ordres = {}
+        for colonne, _ in TRIS.values():
+            if colonne not in self._ordres:
+                self._ordres[colonne] = self._trier(colonne)
+
+    def __len__(self):
+        return len(self.ecarts)
+
+    def _trier(self, colonne):
+        if colonne == '|Ecart|':
+            valeurs = self._ecart_abs
+        else:
+            valeurs = self.ecarts[colonne]
+            if not pd.api.types.is_numeric_dtype(valeurs.dtype):
+                valeurs = valeurs.astype(str)
+        return np.argsort(np.asarray(valeurs), kind='stable')
+
+    def filtrer(self, recherche="", ecart_min=0, tri=None):
+        """Positions des écarts retenus (texte dans code / libellé / lot, |Ecart| >= ecart_min), triées"""
+        masque = self._ecart_abs >= ecart_min if ecart_min else None
+        recherche = (recherche or "").strip().lower()
+        if recherche:
+            contient = self._texte.str.contains(recherche, regex=False).to_numpy(dtype=bool)
+            masque = contient if masque is None else masque & contient
+        if tri:
+            colonne, decroissant = TRIS[tri]
+            ordre = self._ordres[colonne][::-1] if decroissant else self._ordres[colonne]
+        else:
+            ordre = np.arange(len(self.ecarts))
+        return ordre if masque is None else ordre[masque[ordre]]
+
+    def _saisies(self, corrections):
+        """Saisies de la session indexées par position dans les écarts"""
+        if not corrections:
+            return pd.Series(dtype=np.float64)
+        positions = self.cles.get_indexer(list(corrections))
+        saisies = pd.Series(list(corrections.values()), index=positions, dtype=np.float64)
+        return saisies[saisies.index >= 0]
+
+    def page(self, positions, numero=1, taille=TAILLE_PAGE_ECARTS, corrections=None):
+        """Lignes de la page numero (1 = première), saisies de la session appliquées à Qte_Info"""
+        debut = (max(numero, 1) - 1) * taille
+        page = self.ecarts.iloc[positions[debut:debut + taille]]
+        saisies = self._saisies(corrections).reindex(page.index)
+        if saisies.notna().any():
+            page = page.assign(Qte_Info=saisies.fillna(page['Qte_Info']))
+        return page
+
+    def relever_saisies(self, page, corrections):
+        """Met à jour corrections (dict (Code, Lot) -> Qte_Info) avec les lignes d'une page éditée"""
+        positions = page.index.to_numpy()
+        origine = self.ecarts['Qte_Info'].to_numpy()[positions]
+        for position, saisie, ancien in zip(positions, page['Qte_Info'].to_numpy(), origine):
+            cle = self.cles[position]
+            if pd.isna(saisie) or saisie == ancien:
+                corrections.pop(cle, None)
+            else:
+                corrections[cle] = saisie
+
+    def actions(self, corrections):
+        """Lignes corrigées (Code, Libellé, Lot, Qte_Info saisie), dans l'ordre du tableau"""
+        saisies = self._saisies(corrections).sort_index()
+        lignes = self.ecarts.iloc[saisies.index.to_numpy()]
+        return lignes.assign(Qte_Info=saisies.to_numpy())[['Code', 'Libellé', 'Lot', 'Qte_Info']]
+
+    def tableau_corrige(self, corrections):
+        """Tous les écarts avec les saisies (Qte_Info) et Ecart_Final, pour les exports"""
+        tableau = self.ecarts
+        saisies = self._saisies(corrections)
+        if len(saisies):
+            qte = self.ecarts['Qte_Info'].to_numpy(dtype=np.float64, copy=True)
+            qte[saisies.index.to_numpy()] = saisies.to_numpy()
+            tableau = tableau.assign(Qte_Info=qte)
+        return tableau.assign(Ecart_Final=tableau['Qte_Info'] - tableau['Qte_Terrain'])